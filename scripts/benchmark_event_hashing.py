@@ -0,0 +1,102 @@
+"""
+Script for comparing the throughput of hashing blocks by the number of events per block
+and the number of processes calculating the event and transaction hashes.
+Each block has a transaction per TRANSACTION_EVENTS events.
+Usage: python scripts/benchmark_event_hashing.py [--events N [N ...]] [--workers N [N ...]]
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+from starkware.starknet.core.os.block_hash.block_hash import calculate_block_hash
+from starkware.starknet.definitions.general_config import StarknetGeneralConfig
+from starkware.starknet.services.api.feeder_gateway.response_objects import Event
+
+from starknet_devnet.constants import DUMMY_STATE_ROOT
+from starknet_devnet.event_hasher import EventHasher, hash_events
+
+TRANSACTION_EVENTS = 4
+
+
+def _generate_events(count: int) -> list:
+    rng = random.Random(0)
+    return [
+        Event(
+            from_address=rng.randrange(2**251),
+            keys=[rng.randrange(2**251)],
+            data=[rng.randrange(2**251) for _ in range(3)],
+        )
+        for _ in range(count)
+    ]
+
+
+async def _hash_block(events: list, event_hasher: EventHasher) -> int:
+    transactions = max(len(events) // TRANSACTION_EVENTS, 1)
+    block_hash_kwargs = {
+        "general_config": StarknetGeneralConfig(),
+        "parent_hash": 0,
+        "block_number": 1,
+        "global_state_root": DUMMY_STATE_ROOT,
+        "block_timestamp": 0,
+        "tx_hashes": list(range(1, transactions + 1)),
+        "tx_signatures": [[1, 2]] * transactions,
+        "sequencer_address": 0,
+    }
+    if event_hasher is None:
+        return await calculate_block_hash(
+            **block_hash_kwargs, event_hashes=hash_events(events)
+        )
+
+    return await event_hasher.calculate_block_hash(**block_hash_kwargs, events=events)
+
+
+async def _benchmark(events: list, workers: int, blocks: int) -> float:
+    """Return the number of events hashed per second, as part of hashing blocks"""
+    event_hasher = EventHasher(workers) if workers else None
+    try:
+        # the first block starts the workers
+        await _hash_block(events, event_hasher)
+
+        start = time.perf_counter()
+        for _ in range(blocks):
+            await _hash_block(events, event_hasher)
+        return blocks * len(events) / (time.perf_counter() - start)
+    finally:
+        if event_hasher is not None:
+            event_hasher.close()
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--events",
+        type=int,
+        nargs="+",
+        default=[10, 100, 1_000, 10_000],
+        help="Events per block",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        nargs="+",
+        default=[0, 2, 4, 8],
+        help="Numbers of worker processes; 0 hashes in the main process",
+    )
+    parser.add_argument("--blocks", type=int, default=5)
+    args = parser.parse_args()
+
+    for event_count in args.events:
+        events = _generate_events(event_count)
+        for workers in args.workers:
+            throughput = asyncio.run(_benchmark(events, workers, args.blocks))
+            print(
+                f"{event_count:>8} events, {workers:>2} workers: "
+                f"{throughput:12.0f} events/s"
+            )
+
+
+if __name__ == "__main__":
+    main()
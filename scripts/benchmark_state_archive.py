@@ -0,0 +1,89 @@
+"""
+Script for comparing the memory usage and query latency of state archives.
+Usage: python scripts/benchmark_state_archive.py [--blocks N] [--initial-entries N] [--writes N]
+"""
+
+import argparse
+import asyncio
+import random
+import time
+import tracemalloc
+
+from starkware.starknet.testing.starknet import Starknet
+
+from starknet_devnet.state_archive import (
+    CheckpointStateArchive,
+    DeltaStateArchive,
+    MemoryStateArchive,
+)
+
+ARCHIVES = {
+    "memory": MemoryStateArchive,
+    "delta": DeltaStateArchive,
+    "checkpoint": CheckpointStateArchive,
+}
+
+
+async def _fill(archive, blocks: int, initial_entries: int, writes: int) -> float:
+    """Store `blocks` states in `archive`; return the average time of storing"""
+    rng = random.Random(0)
+    state = (await Starknet.empty()).state
+    for key in range(initial_entries):
+        await state.state.set_storage_at(1, key, key)
+
+    elapsed = 0.0
+    for number in range(blocks):
+        for _ in range(writes):
+            key = rng.randrange(initial_entries)
+            await state.state.set_storage_at(1, key, rng.randrange(2**64))
+
+        start = time.perf_counter()
+        archive.store(number, state)
+        elapsed += time.perf_counter() - start
+
+    return elapsed / blocks
+
+
+async def _query(archive, blocks: int, queries: int) -> float:
+    """Read storage from random archived states; return the average latency"""
+    rng = random.Random(1)
+    start = time.perf_counter()
+    for _ in range(queries):
+        state = archive.get(rng.randrange(blocks))
+        await state.state.get_storage_at(1, 0)
+    return (time.perf_counter() - start) / queries
+
+
+async def _benchmark(name: str, args: argparse.Namespace):
+    tracemalloc.start()
+    archive = ARCHIVES[name]()
+    baseline, _ = tracemalloc.get_traced_memory()
+    store_time = await _fill(archive, args.blocks, args.initial_entries, args.writes)
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    query_time = await _query(archive, args.blocks, args.queries)
+    print(
+        f"{name:>10}: memory {(memory - baseline) / 2**20:8.1f} MiB, "
+        f"store {store_time * 1000:8.2f} ms, query {query_time * 1000:8.2f} ms"
+    )
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--blocks", type=int, default=200)
+    parser.add_argument("--initial-entries", type=int, default=10_000)
+    parser.add_argument("--writes", type=int, default=20, help="Writes per block")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument(
+        "--archives", nargs="+", choices=list(ARCHIVES), default=list(ARCHIVES)
+    )
+    args = parser.parse_args()
+
+    for name in args.archives:
+        asyncio.run(_benchmark(name, args))
+
+
+if __name__ == "__main__":
+    main()
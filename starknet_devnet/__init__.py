@@ -61,9 +61,10 @@ _patch_poseidon_hash()
 
 
 def _patch_copy():
-    """Deep copy of a ContractClass takes a lot of time, but it should never be mutated."""
-
-    from copy import copy
+    """
+    Deep copy of a ContractClass takes a lot of time, but it should never be mutated,
+    so copies of a state share the classes (see ClassStore).
+    """
 
     from starkware.starknet.services.api.contract_class.contract_class import (
         CompiledClassBase,
@@ -74,7 +75,7 @@ def _patch_copy():
         """
         A dummy implementation of __deepcopy__
         """
-        return copy(self)
+        return self
 
     setattr(ContractClass, "__deepcopy__", simpler_copy)
     setattr(CompiledClassBase, "__deepcopy__", simpler_copy)
@@ -3,6 +3,8 @@ Block info generator for the Starknet Devnet.
 """
 
 import time
+from contextlib import contextmanager
+from typing import Iterator
 
 from starkware.starknet.business_logic.state.state import BlockInfo
 from starkware.starknet.definitions.general_config import StarknetGeneralConfig
@@ -18,6 +20,9 @@ def now() -> int:
 class BlockInfoGenerator:
     """Generator of BlockInfo objects with the correct timestamp"""
 
+    _frozen_time: int = None
+    """If set, used instead of the current time"""
+
     def __init__(self, start_time: int = None, gas_price: int = 0):
         self.block_timestamp_offset = 0
         self.next_block_start_time = start_time
@@ -28,10 +33,10 @@ class BlockInfoGenerator:
         Returns the next block info with the correct timestamp
         """
         if self.next_block_start_time is None:
-            block_timestamp = now() + self.block_timestamp_offset
+            block_timestamp = self.current_time() + self.block_timestamp_offset
         else:
             block_timestamp = self.next_block_start_time
-            self.block_timestamp_offset = block_timestamp - now()
+            self.block_timestamp_offset = block_timestamp - self.current_time()
             self.next_block_start_time = None
 
         return BlockInfo(
@@ -42,6 +47,22 @@ class BlockInfoGenerator:
             starknet_version=CAIRO_LANG_VERSION,
         )
 
+    def current_time(self) -> int:
+        """Return the current time in seconds, unless frozen"""
+        return now() if self._frozen_time is None else self._frozen_time
+
+    @contextmanager
+    def frozen_time(self, time_s: int) -> Iterator[None]:
+        """
+        Treat `time_s` as the current time within the context,
+        so that the generated timestamps can be reproduced
+        """
+        previous_time, self._frozen_time = self._frozen_time, time_s
+        try:
+            yield
+        finally:
+            self._frozen_time = previous_time
+
     def increase_time(self, time_s: int):
         """
         Increases block timestamp offset
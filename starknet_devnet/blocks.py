@@ -2,13 +2,16 @@
 Class for generating and handling blocks
 """
 
-from typing import Any, Dict, List, Optional, Sequence, Union
-
-from starkware.starknet.core.os.block_hash.block_hash import (
-    calculate_block_hash,
-    calculate_event_hash,
-)
+import asyncio
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from starkware.starknet.core.os.block_hash.block_hash import calculate_block_hash
 from starkware.starknet.definitions.error_codes import StarknetErrorCode
+from starkware.starknet.definitions.general_config import StarknetGeneralConfig
 from starkware.starknet.services.api.feeder_gateway.response_objects import (
     LATEST_BLOCK_ID,
     PENDING_BLOCK_ID,
@@ -16,13 +19,18 @@ from starkware.starknet.services.api.feeder_gateway.response_objects import (
     BlockStateUpdate,
     BlockStatus,
     StarknetBlock,
+    TransactionExecution,
+    TransactionSpecificInfo,
 )
 from starkware.starknet.testing.state import StarknetState
 from starkware.starkware_utils.error_handling import StarkErrorCode
 
 from .constants import CAIRO_LANG_VERSION, DUMMY_STATE_ROOT
+from .event_hasher import EventHasher, hash_events
+from .event_index import EventIndex
+from .lazy_dict import LazyDict
 from .origin import Origin
-from .state_archive import MemoryStateArchive
+from .state_archive import MemoryStateArchive, StateArchive
 from .transactions import DevnetTransaction
 from .util import StarknetDevnetException
 
@@ -70,20 +78,170 @@ def _parse_block_number(raw: Optional[Union[int, str]]) -> BlockIdentifier:
     )
 
 
+class PendingBlock:
+    """
+    The block being built, appended to transaction by transaction,
+    and only frozen into a `StarknetBlock` when read or stored
+    """
+
+    def __init__(self, parent_block_hash: Optional[int]):
+        self.parent_block_hash = parent_block_hash
+        """None until the parent is hashed, if it's hashed in background"""
+        self.transactions: List[TransactionSpecificInfo] = []
+        self.transaction_receipts: List[TransactionExecution] = []
+        self.signatures: List[List[int]] = []
+        self.timestamp: int = None
+        self.gas_price: int = None
+        self.sequencer_address: int = None
+        self.__block: Optional[StarknetBlock] = None
+
+    def append(self, transactions: List[DevnetTransaction], state: StarknetState):
+        """Append `transactions`, executed on `state`"""
+        for transaction in transactions:
+            self.transactions.append(
+                TransactionSpecificInfo.from_internal(transaction.internal_tx)
+            )
+            self.transaction_receipts.append(transaction.get_execution())
+            self.signatures.append(transaction.get_signature())
+
+        self.timestamp = state.state.block_info.block_timestamp
+        self.gas_price = state.state.block_info.gas_price
+        self.sequencer_address = state.general_config.sequencer_address
+        self.__block = None
+
+    def set_parent_block_hash(self, parent_block_hash: int):
+        """Set the hash of the parent, once it's hashed"""
+        self.parent_block_hash = parent_block_hash
+        self.__block = None
+
+    def freeze(self) -> StarknetBlock:
+        """Return the block with the transactions appended so far"""
+        if self.__block is None:
+            self.__block = StarknetBlock(
+                block_hash=None,
+                block_number=None,
+                state_root=None,
+                transactions=tuple(self.transactions),
+                timestamp=self.timestamp,
+                transaction_receipts=tuple(self.transaction_receipts),
+                status=BlockStatus.PENDING,
+                gas_price=self.gas_price,
+                sequencer_address=self.sequencer_address,
+                parent_block_hash=self.parent_block_hash,
+                starknet_version=CAIRO_LANG_VERSION,
+            )
+        return self.__block
+
+
+@dataclass
+class _SealedBlock:
+    """A block which got its number, stored as soon as its hash is known"""
+
+    block: StarknetBlock
+    """The pending block as it was when sealed"""
+    signatures: List[List[int]]
+    general_config: StarknetGeneralConfig
+    state_update: Optional[BlockStateUpdate]
+    on_stored: Optional[Callable[[StarknetBlock], None]]
+    parent_block_hash: Union[int, Future]
+    """The hash of the parent, or its future hash if the parent was still being hashed"""
+    block_hash: Optional[int] = None
+    hashing: Optional[Future] = None
+
+
+async def _calculate_block_hash(
+    sealed: _SealedBlock,
+    block_number: int,
+    parent_block_hash: int,
+    event_hasher: EventHasher = None,
+) -> int:
+    events = [
+        event
+        for receipt in sealed.block.transaction_receipts
+        for event in receipt.events
+    ]
+    block_hash_kwargs = {
+        "general_config": sealed.general_config,
+        "parent_hash": parent_block_hash,
+        "block_number": block_number,
+        "global_state_root": DUMMY_STATE_ROOT,
+        "block_timestamp": sealed.block.timestamp,
+        "tx_hashes": [tx.transaction_hash for tx in sealed.block.transactions],
+        "tx_signatures": sealed.signatures,
+        "sequencer_address": sealed.block.sequencer_address,
+    }
+    if event_hasher is None:
+        return await calculate_block_hash(
+            **block_hash_kwargs, event_hashes=hash_events(events)
+        )
+
+    return await event_hasher.calculate_block_hash(**block_hash_kwargs, events=events)
+
+
+def _calculate_block_hash_in_thread(
+    sealed: _SealedBlock,
+    block_number: int,
+    parent_block_hash: Union[int, Future],
+    event_hasher: EventHasher = None,
+) -> int:
+    """Calculate the block hash in a thread, with its own event loop"""
+    if isinstance(parent_block_hash, Future):
+        parent_block_hash = parent_block_hash.result()
+    return asyncio.run(
+        _calculate_block_hash(sealed, block_number, parent_block_hash, event_hasher)
+    )
+
+
 # pylint: disable=too-many-instance-attributes
 class DevnetBlocks:
     """This class is used to store the generated blocks of the devnet."""
 
-    def __init__(self, origin: Origin, lite=False) -> None:
+    def __init__(
+        self,
+        origin: Origin,
+        lite=False,
+        state_archive: StateArchive = None,
+        hash_in_background=False,
+        event_hasher: EventHasher = None,
+    ) -> None:
         self.origin = origin
         self.lite = lite
-        self.__hash2block: Dict[int, StarknetBlock] = {}
-        self.__state_updates: Dict[int, BlockStateUpdate] = {}
+        self.hash_in_background = hash_in_background
+        self.event_hasher = event_hasher
+        """If set, calculates the event hashes of blocks across processes"""
+        self.__hash2block: Dict[int, StarknetBlock] = LazyDict()
+        self.__state_updates: Dict[int, BlockStateUpdate] = LazyDict()
         self.__num2hash: Dict[int, int] = {}
-        self.__pending_block: StarknetBlock = None
+        self.__pending_block: PendingBlock = None
         self.__pending_state_update: BlockStateUpdate = None
-        self.__pending_signatures: Sequence[List[int]] = None
-        self.__state_archive = MemoryStateArchive()
+        self.__state_archive = state_archive or MemoryStateArchive()
+        """States of the blocks, by block number"""
+        self.__sealed: Dict[int, _SealedBlock] = {}
+        """Blocks which got their numbers but not yet their hashes, by block number"""
+        self.__hasher: Optional[ThreadPoolExecutor] = None
+        self.__hasher_pid: Optional[int] = None
+        self.__lock = threading.RLock()
+        """
+        Held while storing the hashed blocks (which reads handled in other threads can do too)
+        and while reading what the storing changes without waiting for the hashes first.
+        Once a read has waited for the hashes, the stored blocks don't change until the next write,
+        since blocks are only sealed by writes.
+        """
+        self.event_index = EventIndex()
+        """Index of the events in the blocks of this devnet (not the origin)"""
+
+    def __getstate__(self):
+        # the hashing thread isn't pickled, so the blocks it's hashing are stored first
+        self.__store_hashed_blocks(wait=True)
+        state = self.__dict__.copy()
+        state["_DevnetBlocks__hasher"] = None
+        state["_DevnetBlocks__hasher_pid"] = None
+        del state["_DevnetBlocks__lock"]
+        return state
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        self.__lock = threading.RLock()
 
     async def get_last_block(self) -> StarknetBlock:
         """Returns the last block stored so far."""
@@ -91,7 +249,12 @@ class DevnetBlocks:
 
     def get_number_of_accepted_blocks(self) -> int:
         """Returns the number of not aborted blocks."""
-        return len(self.__num2hash) + self.origin.get_number_of_blocks()
+        with self.__lock:
+            return (
+                len(self.__num2hash)
+                + len(self.__sealed)
+                + self.origin.get_number_of_blocks()
+            )
 
     def __assert_block_number_in_range(self, block_number: BlockIdentifier):
         if block_number < 0:
@@ -111,10 +274,11 @@ class DevnetBlocks:
     async def get_by_number(self, block_number: Optional[str]) -> StarknetBlock:
         """Returns the block whose block_number is provided"""
         block_number = _parse_block_number(block_number)
+        await self.wait_for_hashes()
 
         if block_number == PENDING_BLOCK_ID:
             if self.__pending_block:
-                return self.__pending_block
+                return self.__pending_block.freeze()
             # if no pending, default to latest
             block_number = LATEST_BLOCK_ID
 
@@ -134,6 +298,7 @@ class DevnetBlocks:
         Returns the block with the given block hash.
         """
         numeric_hash = _parse_block_hash(block_hash)
+        await self.wait_for_hashes()
 
         if numeric_hash in self.__hash2block:
             return self.__hash2block[numeric_hash]
@@ -147,6 +312,7 @@ class DevnetBlocks:
         Returns state update for the provided block hash or block number.
         It will return the last state update if block is not provided.
         """
+        await self.wait_for_hashes()
         if block_hash:
             numeric_hash = _parse_block_hash(block_hash)
 
@@ -188,34 +354,33 @@ class DevnetBlocks:
         Generates pending objects (block, updates) and stores them as private properties.
         The method `store_pending` can be used after this method.
         """
-        timestamp = state.state.block_info.block_timestamp
-        signatures = [tx.get_signature() for tx in transactions or []]
-        internal_transactions = [tx.internal_tx for tx in transactions or []]
-        transaction_receipts = tuple(tx.get_execution() for tx in transactions or ())
-
-        block_number = self.get_number_of_accepted_blocks()
-        if block_number == 0:
-            parent_block_hash = 0
-        else:
-            last_block = await self.get_last_block()
-            parent_block_hash = last_block.block_hash
-
-        self.__pending_block = StarknetBlock.create(
-            block_hash=None,
-            block_number=None,
-            state_root=None,
-            transactions=internal_transactions,
-            timestamp=timestamp,
-            transaction_receipts=transaction_receipts,
-            status=BlockStatus.PENDING,
-            gas_price=state.state.block_info.gas_price,
-            sequencer_address=state.general_config.sequencer_address,
-            parent_block_hash=parent_block_hash,
-            starknet_version=CAIRO_LANG_VERSION,
-        )
+        self.__pending_block = None
+        await self.append_pending(transactions, state, state_update)
 
+    async def append_pending(
+        self,
+        transactions: List[DevnetTransaction],
+        state: StarknetState,
+        state_update=None,
+    ):
+        """
+        Appends `transactions` to the pending block, generating it if there is none,
+        and replaces the pending state update with `state_update`.
+        """
+        if self.__pending_block is None:
+            block_number = self.get_number_of_accepted_blocks()
+            if self.__sealed:
+                # set once the sealed blocks are hashed
+                parent_block_hash = None
+            elif block_number == 0:
+                parent_block_hash = 0
+            else:
+                last_block = await self.get_last_block()
+                parent_block_hash = last_block.block_hash
+            self.__pending_block = PendingBlock(parent_block_hash)
+
+        self.__pending_block.append(transactions or [], state)
         self.__pending_state_update = state_update
-        self.__pending_signatures = signatures
 
     async def generate_empty_block(
         self, state: StarknetState, state_update: BlockStateUpdate
@@ -226,35 +391,68 @@ class DevnetBlocks:
         )
         return await self.store_pending(state, is_empty_block=True)
 
-    async def __calculate_pending_block_hash(
-        self, state: StarknetState, block_number: int, state_root: bytes
-    ):
-        event_hashes: List[int] = []
-        for receipt in self.__pending_block.transaction_receipts:
-            for event in receipt.events:
-                event_hashes.append(
-                    calculate_event_hash(
-                        from_address=event.from_address,
-                        keys=event.keys,
-                        data=event.data,
-                    )
-                )
+    def is_block_pending(self) -> bool:
+        """Return `True` if there is a pending block, oterhwise return `False`"""
+        return self.__pending_block is not None
 
-        return await calculate_block_hash(
+    async def seal_pending(
+        self,
+        state: StarknetState,
+        is_empty_block=False,
+        block_hash=None,
+        on_stored: Callable[[StarknetBlock], None] = None,
+    ) -> int:
+        """
+        Give the pending block the next block number and archive its state, effectively making it the latest.
+        Unless specified, the block hash is calculated, in a background thread if hashing in background.
+        The block is stored, and `on_stored` called with it, once hashed. Return the block number.
+        Set pending properties to None.
+        """
+        assert self.__pending_block
+
+        block_number = self.get_number_of_accepted_blocks()
+        parent_block_hash = self.__pending_block.parent_block_hash
+        if parent_block_hash is None:
+            parent = self.__sealed.get(block_number - 1)
+            if parent is None:
+                parent_block_hash = self.__num2hash[block_number - 1]
+            elif parent.block_hash is None:
+                parent_block_hash = parent.hashing
+            else:
+                parent_block_hash = parent.block_hash
+
+        sealed = _SealedBlock(
+            block=self.__pending_block.freeze(),
+            signatures=self.__pending_block.signatures,
             general_config=state.general_config,
-            parent_hash=self.__pending_block.parent_block_hash,
-            block_number=block_number,
-            global_state_root=state_root,
-            block_timestamp=self.__pending_block.timestamp,
-            tx_hashes=[tx.transaction_hash for tx in self.__pending_block.transactions],
-            tx_signatures=self.__pending_signatures,
-            event_hashes=event_hashes,
-            sequencer_address=self.__pending_block.sequencer_address,
+            state_update=self.__pending_state_update,
+            on_stored=on_stored,
+            parent_block_hash=parent_block_hash,
         )
+        if self.lite or is_empty_block:
+            sealed.block_hash = block_number
+        elif block_hash is not None:
+            sealed.block_hash = block_hash
+        elif self.hash_in_background:
+            sealed.hashing = self.__get_hasher().submit(
+                _calculate_block_hash_in_thread,
+                sealed,
+                block_number,
+                parent_block_hash,
+                self.event_hasher,
+            )
+        else:
+            sealed.block_hash = await _calculate_block_hash(
+                sealed, block_number, parent_block_hash, self.event_hasher
+            )
 
-    def is_block_pending(self) -> bool:
-        """Return `True` if there is a pending block, oterhwise return `False`"""
-        return self.__pending_block is not None
+        self.__state_archive.store(block_number, state)
+        self.__sealed[block_number] = sealed
+        self.__pending_block = None
+        self.__pending_state_update = None
+
+        self.__store_hashed_blocks()
+        return block_number
 
     async def store_pending(
         self, state: StarknetState, is_empty_block=False, block_hash=None
@@ -263,48 +461,148 @@ class DevnetBlocks:
         Store pending block, assign a block hash to it, effecitvely making it the latest.
         Set pending properties to None.
         """
-        assert self.__pending_block
+        block_number = await self.seal_pending(
+            state, is_empty_block=is_empty_block, block_hash=block_hash
+        )
+        return await self.get_by_number(block_number)
 
-        block_dict = self.__pending_block.dump()
+    def __get_hasher(self) -> ThreadPoolExecutor:
+        """
+        Return the executor calculating block hashes in background, started in this process.
+        Checking the pid is needed because threads don't survive forking.
+        """
+        if self.__hasher_pid != os.getpid():
+            self.__hasher = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="block-hasher"
+            )
+            self.__hasher_pid = os.getpid()
+        return self.__hasher
+
+    def __wait_for_hash(self, block_number: int, sealed: _SealedBlock) -> int:
+        if self.__hasher_pid == os.getpid():
+            return sealed.hashing.result()
+
+        # forked (e.g. to dump in background) without the hashing thread, so calculated again,
+        # in this process only; the parent is already stored
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            return executor.submit(
+                _calculate_block_hash_in_thread,
+                sealed,
+                block_number,
+                self.__num2hash[block_number - 1]
+                if isinstance(sealed.parent_block_hash, Future)
+                else sealed.parent_block_hash,
+            ).result()
+
+    def __store_hashed_blocks(self, wait=False):
+        """
+        Store the sealed blocks whose hashes are calculated, in the order of block numbers.
+        If `wait`, block until the hashes still being calculated are known.
+        """
+        with self.__lock:
+            while self.__sealed:
+                block_number, sealed = next(iter(self.__sealed.items()))
+                if sealed.block_hash is None:
+                    if sealed.hashing.done():
+                        sealed.block_hash = sealed.hashing.result()
+                    elif wait:
+                        sealed.block_hash = self.__wait_for_hash(block_number, sealed)
+                    else:
+                        return
+
+                del self.__sealed[block_number]
+                self.__store_block(block_number, sealed)
+
+            if self.__pending_block and self.__pending_block.parent_block_hash is None:
+                self.__pending_block.set_parent_block_hash(
+                    self.__num2hash[self.get_number_of_accepted_blocks() - 1]
+                )
 
-        block_dict["status"] = BlockStatus.ACCEPTED_ON_L2.name
-        state_root = DUMMY_STATE_ROOT
-        block_dict["state_root"] = state_root.hex()
+    def __store_block(self, block_number: int, sealed: _SealedBlock):
+        block_hash = sealed.block_hash
+        parent_block_hash = sealed.parent_block_hash
+        if isinstance(parent_block_hash, Future):
+            parent_block_hash = self.__num2hash[block_number - 1]
 
-        block_number = self.get_number_of_accepted_blocks()
+        block_dict = sealed.block.dump()
+        block_dict["status"] = BlockStatus.ACCEPTED_ON_L2.name
+        block_dict["state_root"] = DUMMY_STATE_ROOT.hex()
         block_dict["block_number"] = block_number
-
-        if self.lite or is_empty_block:
-            block_hash = block_number
-        elif block_hash is None:
-            block_hash = await self.__calculate_pending_block_hash(
-                state, block_number, state_root
-            )
-
         block_dict["block_hash"] = hex(block_hash)
+        block_dict["parent_block_hash"] = hex(parent_block_hash)
         self.__num2hash[block_number] = block_hash
 
-        if self.__pending_state_update is not None:
-            self.__pending_state_update = BlockStateUpdate(
+        state_update = sealed.state_update
+        if state_update is not None:
+            state_update = BlockStateUpdate(
                 block_hash=block_hash,
-                old_root=self.__pending_state_update.old_root,
-                new_root=self.__pending_state_update.new_root,
-                state_diff=self.__pending_state_update.state_diff,
+                old_root=state_update.old_root,
+                new_root=state_update.new_root,
+                state_diff=state_update.state_diff,
             )
-        self.__state_updates[block_hash] = self.__pending_state_update
-        self.__pending_state_update = None
+        self.__state_updates[block_hash] = state_update
 
         block = StarknetBlock.load(block_dict)
         self.__hash2block[block.block_hash] = block
-        self.__state_archive.store(block_hash, state)
+        self.event_index.add_block(block)
 
-        self.__pending_block = None
-        self.__pending_signatures = None
-        return block
+        if sealed.on_stored is not None:
+            sealed.on_stored(block)
+
+    async def wait_for_hashes(self):
+        """
+        Wait until the blocks being hashed in background are stored.
+        Other reads can be waiting at the same time, and any of them can store the blocks,
+        so the blocks being hashed are only inspected under the lock.
+        """
+        with self.__lock:
+            hashing = [
+                sealed.hashing
+                for sealed in self.__sealed.values()
+                if sealed.block_hash is None
+            ]
+        for future in hashing:
+            await asyncio.wrap_future(future)
+        self.__store_hashed_blocks()
 
     def get_state(self, block_hash: int) -> StarknetState:
-        """Return state at block with `number`"""
-        return self.__state_archive.get(block_hash)
+        """Return state at block with `block_hash`"""
+        block = self.__hash2block.get(block_hash)
+        if block is None or block.block_number is None:
+            raise StarknetDevnetException(
+                code=StarknetErrorCode.OUT_OF_RANGE_BLOCK_ID,
+                message=f"State at block {block_hash} not present",
+            )
+        return self.__state_archive.get(block.block_number)
+
+    def settle(self):
+        """
+        Store the blocks being hashed in background and wait until their states are archived,
+        so that no background thread holds a lock or is waited for (e.g. by a forked process)
+        """
+        self.__store_hashed_blocks(wait=True)
+        self.__state_archive.flush()
+
+    def get_latest_state(self) -> StarknetState:
+        """Return the state at the latest block, without waiting for it to be hashed"""
+        return self.__state_archive.get(self.get_number_of_accepted_blocks() - 1)
+
+    def close(self):
+        """Release the resources held by the state archive and the hashing workers"""
+        if self.__hasher is not None and self.__hasher_pid == os.getpid():
+            self.__hasher.shutdown()
+        if self.event_hasher is not None:
+            self.event_hasher.close()
+        self.__state_archive.close()
+
+    def get_dump_sections(self) -> Dict[str, LazyDict]:
+        """Return the containers which can be dumped and loaded item by item, by name"""
+        self.__store_hashed_blocks(wait=True)
+        return {
+            "blocks": self.__hash2block,
+            "state_updates": self.__state_updates,
+            **self.__state_archive.get_dump_sections(),
+        }
 
     @staticmethod
     def get_numeric_hash(block_hash: int):
@@ -316,6 +614,7 @@ class DevnetBlocks:
         Abort latest block.
         """
         numeric_hash = _parse_block_hash(block_hash)
+        await self.wait_for_hashes()
         block = self.__hash2block[numeric_hash]
 
         # This is done like this because the block object's properties cannot be modified
@@ -323,8 +622,9 @@ class DevnetBlocks:
         block_dict["status"] = BlockStatus.ABORTED.name
         block_dict["transaction_receipts"] = None
         del self.__num2hash[block_dict["block_number"]]
+        self.event_index.remove_block(block_dict["block_number"])
+        self.__state_archive.remove(block_dict["block_number"])
         block_dict["block_number"] = None
         self.__hash2block[numeric_hash] = StarknetBlock.load(block_dict)
-        self.__state_archive.remove(numeric_hash)
 
         return block.block_hash
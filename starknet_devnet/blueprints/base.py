@@ -108,6 +108,12 @@ def dump():
     return Response(status=200)
 
 
+@base.route("/dump_status", methods=["GET"])
+def dump_status():
+    """Get the dumps in progress and the recently completed ones"""
+    return jsonify(state.dumper.get_status())
+
+
 @base.route("/load", methods=["POST"])
 def load():
     """Loads the starknet_wrapper"""
@@ -198,7 +204,7 @@ async def mint():
     amount = extract_positive(request_json, "amount")
     is_lite = request_json.get("lite", False)
 
-    tx_hash = await state.starknet_wrapper.fee_token.mint(
+    tx_hash = await state.starknet_wrapper.mint(
         to_address=address, amount=amount, lite=is_lite
     )
 
@@ -233,3 +239,25 @@ async def abort_blocks():
     aborted_blocks = await state.starknet_wrapper.abort_blocks(starting_block)
 
     return jsonify({"aborted": aborted_blocks})
+
+
+@base.route("/stats", methods=["GET"])
+async def stats():
+    """Get statistics of devnet internals"""
+    fork_cache = state.starknet_wrapper.fork_cache
+    fork_requests = state.starknet_wrapper.fork_requests
+    dump_sections = {
+        name: {"items": len(section), "loaded": section.get_loaded_count()}
+        for name, section in state.starknet_wrapper.get_dump_sections().items()
+    }
+    return jsonify(
+        {
+            "call_cache": state.starknet_wrapper.call_cache.get_stats(),
+            "event_bloom_filters": state.starknet_wrapper.blocks.event_index.get_stats(),
+            "dump_sections": dump_sections,
+            "fork_cache": fork_cache.get_stats() if fork_cache else None,
+            "fork_requests": fork_requests.get_stats() if fork_requests else None,
+            "fork_origin_cache": state.starknet_wrapper.origin.get_cache_stats(),
+            "scheduler": state.scheduler.get_stats(),
+        }
+    )
@@ -4,13 +4,15 @@ RPC miscellaneous endpoints
 
 from __future__ import annotations
 
-from typing import List, Union
+from typing import AsyncIterator, Iterator, List, Tuple, Union
 
 from starkware.starknet.services.api.feeder_gateway.response_objects import (
     LATEST_BLOCK_ID,
     PENDING_BLOCK_ID,
     BlockStatus,
+    Event,
     StarknetBlock,
+    TransactionReceipt,
 )
 
 from starknet_devnet.blueprints.rpc.schema import validate_schema
@@ -31,8 +33,11 @@ from starknet_devnet.blueprints.rpc.utils import (
     get_block_by_block_id,
     rpc_felt,
 )
+from starknet_devnet.event_index import EventPosition
 from starknet_devnet.state import state
 
+CONTINUATION_TOKEN_SEPARATOR = "-"
+
 
 def check_address(address, event):
     """
@@ -59,27 +64,140 @@ def _check_keys(keys: List[List[Felt]], event):
     return True
 
 
-def _get_events_from_block(block: StarknetBlock, address, keys):
+MatchingEvent = Tuple[EventPosition, StarknetBlock, TransactionReceipt, Event]
+
+
+def _get_events_from_block(
+    block: StarknetBlock, block_number: int, address, keys
+) -> Iterator[MatchingEvent]:
     """
     Return filtered events.
     """
-    events = []
-    for receipt, event in [
-        (r, e) for r in block.transaction_receipts for e in r.events
-    ]:
-        if _check_keys(keys, event) and check_address(address, event):
-            _event: EmittedEvent = {
-                "from_address": rpc_felt(event.from_address),
-                "keys": [rpc_felt(e) for e in event.keys],
-                "data": [rpc_felt(d) for d in event.data],
-                # hash and number defaulting to 0 if None (if pending)
-                "block_hash": rpc_felt(block.block_hash or "0x0"),
-                "block_number": block.block_number or 0,
-                "transaction_hash": rpc_felt(receipt.transaction_hash),
-            }
-            events.append(_event)
-
-    return events
+    for tx_index, receipt in enumerate(block.transaction_receipts or []):
+        for event_index, event in enumerate(receipt.events):
+            if _check_keys(keys, event) and check_address(address, event):
+                yield (block_number, tx_index, event_index), block, receipt, event
+
+
+async def _get_indexed_events(
+    start: EventPosition, to_block_number: int, address, keys
+) -> AsyncIterator[MatchingEvent]:
+    """
+    Return filtered events of devnet blocks, visiting only those matching
+    the address and the first key according to the event index.
+    """
+    blocks = state.starknet_wrapper.blocks
+    positions = blocks.event_index.get_positions(
+        start,
+        to_block_number,
+        address=None if address is None else int(address, 0),
+        keys=keys,
+    )
+    # blocks are ruled out by bloom filters only if filtering by other keys than the first
+    uses_bloom_filters = any(keys[1:])
+
+    block = None
+    block_matched = False
+    for position in positions:
+        block_number, tx_index, event_index = position
+        if block is None or block.block_number != block_number:
+            if uses_bloom_filters and block is not None and not block_matched:
+                blocks.event_index.report_false_positive()
+            block = await blocks.get_by_number(block_number)
+            block_matched = False
+        receipt = block.transaction_receipts[tx_index]
+        event = receipt.events[event_index]
+        if _check_keys(keys, event):
+            block_matched = True
+            yield position, block, receipt, event
+
+    if uses_bloom_filters and block is not None and not block_matched:
+        blocks.event_index.report_false_positive()
+
+
+async def _get_events(
+    block_range: List[BlockId], address, keys, start: EventPosition = (0, 0, 0)
+) -> AsyncIterator[MatchingEvent]:
+    """Return filtered events of blocks in `block_range`, starting at `start` position"""
+    blocks = state.starknet_wrapper.blocks
+    # the event index isn't changed by storing blocks once they are all stored
+    await blocks.wait_for_hashes()
+    include_pending = block_range[-1:] == [PENDING_BLOCK_ID]
+    block_numbers = block_range[:-1] if include_pending else block_range
+
+    if block_numbers:
+        from_block_number = max(block_numbers[0], start[0])
+        to_block_number = block_numbers[-1]
+        # blocks of the forking origin are not indexed
+        first_indexed_block_number = max(
+            from_block_number, blocks.origin.get_number_of_blocks()
+        )
+        for block_number in range(
+            from_block_number, min(to_block_number + 1, first_indexed_block_number)
+        ):
+            block = await blocks.get_by_number(block_number)
+            for matching_event in _get_events_from_block(
+                block, block_number, address, keys
+            ):
+                if matching_event[0] >= start:
+                    yield matching_event
+
+        if first_indexed_block_number <= to_block_number:
+            async for matching_event in _get_indexed_events(
+                max(start, (first_indexed_block_number, 0, 0)),
+                to_block_number,
+                address,
+                keys,
+            ):
+                yield matching_event
+
+    if include_pending:
+        block = await blocks.get_by_number(PENDING_BLOCK_ID)
+        # the number the pending block is going to get
+        block_number = blocks.get_number_of_accepted_blocks()
+        for matching_event in _get_events_from_block(
+            block, block_number, address, keys
+        ):
+            if matching_event[0] >= start:
+                yield matching_event
+
+
+def _parse_continuation_token(token: str) -> Union[int, EventPosition]:
+    """
+    Return the position of the first event of the page, encoded in the token.
+    Tokens that are a single number are chunk numbers, as issued by older versions.
+    """
+    try:
+        parts = [int(part) for part in token.split(CONTINUATION_TOKEN_SEPARATOR)]
+    except ValueError:
+        parts = []
+    if len(parts) == 1:
+        return parts[0]
+    if len(parts) == 3:
+        return tuple(parts)
+
+    raise RpcError(
+        code=PredefinedRpcErrorCode.INVALID_PARAMS.value,
+        message=f"invalid continuation_token: '{token}'",
+    )
+
+
+def _to_continuation_token(position: EventPosition) -> str:
+    return CONTINUATION_TOKEN_SEPARATOR.join(str(part) for part in position)
+
+
+def _to_emitted_event(
+    _: EventPosition, block: StarknetBlock, receipt: TransactionReceipt, event: Event
+) -> EmittedEvent:
+    return {
+        "from_address": rpc_felt(event.from_address),
+        "keys": [rpc_felt(e) for e in event.keys],
+        "data": [rpc_felt(d) for d in event.data],
+        # hash and number defaulting to 0 if None (if pending)
+        "block_hash": rpc_felt(block.block_hash or "0x0"),
+        "block_number": block.block_number or 0,
+        "transaction_hash": rpc_felt(receipt.transaction_hash),
+    }
 
 
 @validate_schema("chainId")
@@ -130,11 +248,13 @@ async def get_events(
     """
     Returns all events matching the given filters.
 
-    In our implementation continuation_token is just a number.
+    The continuation token encodes the position (block number, transaction index, event index)
+    of the first event of the next page, so a page is resumed without rescanning the previous ones.
+    Tokens consisting of a single number are treated as chunk numbers (as issued by older versions).
 
-    In state.starknet_wrapper.get_state().events there is no relation between blocks.
-    This is why we need to iterate block by block, take all events,
-    and chunk it later which is not an optimal solution.
+    Events of devnet blocks are looked up in the event index (by address and the first key),
+    so only the matching events are visited. Blocks of the forking origin and the pending block
+    are not indexed, so they are iterated.
     """
     # Required parameters
     from_block = await get_block_by_block_id(
@@ -158,25 +278,51 @@ async def get_events(
     else:
         keys = []
     # Optional parameter
-    continuation_token = int(filter.get("continuation_token", "0"))
+    continuation_token = filter.get("continuation_token")
+    start = (
+        (0, 0, 0)
+        if continuation_token is None
+        else _parse_continuation_token(continuation_token)
+    )
+
+    if isinstance(start, int):
+        return await _get_events_chunk(block_range, address, keys, start, chunk_size)
 
+    # take one more, to know where the next page starts
     events = []
+    async for matching_event in _get_events(block_range, address, keys, start):
+        events.append(matching_event)
+        if len(events) > chunk_size:
+            break
 
-    for block_number in block_range:
-        block = await state.starknet_wrapper.blocks.get_by_number(block_number)
-        if block.transaction_receipts:
-            events.extend(_get_events_from_block(block, address, keys))
+    chunked_events = [_to_emitted_event(*event) for event in events[:chunk_size]]
+    if len(events) > chunk_size:
+        return RpcEventsResult(
+            events=chunked_events,
+            continuation_token=_to_continuation_token(events[chunk_size][0]),
+        )
+
+    return RpcEventsResultWithoutContinuationToken(events=chunked_events)
+
+
+async def _get_events_chunk(
+    block_range: List[BlockId], address, keys, chunk_number: int, chunk_size: int
+) -> Union[RpcEventsResult, RpcEventsResultWithoutContinuationToken]:
+    """Paging by chunk numbers, used by older versions as continuation tokens"""
+    events = [event async for event in _get_events(block_range, address, keys)]
 
     # Chunking
-    start_index = continuation_token * chunk_size
-    chunked_events = events[start_index : start_index + chunk_size]
+    start_index = chunk_number * chunk_size
+    chunked_events = [
+        _to_emitted_event(*event)
+        for event in events[start_index : start_index + chunk_size]
+    ]
     remaining_events_length = len(events) - start_index
 
     # Continuation_token should be increased only if events are not empty
     if remaining_events_length > chunk_size:
-        continuation_token = continuation_token + 1
         return RpcEventsResult(
-            events=chunked_events, continuation_token=str(continuation_token)
+            events=chunked_events, continuation_token=str(chunk_number + 1)
         )
 
     return RpcEventsResultWithoutContinuationToken(events=chunked_events)
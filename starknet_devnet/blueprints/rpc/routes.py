@@ -77,9 +77,22 @@ methods = {
     "simulateTransaction": simulate_transaction,
 }
 
+state_changing_methods = {
+    "addInvokeTransaction",
+    "addDeclareTransaction",
+    "addDeployAccountTransaction",
+}
+
 rpc = Blueprint("rpc", __name__, url_prefix="/rpc")
 
 
+def changes_state(body) -> bool:
+    """Return `True` if the RPC call with `body` changes the state"""
+    if not isinstance(body, dict) or not isinstance(body.get("method"), str):
+        return False
+    return body["method"].replace("starknet_", "") in state_changing_methods
+
+
 @rpc.route("", methods=["POST"])
 async def base_route():
     """
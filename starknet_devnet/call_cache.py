@@ -0,0 +1,75 @@
+"""
+Cache of the results of calls on the states of past blocks
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional, Tuple
+
+
+class CallResultCache:
+    """
+    Bounded cache of the results of calls, by block hash, contract address, selector and calldata.
+    The state of a past block never changes, so its results are only invalidated
+    (by `clear`) when blocks are aborted. The least recently used results are dropped first.
+    """
+
+    CACHE_SIZE = 4096
+    """Maximum number of cached results"""
+
+    def __init__(self, cache_size: int = CACHE_SIZE):
+        self.__cache_size = cache_size
+        self.__lock = threading.Lock()
+        self.__results: Dict[Hashable, Tuple[int, ...]] = OrderedDict()
+        self.__hits = 0
+        self.__misses = 0
+
+    def __getstate__(self):
+        # the results are rebuilt on demand, e.g. after loading
+        return {"cache_size": self.__cache_size}
+
+    def __setstate__(self, state: dict):
+        self.__init__(**state)
+
+    @staticmethod
+    def get_key(
+        block_hash: int, contract_address: int, selector: int, calldata: List[int]
+    ) -> Hashable:
+        """Return the key of the result of calling `selector` with `calldata` at `block_hash`"""
+        return (block_hash, contract_address, selector, tuple(calldata))
+
+    def get(self, key: Hashable) -> Optional[Tuple[int, ...]]:
+        """Return the result cached under `key`, or `None`"""
+        with self.__lock:
+            result = self.__results.get(key)
+            if result is None:
+                self.__misses += 1
+                return None
+
+            self.__hits += 1
+            self.__results.move_to_end(key)
+            return result
+
+    def put(self, key: Hashable, result: List[int]):
+        """Cache `result` under `key`"""
+        with self.__lock:
+            self.__results[key] = tuple(result)
+            self.__results.move_to_end(key)
+            if len(self.__results) > self.__cache_size:
+                self.__results.popitem(last=False)
+
+    def clear(self):
+        """Drop all results, e.g. when the blocks they were cached for are aborted"""
+        with self.__lock:
+            self.__results.clear()
+
+    def get_stats(self) -> dict:
+        """Return how many calls were answered from the cache"""
+        with self.__lock:
+            calls = self.__hits + self.__misses
+            return {
+                "size": len(self.__results),
+                "hits": self.__hits,
+                "misses": self.__misses,
+                "hit_ratio": self.__hits / calls if calls else None,
+            }
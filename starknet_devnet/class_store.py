@@ -0,0 +1,149 @@
+"""
+Content-addressed store of contract classes, shared by the states of all blocks
+"""
+
+import io
+import pickle
+import threading
+from typing import Any, Dict, Optional, Union
+
+import cloudpickle
+from starkware.starknet.business_logic.state.state_api import StateReader
+from starkware.starknet.services.api.contract_class.contract_class import (
+    CompiledClassBase,
+    ContractClass,
+)
+
+from .lazy_dict import LazyDict
+
+StoredClass = Union[CompiledClassBase, ContractClass]
+
+
+class _ClassPickler(cloudpickle.CloudPickler):
+    """Pickler replacing the stored classes with their hashes"""
+
+    def __init__(self, file: io.BytesIO, hashes: Dict[int, int]):
+        super().__init__(file)
+        self.__hashes = hashes
+
+    def persistent_id(self, obj: Any) -> Optional[int]:
+        return self.__hashes.get(id(obj))
+
+
+class _ClassUnpickler(pickle.Unpickler):
+    """Unpickler resolving the hashes of the stored classes"""
+
+    def __init__(self, file: io.BytesIO, class_store: "ClassStore"):
+        super().__init__(file)
+        self.__class_store = class_store
+
+    def persistent_load(self, pid: int) -> StoredClass:
+        return self.__class_store.get(pid)
+
+
+class ClassStore:
+    """
+    Contract classes by hash (the compiled class hash for compiled Cairo 1 classes).
+    Classes are never mutated, so a single instance of each is referenced by the states
+    of all blocks, including the archived ones, and serialized once per dump.
+    """
+
+    def __init__(self):
+        self.__classes = LazyDict()
+        # states are serialized in background threads (e.g. by the disk archive) while classes are added
+        self.__lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_ClassStore__lock"]
+        return state
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        self.__lock = threading.Lock()
+
+    def __deepcopy__(self, memo):
+        # shared by the copies of a state, like the classes themselves
+        return self
+
+    def __contains__(self, class_hash: int) -> bool:
+        return class_hash in self.__classes
+
+    def __len__(self) -> int:
+        return len(self.__classes)
+
+    def add(self, class_hash: int, contract_class: StoredClass) -> StoredClass:
+        """Store `contract_class` unless a class with `class_hash` is stored; return the stored one"""
+        with self.__lock:
+            if class_hash not in self.__classes:
+                self.__classes[class_hash] = contract_class
+            return self.__classes[class_hash]
+
+    def get(self, class_hash: int) -> StoredClass:
+        """Return the class stored under `class_hash`"""
+        return self.__classes[class_hash]
+
+    def intern(self, compiled_classes: Dict[int, CompiledClassBase]):
+        """
+        Store the classes of `compiled_classes` (e.g. cached by a state)
+        and replace them with the stored instances, so that they aren't held twice
+        """
+        for class_hash, compiled_class in compiled_classes.items():
+            stored_class = self.add(class_hash, compiled_class)
+            if stored_class is not compiled_class:
+                compiled_classes[class_hash] = stored_class
+
+    def get_dump_section(self) -> LazyDict:
+        """Return the container of the classes, dumped and loaded class by class"""
+        return self.__classes
+
+    def dumps(self, obj: Any) -> bytes:
+        """Serialize `obj` (e.g. a state), referring to the stored classes by their hashes"""
+        with self.__lock:
+            hashes = {
+                id(self.__classes[class_hash]): class_hash
+                for class_hash in self.__classes
+                if self.__classes.is_loaded(class_hash)
+            }
+        file = io.BytesIO()
+        _ClassPickler(file, hashes).dump(obj)
+        return file.getvalue()
+
+    def loads(self, data: bytes) -> Any:
+        """Deserialize `data` written by `dumps`"""
+        return _ClassUnpickler(io.BytesIO(data), self).load()
+
+
+class ClassStoreStateReader(StateReader):
+    """
+    Reads from `state_reader`, replacing the classes it returns with the instances
+    in `class_store`, so that states reading a class separately don't hold separate copies
+    """
+
+    def __init__(self, state_reader: StateReader, class_store: ClassStore):
+        self.__state_reader = state_reader
+        self.__class_store = class_store
+
+    async def get_compiled_class(self, compiled_class_hash: int) -> CompiledClassBase:
+        compiled_class = await self.__state_reader.get_compiled_class(
+            compiled_class_hash
+        )
+        return self.__class_store.add(compiled_class_hash, compiled_class)
+
+    async def get_compiled_class_by_class_hash(
+        self, class_hash: int
+    ) -> CompiledClassBase:
+        # e.g. overridden by the reader of a forked state
+        return await self.__state_reader.get_compiled_class_by_class_hash(class_hash)
+
+    async def get_compiled_class_hash(self, class_hash: int) -> int:
+        return await self.__state_reader.get_compiled_class_hash(class_hash)
+
+    async def get_class_hash_at(self, contract_address: int) -> int:
+        return await self.__state_reader.get_class_hash_at(contract_address)
+
+    async def get_nonce_at(self, contract_address: int) -> int:
+        return await self.__state_reader.get_nonce_at(contract_address)
+
+    async def get_storage_at(self, contract_address: int, key: int) -> int:
+        return await self.__state_reader.get_storage_at(contract_address, key)
@@ -14,6 +14,9 @@ DEFAULT_PORT = 5050
 DEFAULT_ACCOUNTS = 10
 DEFAULT_INITIAL_BALANCE = 10**21
 DEFAULT_GAS_PRICE = 10**8
+DEFAULT_CHECKPOINT_INTERVAL = 32
+DEFAULT_DUMP_SNAPSHOT_INTERVAL = 100
+DEFAULT_FORK_MAX_CONCURRENT_REQUESTS = 16
 
 SUPPORTED_TX_VERSION = 1
 SUPPORTED_RPC_TX_VERSION = 1
@@ -25,6 +28,7 @@ DUMMY_STATE_ROOT = bytes(32)
 DUMMY_PENDING_BLOCK_HASH = 0
 
 DEFAULT_TIMEOUT = 60  # seconds
+DEFAULT_REQUEST_THREADS = 1
 
 OLD_SUPPORTED_VERSIONS = [0]
 
@@ -2,12 +2,13 @@
 
 import argparse
 import asyncio
+import dbm
 import json
 import os
 import subprocess
 import sys
 from enum import Enum, auto
-from typing import List
+from typing import List, Set
 
 from aiohttp.client_exceptions import ClientConnectorError, InvalidURL
 from marshmallow.exceptions import ValidationError
@@ -23,15 +24,22 @@ from starkware.starknet.services.api.feeder_gateway.feeder_gateway_client import
     FeederGatewayClient,
 )
 
-from starknet_devnet.util import suppress_feeder_gateway_client_logger
+from starknet_devnet.util import (
+    check_valid_dump_path,
+    suppress_feeder_gateway_client_logger,
+)
 
 from . import __version__
 from .constants import (
     DEFAULT_ACCOUNTS,
+    DEFAULT_CHECKPOINT_INTERVAL,
+    DEFAULT_DUMP_SNAPSHOT_INTERVAL,
+    DEFAULT_FORK_MAX_CONCURRENT_REQUESTS,
     DEFAULT_GAS_PRICE,
     DEFAULT_HOST,
     DEFAULT_INITIAL_BALANCE,
     DEFAULT_PORT,
+    DEFAULT_REQUEST_THREADS,
     DEFAULT_TIMEOUT,
 )
 from .contract_class_wrapper import (
@@ -39,6 +47,11 @@ from .contract_class_wrapper import (
     DEFAULT_ACCOUNT_PATH,
     CompiledClassWrapper,
 )
+from .fork_fixture import (
+    FixtureFeederGatewayClient,
+    RecordingFeederGatewayClient,
+    is_fork_fixture,
+)
 
 NETWORK_TO_URL = {
     "alpha-goerli": "https://alpha4.starknet.io",
@@ -74,6 +87,16 @@ def _fork_block(specifier: str):
     return parsed
 
 
+def _parse_contract_addresses(addresses: str) -> Set[int]:
+    """Parse comma-separated hex contract addresses"""
+    try:
+        return {int(address, 16) for address in addresses.split(",")}
+    except ValueError:
+        sys.exit(
+            f"Error: --fork-prefetch-contracts must be comma-separated hex addresses; got: {addresses}"
+        )
+
+
 def _chain_id(chain_id: str):
     """Parse chain id.'"""
     try:
@@ -106,6 +129,49 @@ def _parse_dump_on(option: str):
     )
 
 
+class DumpFormat(Enum):
+    """Enumerate possible formats of dumps."""
+
+    PICKLE = auto()
+    LOG = auto()
+    ZIP = auto()
+
+
+DUMP_FORMAT_OPTIONS = [e.name.lower() for e in DumpFormat]
+DUMP_FORMAT_OPTIONS_STRINGIFIED = ", ".join(DUMP_FORMAT_OPTIONS)
+
+
+def _parse_dump_format(option: str):
+    """Parse dump format option."""
+    if option in DUMP_FORMAT_OPTIONS:
+        return DumpFormat[option.upper()]
+    sys.exit(
+        f"Error: Invalid --dump-format option: {option}. Valid options: {DUMP_FORMAT_OPTIONS_STRINGIFIED}"
+    )
+
+
+class StateArchiveType(Enum):
+    """Enumerate possible ways of archiving the states of past blocks."""
+
+    MEMORY = auto()
+    DELTA = auto()
+    DISK = auto()
+    CHECKPOINT = auto()
+
+
+STATE_ARCHIVE_OPTIONS = [e.name.lower() for e in StateArchiveType]
+STATE_ARCHIVE_OPTIONS_STRINGIFIED = ", ".join(STATE_ARCHIVE_OPTIONS)
+
+
+def _parse_state_archive(option: str):
+    """Parse state archive option."""
+    if option in STATE_ARCHIVE_OPTIONS:
+        return StateArchiveType[option.upper()]
+    sys.exit(
+        f"Error: Invalid --state-archive option: {option}. Valid options: {STATE_ARCHIVE_OPTIONS_STRINGIFIED}"
+    )
+
+
 EXPECTED_ACCOUNT_METHODS = ["__execute__", "__validate__", "__validate_declare__"]
 
 
@@ -143,13 +209,29 @@ def _parse_account_class(class_path: str) -> CompiledClassWrapper:
     return CompiledClassWrapper(contract_class, class_hash)
 
 
-def _get_feeder_gateway_client(url: str, block_id: str, n_retries: int = 1):
-    """Construct a feeder gateway client at url and block"""
+def _get_feeder_gateway_client(
+    url: str, block_id: str, n_retries: int = 1, record_path: str = None
+):
+    """
+    Construct a feeder gateway client at url (or at the fork fixture at url) and block.
+    If `record_path` is provided, the responses are recorded to a fork fixture there.
+    """
 
-    feeder_gateway_client = FeederGatewayClient(
-        url=url,
-        retry_config=RetryConfig(n_retries=n_retries),
-    )
+    if is_fork_fixture(url):
+        try:
+            feeder_gateway_client = FixtureFeederGatewayClient(url)
+        except ValueError as error:
+            sys.exit(f"Error: Invalid fork fixture: {error}")
+    else:
+        feeder_gateway_client = FeederGatewayClient(
+            url=url,
+            retry_config=RetryConfig(n_retries=n_retries),
+        )
+
+    if record_path:
+        feeder_gateway_client = RecordingFeederGatewayClient(
+            feeder_gateway_client, record_path
+        )
 
     try:
         with suppress_feeder_gateway_client_logger:
@@ -286,17 +368,79 @@ def parse_args(raw_args: List[str]):
         help=f"Specify when to dump; can dump on: {DUMP_ON_OPTIONS_STRINGIFIED}",
         type=_parse_dump_on,
     )
+    parser.add_argument(
+        "--dump-format",
+        type=_parse_dump_format,
+        default=DumpFormat.PICKLE,
+        help=f"Specify the format of dumps; can be one of: {DUMP_FORMAT_OPTIONS_STRINGIFIED}; "
+        "defaults to pickle (the whole instance, rewritten on each dump); "
+        "log appends the operations performed since the previous dump to a snapshot at --dump-path; "
+        "zip stores blocks, transactions, classes and archived states separately compressed, "
+        "so that loading only reads them when needed",
+    )
+    parser.add_argument(
+        "--dump-in-background",
+        action="store_true",
+        help="Dump in a forked process, without blocking the handling of requests; "
+        "doesn't apply to dumping on exit",
+    )
+    parser.add_argument(
+        "--dump-snapshot-interval",
+        action=PositiveAction,
+        help="Specify after how many logged operations the log at --dump-path is replaced with a new snapshot; "
+        f"requires --dump-format log; defaults to {DEFAULT_DUMP_SNAPSHOT_INTERVAL}",
+    )
     parser.add_argument(
         "--lite-mode",
         action="store_true",
         help="Introduces speed-up by skipping block hash calculation"
         " - applies sequential numbering instead (0x0, 0x1, 0x2, ...).",
     )
+    parser.add_argument(
+        "--hash-blocks-in-background",
+        action="store_true",
+        help="Calculate block hashes in a background thread, so that transactions don't wait for them; "
+        "blocks and their transactions are readable (as accepted) once hashed",
+    )
+    parser.add_argument(
+        "--event-hash-workers",
+        action=PositiveAction,
+        help="Specify the number of processes calculating the event and transaction hashes of a block in parallel, "
+        "which speeds up hashing blocks with many events; by default, they're calculated by the main process",
+    )
+    parser.add_argument(
+        "--simulation-workers",
+        action=PositiveAction,
+        help="Specify the number of processes simulating transactions for fee estimation and simulation "
+        "on the latest and pending state, so that simulations run in parallel and don't block other requests; "
+        "by default, they're simulated by the main process",
+    )
     parser.add_argument(
         "--blocks-on-demand",
         action="store_true",
         help="Block generation on demand via an endpoint.",
     )
+    parser.add_argument(
+        "--state-archive",
+        type=_parse_state_archive,
+        default=StateArchiveType.MEMORY,
+        help="Specify how the states of past blocks are archived; "
+        f"can be one of: {STATE_ARCHIVE_OPTIONS_STRINGIFIED}; defaults to memory "
+        "(a full copy per block); delta stores only the changes of each block; "
+        "disk stores the states in a file, keeping only the recently used ones in memory; "
+        "checkpoint stores a full copy every --checkpoint-interval blocks and only the changes in between",
+    )
+    parser.add_argument(
+        "--state-archive-path",
+        help="Specify the path of the file used by --state-archive disk, which mustn't exist yet; "
+        "defaults to a file in a new temporary directory",
+    )
+    parser.add_argument(
+        "--checkpoint-interval",
+        action=PositiveAction,
+        help="Specify how many blocks apart the full states are stored by --state-archive checkpoint; "
+        f"defaults to {DEFAULT_CHECKPOINT_INTERVAL}",
+    )
     parser.add_argument(
         "--accounts",
         action=NonNegativeAction,
@@ -345,6 +489,14 @@ def parse_args(raw_args: List[str]):
         default=DEFAULT_TIMEOUT,
         help=f"Specify the server timeout in seconds; defaults to {DEFAULT_TIMEOUT}",
     )
+    parser.add_argument(
+        "--request-threads",
+        action=PositiveAction,
+        default=DEFAULT_REQUEST_THREADS,
+        help="Specify the number of threads handling requests; requests changing the state "
+        "are still handled one at a time, in the order of arrival, while those only reading it "
+        f"are handled concurrently; defaults to {DEFAULT_REQUEST_THREADS}",
+    )
     parser.add_argument(
         "--account-class",
         help="Specify the account implementation to be used for predeploying; "
@@ -356,8 +508,9 @@ def parse_args(raw_args: List[str]):
     parser.add_argument(
         "--fork-network",
         type=_fork_network,
-        help="Specify the network to fork: can be a URL (e.g. https://alpha-mainnet.starknet.io) "
-        f"or network name (valid names: {', '.join(NETWORK_TO_URL.keys())})",
+        help="Specify the network to fork: can be a URL (e.g. https://alpha-mainnet.starknet.io), "
+        f"network name (valid names: {', '.join(NETWORK_TO_URL.keys())}) "
+        "or the path to a fixture recorded with --fork-record-path",
     )
     parser.add_argument(
         "--fork-block",
@@ -371,6 +524,39 @@ def parse_args(raw_args: List[str]):
         action=PositiveAction,
         help="Specify the number of retries of failed HTTP requests sent to the network before giving up; defaults to 1",
     )
+    parser.add_argument(
+        "--fork-max-concurrent-requests",
+        type=int,
+        default=DEFAULT_FORK_MAX_CONCURRENT_REQUESTS,
+        action=PositiveAction,
+        help="Specify the maximum number of requests sent to --fork-network at the same time; "
+        "identical requests sent at the same time are sent only once; "
+        f"defaults to {DEFAULT_FORK_MAX_CONCURRENT_REQUESTS}",
+    )
+    parser.add_argument(
+        "--fork-cache-path",
+        help="Specify the file where the responses of --fork-network at --fork-block are cached, "
+        "so that they aren't requested again after restarting; by default, they are cached only in memory",
+    )
+    parser.add_argument(
+        "--fork-prefetch-blocks",
+        type=int,
+        default=0,
+        action=NonNegativeAction,
+        help="Specify the number of blocks up to --fork-block whose changes of storage, nonces and "
+        "class hashes are cached on start-up, so that they aren't requested while executing; defaults to 0",
+    )
+    parser.add_argument(
+        "--fork-prefetch-contracts",
+        type=_parse_contract_addresses,
+        help="Specify comma-separated addresses of contracts whose class hashes, nonces and classes are "
+        "requested on start-up; if provided, --fork-prefetch-blocks only caches the changes of these contracts",
+    )
+    parser.add_argument(
+        "--fork-record-path",
+        help="Specify the file where the responses of --fork-network are recorded, "
+        "so that it can be forked from that file, e.g. in tests without network access",
+    )
     parser.add_argument(
         "--chain-id",
         type=_chain_id,
@@ -403,13 +589,72 @@ def parse_args(raw_args: List[str]):
     if parsed_args.dump_on and not parsed_args.dump_path:
         sys.exit("Error: --dump-path required if --dump-on present")
 
+    if parsed_args.dump_in_background and parsed_args.dump_format is DumpFormat.LOG:
+        sys.exit("Error: --dump-in-background can't be combined with --dump-format log")
+
+    if parsed_args.hash_blocks_in_background and parsed_args.lite_mode:
+        sys.exit("Error: --hash-blocks-in-background can't be combined with --lite-mode")
+
+    if parsed_args.event_hash_workers and parsed_args.lite_mode:
+        sys.exit("Error: --event-hash-workers can't be combined with --lite-mode")
+
+    if parsed_args.simulation_workers and parsed_args.fork_network:
+        sys.exit("Error: --simulation-workers can't be combined with --fork-network")
+
+    # after aborting blocks, the state of the other archives is a view over an archived state,
+    # which the workers don't hold
+    if (
+        parsed_args.simulation_workers
+        and parsed_args.state_archive is not StateArchiveType.MEMORY
+    ):
+        sys.exit("Error: --simulation-workers requires --state-archive memory")
+
+    if parsed_args.dump_snapshot_interval is None:
+        parsed_args.dump_snapshot_interval = DEFAULT_DUMP_SNAPSHOT_INTERVAL
+    elif parsed_args.dump_format is not DumpFormat.LOG:
+        sys.exit("Error: --dump-snapshot-interval requires --dump-format log")
+
+    if parsed_args.state_archive_path:
+        if parsed_args.state_archive is not StateArchiveType.DISK:
+            sys.exit("Error: --state-archive-path requires --state-archive disk")
+        try:
+            check_valid_dump_path(parsed_args.state_archive_path)
+        except ValueError as error:
+            sys.exit(f"Error: Invalid --state-archive-path: {error}")
+        # dbm might add a suffix to the path
+        if (
+            os.path.exists(parsed_args.state_archive_path)
+            or dbm.whichdb(parsed_args.state_archive_path) is not None
+        ):
+            sys.exit(
+                f"Error: --state-archive-path already exists: {parsed_args.state_archive_path}"
+            )
+
+    if parsed_args.checkpoint_interval is None:
+        parsed_args.checkpoint_interval = DEFAULT_CHECKPOINT_INTERVAL
+    elif parsed_args.state_archive is not StateArchiveType.CHECKPOINT:
+        sys.exit("Error: --checkpoint-interval requires --state-archive checkpoint")
+
     if parsed_args.fork_block and not parsed_args.fork_network:
         sys.exit("Error: --fork-network required if --fork-block present")
 
+    if parsed_args.fork_record_path and not parsed_args.fork_network:
+        sys.exit("Error: --fork-network required if --fork-record-path present")
+
+    if (
+        parsed_args.fork_prefetch_blocks or parsed_args.fork_prefetch_contracts
+    ) and not parsed_args.fork_network:
+        sys.exit(
+            "Error: --fork-network required if --fork-prefetch-blocks or --fork-prefetch-contracts present"
+        )
+
     if parsed_args.fork_network:
         parsed_args.fork_block = parsed_args.fork_block or "latest"
         parsed_args.fork_network, parsed_args.fork_block = _get_feeder_gateway_client(
-            parsed_args.fork_network, parsed_args.fork_block, parsed_args.fork_retries
+            parsed_args.fork_network,
+            parsed_args.fork_block,
+            parsed_args.fork_retries,
+            parsed_args.fork_record_path,
         )
 
     if parsed_args.cairo_compiler_manifest and parsed_args.sierra_compiler_path:
@@ -436,10 +681,28 @@ class DevnetConfig:
         self.allow_max_fee_zero = self.args.allow_max_fee_zero
         self.lite_mode = self.args.lite_mode
         self.blocks_on_demand = self.args.blocks_on_demand
+        self.hash_blocks_in_background = self.args.hash_blocks_in_background
+        self.event_hash_workers = self.args.event_hash_workers
+        self.simulation_workers = self.args.simulation_workers
+        self.state_archive = self.args.state_archive
+        self.state_archive_path = self.args.state_archive_path
+        self.checkpoint_interval = self.args.checkpoint_interval
         self.account_class = self.args.account_class
         self.hide_predeployed_accounts = self.args.hide_predeployed_accounts
         self.fork_network = self.args.fork_network
         self.fork_block = self.args.fork_block
+        self.fork_max_concurrent_requests = self.args.fork_max_concurrent_requests
+        self.fork_prefetch_blocks = self.args.fork_prefetch_blocks
+        self.fork_prefetch_contracts = self.args.fork_prefetch_contracts
+        # responses answered by the cache wouldn't be recorded,
+        # and a recorded fixture is answered locally anyway
+        self.fork_cache_path = (
+            None
+            if not self.args.fork_cache_path
+            or self.args.fork_record_path
+            or isinstance(self.fork_network, FixtureFeederGatewayClient)
+            else os.path.expanduser(self.args.fork_cache_path)
+        )
         self.chain_id = self.args.chain_id
         self.validate_rpc_requests = not self.args.disable_rpc_request_validation
         self.validate_rpc_responses = not self.args.disable_rpc_response_validation
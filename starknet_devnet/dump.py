@@ -1,17 +1,75 @@
 """Dumping utilities."""
 
+import os
+import signal
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, Optional
+
 import cloudpickle as pickle
 
-from .devnet_config import DumpOn
+from .constants import DEFAULT_DUMP_SNAPSHOT_INTERVAL
+from .devnet_config import DumpFormat, DumpOn
+from .operation_log import OperationLog
+from .scheduler import ExecutionScheduler
+from .util import warn
+from .zip_dump import write_zip_dump
+
+DUMP_HISTORY_SIZE = 16
+"""How many completed dumps are reported in the status"""
+
+BACKGROUND_DUMP_TIMEOUT = 600
+"""Seconds after which the process writing a dump in background is killed"""
+
+BACKGROUND_DUMP_POLL_INTERVAL = 0.1
+"""Seconds between checks whether the process writing a dump in background has finished"""
+
+
+@dataclass
+class DumpRecord:
+    """Progress of a dump"""
+
+    path: str
+    background: bool
+    started_at: float = field(default_factory=time.time)
+    duration: Optional[float] = None
+    size: Optional[int] = None
+    failed: bool = False
+
+    def finish(self, failed: bool = False):
+        """Record that the dump has finished"""
+        self.duration = time.time() - self.started_at
+        self.failed = failed
+        if not failed and os.path.isfile(self.path):
+            self.size = os.path.getsize(self.path)
+
+    def to_json(self) -> dict:
+        """Return the record as a json dict"""
+        return {
+            "path": self.path,
+            "background": self.background,
+            "started_at": self.started_at,
+            "duration": self.duration,
+            "size": self.size,
+            "failed": self.failed,
+        }
 
 
 class Dumper:
     """Class for dumping objects."""
 
-    def __init__(self, dumpable):
-        """Specify the `dumpable` object to be dumped."""
+    def __init__(self, dumpable, scheduler: ExecutionScheduler = None):
+        """
+        Specify the `dumpable` object to be dumped, and the `scheduler` of its changes,
+        by which the dumps following a dump in background are scheduled.
+        """
 
         self.dumpable = dumpable
+        self.scheduler = scheduler or ExecutionScheduler()
 
         self.dump_path: str = None
         """Where to dump."""
@@ -19,15 +77,231 @@ class Dumper:
         self.dump_on: DumpOn = None
         """When to dump."""
 
+        self.dump_format = DumpFormat.PICKLE
+        """How to dump."""
+
+        self.snapshot_interval = DEFAULT_DUMP_SNAPSHOT_INTERVAL
+        """How many operations can be logged after a snapshot before it's replaced"""
+
+        self.__log_size: int = None
+        """Size of the file at `dump_path` when last written to, if it's a log"""
+
+        self.__logged_operations = 0
+
+        self.in_background = False
+        """Whether to dump in a forked process, without blocking the server"""
+
+        self.__lock = threading.Lock()
+        self.__child_finished = threading.Condition(self.__lock)
+        self.__in_progress: Optional[DumpRecord] = None
+        self.__queued: Dict[str, None] = {}
+        """Paths dumped to in background once the dump in progress is finished, in order"""
+        self.__background_waiter: Optional[threading.Thread] = None
+        """Waits for the dumps in background until none is in progress or queued"""
+        self.__completed: Deque[DumpRecord] = deque(maxlen=DUMP_HISTORY_SIZE)
+
+    def set_format(self, dump_format: DumpFormat, snapshot_interval: int = None):
+        """
+        Set the format of dumps. With `DumpFormat.LOG`, the operations performed
+        by the dumpable are recorded, so that dumps to `dump_path` only append them.
+        """
+        self.dump_format = dump_format
+        self.snapshot_interval = snapshot_interval or DEFAULT_DUMP_SNAPSHOT_INTERVAL
+        self.__log_size = None
+        if dump_format is DumpFormat.LOG and self.dump_path:
+            self.dumpable.operation_log = OperationLog()
+        else:
+            self.dumpable.operation_log = None
+
     def __write_file(self, path):
         """Writes the dump to disk."""
         with open(path, "wb") as file:
             pickle.dump(self.dumpable, file)
 
-    def dump(self, path: str = None):
-        """Dump to `path`."""
+    def __write_snapshot(self, path):
+        """Writes the dump to disk, replacing the file only when done"""
+        tmp_path = f"{path}.tmp"
+        if self.dump_format is DumpFormat.ZIP:
+            write_zip_dump(self.dumpable, tmp_path)
+        else:
+            self.__write_file(tmp_path)
+        os.replace(tmp_path, path)
+
+    def __is_log_appendable(self) -> bool:
+        operation_log: OperationLog = self.dumpable.operation_log
+        return (
+            self.__log_size is not None
+            and operation_log.replayable
+            and self.__logged_operations + len(operation_log.operations)
+            <= self.snapshot_interval
+            # not replaced or removed in the meantime
+            and os.path.isfile(self.dump_path)
+            and os.path.getsize(self.dump_path) == self.__log_size
+        )
+
+    def __dump_log(self):
+        """Bring the log at `dump_path` up to date, by appending to it or replacing it with a snapshot"""
+        operation_log: OperationLog = self.dumpable.operation_log
+        if self.__is_log_appendable():
+            if operation_log.operations:
+                with open(self.dump_path, "ab") as file:
+                    pickle.dump(operation_log.operations, file)
+                self.__logged_operations += len(operation_log.operations)
+        else:
+            self.__write_snapshot(self.dump_path)
+            self.__logged_operations = 0
+
+        operation_log.clear()
+        self.__log_size = os.path.getsize(self.dump_path)
+
+    def __fork_dump(self, path: str) -> int:
+        """
+        Fork a process which writes the dump and return its pid. Forking is fast and the child sees
+        the memory as it was at the time of forking (copied on write), so the dump is consistent.
+        Only the forking thread runs in the child, so the work of the other threads is finished first.
+        Must be called when the dumpable isn't changed, i.e. in a write of the scheduler.
+        """
+        print("Dumping Devnet to:", path)
+        self.dumpable.settle()
+        pid = os.fork()
+        if pid == 0:
+            exit_code = 1
+            try:
+                self.__write_snapshot(path)
+                exit_code = 0
+            except Exception:  # pylint: disable=broad-except
+                traceback.print_exc()
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                # skip the cleanup of the server process
+                os._exit(exit_code)  # pylint: disable=protected-access
+
+        return pid
+
+    def __dump_in_background(self, path: str):
+        """
+        Start dumping to `path` in a forked process, or, if a dump in background is in progress,
+        queue `path` to be dumped to once it's finished. Queueing coalesces the requested dumps,
+        so that a dump is started at most once per path after the one in progress.
+        """
+        with self.__lock:
+            if self.__background_waiter is not None:
+                self.__queued[path] = None
+                return
+
+        record = DumpRecord(path=path, background=True)
+        pid = self.__fork_dump(path)
+        with self.__lock:
+            self.__in_progress = record
+            self.__background_waiter = threading.Thread(
+                target=self.__wait_for_children, args=(pid, record), daemon=True
+            )
+            self.__background_waiter.start()
+
+    def __wait_for_children(self, pid: Optional[int], record: DumpRecord):
+        """Wait for the dump in progress, then start the queued ones, one at a time"""
+        while True:
+            failed = pid is None or self.__wait_for_child(pid, record)
+            record.finish(failed=failed)
+            with self.__lock:
+                self.__in_progress = None
+                self.__completed.append(record)
+                self.__child_finished.notify_all()
+
+            # the queued dump must see a complete state, like any other change
+            with self.scheduler.write():
+                with self.__lock:
+                    if not self.__queued:
+                        self.__background_waiter = None
+                        self.__child_finished.notify_all()
+                        return
+
+                    path = next(iter(self.__queued))
+                    del self.__queued[path]
+                    record = DumpRecord(path=path, background=True)
+                    self.__in_progress = record
+
+                try:
+                    pid = self.__fork_dump(path)
+                except Exception:  # pylint: disable=broad-except
+                    traceback.print_exc()
+                    pid = None
+
+    @staticmethod
+    def __wait_for_child(pid: int, record: DumpRecord) -> bool:
+        """Wait for the process writing `record` and return whether it failed"""
+        deadline = time.monotonic() + BACKGROUND_DUMP_TIMEOUT
+        while True:
+            waited_pid, status = os.waitpid(pid, os.WNOHANG)
+            if waited_pid:
+                return os.waitstatus_to_exitcode(status) != 0
+            if time.monotonic() > deadline:
+                warn(f"Dumping to {record.path} timed out")
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+                return True
+            time.sleep(BACKGROUND_DUMP_POLL_INTERVAL)
+
+    def wait(self):
+        """
+        Wait until the dumps in background (if any, including the queued ones) are finished.
+        Mustn't be called in a write of the scheduler, since the queued dumps are started in writes.
+        """
+        with self.__lock:
+            self.__child_finished.wait_for(lambda: self.__background_waiter is None)
+
+    def get_status(self) -> dict:
+        """Return the dumps in progress, the queued ones and the recently completed ones"""
+        with self.__lock:
+            in_progress = [self.__in_progress] if self.__in_progress else []
+            return {
+                "in_progress": [record.to_json() for record in in_progress],
+                "queued": list(self.__queued),
+                "completed": [record.to_json() for record in self.__completed],
+            }
+
+    def dump(self, path: str = None, in_background: bool = None):
+        """
+        Dump to `path`. Dumping in background (by default if `in_background` is set)
+        returns without waiting for the dump to be written, nor for a previous dump in background.
+        Must be called when the dumpable isn't changed, i.e. in a write of the scheduler.
+        """
         path = path or self.dump_path
         assert path, "No dump_path defined"
+        if in_background is None:
+            in_background = self.in_background
+        in_background = in_background and hasattr(os, "fork")
+
+        if in_background:
+            self.__dump_in_background(path)
+            return
+
+        # a dump in background mustn't finish after (and overwrite) this one;
+        # no queued dump is started in the meantime, since they are started in writes
+        with self.__lock:
+            self.__queued.pop(path, None)
+            self.__child_finished.wait_for(lambda: self.__in_progress is None)
 
         print("Dumping Devnet to:", path)
-        self.__write_file(path)
+        record = DumpRecord(path=path, background=False)
+        failed = True
+        try:
+            self.__dump_in_foreground(path)
+            failed = False
+        finally:
+            record.finish(failed=failed)
+            with self.__lock:
+                self.__completed.append(record)
+
+    def __dump_in_foreground(self, path: str):
+        if self.dump_format is DumpFormat.PICKLE:
+            self.__write_file(path)
+        elif (
+            self.dump_format is DumpFormat.LOG
+            and path == self.dump_path
+            and self.dumpable.operation_log is not None
+        ):
+            self.__dump_log()
+        else:
+            self.__write_snapshot(path)
@@ -0,0 +1,190 @@
+"""
+Calculates the hashes of events and transactions of blocks, in parallel across processes
+"""
+
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, List, Optional, Sequence, Tuple, TypeVar
+
+from starkware.cairo.common.hash_state import compute_hash_on_elements
+from starkware.cairo.lang.vm.crypto import pedersen_hash
+from starkware.python.utils import from_bytes, to_bytes
+from starkware.starknet.core.os.block_hash.block_hash import (
+    calculate_event_hash,
+    calculate_patricia_root,
+    calculate_single_tx_hash_with_signature,
+)
+from starkware.starknet.definitions.general_config import StarknetGeneralConfig
+from starkware.starknet.services.api.feeder_gateway.response_objects import Event
+from starkware.storage.dict_storage import DictStorage
+from starkware.storage.storage import FactFetchingContext
+
+DEFAULT_CHUNK_SIZE = 256
+
+_RawEvent = Tuple[int, List[int], List[int]]
+_RawTransaction = Tuple[int, List[int]]
+_Item = TypeVar("_Item")
+
+
+def _hash_raw_events(raw_events: Sequence[_RawEvent]) -> List[int]:
+    return [
+        calculate_event_hash(from_address=from_address, keys=keys, data=data)
+        for from_address, keys, data in raw_events
+    ]
+
+
+def _hash_raw_transactions(raw_transactions: Sequence[_RawTransaction]) -> List[int]:
+    return [
+        calculate_single_tx_hash_with_signature(
+            tx_hash=tx_hash, tx_signature=signature, hash_function=pedersen_hash
+        )
+        for tx_hash, signature in raw_transactions
+    ]
+
+
+def hash_events(events: Sequence[Event]) -> List[int]:
+    """Calculate the hashes of `events` in this process"""
+    return _hash_raw_events([(e.from_address, e.keys, e.data) for e in events])
+
+
+def hash_transactions(
+    tx_hashes: Sequence[int], tx_signatures: Sequence[List[int]]
+) -> List[int]:
+    """
+    Calculate the hashes of transactions including their signatures in this process,
+    i.e. the leaves of the transaction commitment of a block
+    """
+    return _hash_raw_transactions(list(zip(tx_hashes, tx_signatures)))
+
+
+class EventHasher:
+    """
+    Calculates the hashes of events and of transactions (including their signatures) in chunks,
+    in parallel across a pool of worker processes. The workers are spawned and import this package,
+    so they use the same (C++) Pedersen hash as the main process.
+    Items fitting in one chunk are hashed in the calling process, since sending them isn't worth it.
+    """
+
+    def __init__(self, workers: int, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.__pool: Optional[ProcessPoolExecutor] = None
+        self.__owner_pid: Optional[int] = None
+        # blocks can be hashed in different threads (e.g. in background and when requested)
+        self.__lock = threading.Lock()
+
+    def __getstate__(self):
+        return {"workers": self.workers, "chunk_size": self.chunk_size}
+
+    def __setstate__(self, state: dict):
+        self.__init__(**state)
+
+    def __get_pool(self) -> ProcessPoolExecutor:
+        """
+        Return the pool started by this process.
+        Checking the pid is needed because the pool doesn't survive forking.
+        """
+        with self.__lock:
+            if self.__owner_pid != os.getpid():
+                # spawned rather than forked, since the main process runs other threads
+                # (e.g. request handlers) whose locks would be copied in whatever state they are
+                self.__pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+                self.__owner_pid = os.getpid()
+            return self.__pool
+
+    async def __hash_in_chunks(
+        self, hash_chunk: Callable[[Sequence[_Item]], List[int]], items: List[_Item]
+    ) -> List[int]:
+        """Calculate the hashes of `items` by `hash_chunk`, in the order of `items`"""
+        if len(items) <= self.chunk_size:
+            return hash_chunk(items)
+
+        pool = self.__get_pool()
+        chunks = [
+            items[start : start + self.chunk_size]
+            for start in range(0, len(items), self.chunk_size)
+        ]
+        hashed_chunks = await asyncio.gather(
+            *(asyncio.wrap_future(pool.submit(hash_chunk, chunk)) for chunk in chunks)
+        )
+        return [item_hash for hashes in hashed_chunks for item_hash in hashes]
+
+    async def hash_events(self, events: Sequence[Event]) -> List[int]:
+        """Calculate the hashes of `events`, in the order of `events`"""
+        return await self.__hash_in_chunks(
+            _hash_raw_events, [(e.from_address, e.keys, e.data) for e in events]
+        )
+
+    async def hash_transactions(
+        self, tx_hashes: Sequence[int], tx_signatures: Sequence[List[int]]
+    ) -> List[int]:
+        """Calculate the hashes of transactions including their signatures, in the order of `tx_hashes`"""
+        return await self.__hash_in_chunks(
+            _hash_raw_transactions, list(zip(tx_hashes, tx_signatures))
+        )
+
+    async def calculate_block_hash(
+        self,
+        general_config: StarknetGeneralConfig,
+        parent_hash: int,
+        block_number: int,
+        global_state_root: bytes,
+        sequencer_address: int,
+        block_timestamp: int,
+        tx_hashes: Sequence[int],
+        tx_signatures: Sequence[List[int]],
+        events: Sequence[Event],
+    ) -> int:
+        """
+        Calculate the block hash like `calculate_block_hash` of cairo-lang (which it has to match),
+        but with the event hashes and the leaves of the transaction commitment calculated by the workers
+        """
+        event_hashes, tx_final_hashes = await asyncio.gather(
+            self.hash_events(events), self.hash_transactions(tx_hashes, tx_signatures)
+        )
+
+        def bytes_hash_function(x: bytes, y: bytes) -> bytes:
+            return to_bytes(pedersen_hash(from_bytes(x), from_bytes(y)))
+
+        ffc = FactFetchingContext(storage=DictStorage(), hash_func=bytes_hash_function)
+        tx_commitment = await calculate_patricia_root(
+            leaves=tx_final_hashes,
+            height=general_config.tx_commitment_tree_height,
+            ffc=ffc,
+        )
+        event_commitment = await calculate_patricia_root(
+            leaves=event_hashes,
+            height=general_config.event_commitment_tree_height,
+            ffc=ffc,
+        )
+
+        return compute_hash_on_elements(
+            data=[
+                block_number,
+                from_bytes(global_state_root),
+                sequencer_address,
+                block_timestamp,
+                len(tx_hashes),
+                tx_commitment,
+                len(event_hashes),
+                event_commitment,
+                0,  # protocol version
+                0,  # extra data
+                parent_hash,
+            ],
+            hash_func=pedersen_hash,
+        )
+
+    def close(self):
+        """Stop the worker processes"""
+        with self.__lock:
+            if self.__pool is not None and self.__owner_pid == os.getpid():
+                self.__pool.shutdown()
+            self.__pool = None
+            self.__owner_pid = None
@@ -0,0 +1,215 @@
+"""
+Index of the events emitted in devnet blocks
+"""
+
+import heapq
+from bisect import bisect_left
+from hashlib import blake2b
+from typing import Callable, Dict, Hashable, Iterable, Iterator, List, Optional, Tuple
+
+from starkware.starknet.services.api.feeder_gateway.response_objects import (
+    StarknetBlock,
+)
+
+EventPosition = Tuple[int, int, int]
+"""(block number, index of transaction in block, index of event in transaction)"""
+
+
+def _iter_positions(
+    positions: List[EventPosition],
+    start: EventPosition,
+    to_block: int,
+    may_match_block: Callable[[int], bool],
+) -> Iterator[EventPosition]:
+    index = bisect_left(positions, start)
+    while index < len(positions) and positions[index][0] <= to_block:
+        block_number = positions[index][0]
+        if may_match_block(block_number):
+            yield positions[index]
+            index += 1
+        else:
+            # skip the whole block
+            index = bisect_left(positions, (block_number + 1,), lo=index)
+
+
+class BloomFilter:
+    """Bloom filter of a fixed set of items, with bits stored in a byte array"""
+
+    BITS_PER_ITEM = 10
+    HASH_COUNT = 7
+
+    def __init__(self, items: Iterable[Hashable]):
+        items = set(items)
+        self.__size = max(64, len(items) * self.BITS_PER_ITEM)
+        bits = bytearray((self.__size + 7) // 8)
+        for item in items:
+            for index in self.__get_indices(item):
+                bits[index >> 3] |= 1 << (index & 7)
+        self.__bits = bytes(bits)
+
+    def __get_indices(self, item: Hashable) -> Iterator[int]:
+        digest = blake2b(repr(item).encode(), digest_size=16).digest()
+        first_hash = int.from_bytes(digest[:8], "big")
+        second_hash = int.from_bytes(digest[8:], "big") | 1
+        for i in range(self.HASH_COUNT):
+            yield (first_hash + i * second_hash) % self.__size
+
+    def __contains__(self, item: Hashable) -> bool:
+        return all(
+            self.__bits[index >> 3] & (1 << (index & 7))
+            for index in self.__get_indices(item)
+        )
+
+
+class _BlockEvents:
+    """Summary of the events in a block, for ruling out the block in queries"""
+
+    def __init__(self, block: StarknetBlock):
+        events = [
+            event
+            for receipt in block.transaction_receipts or []
+            for event in receipt.events
+        ]
+        self.min_keys_count = min(len(event.keys) for event in events)
+        """Events aren't filtered by keys at positions they don't have"""
+        self.bloom_filter = BloomFilter(
+            (key_position, key)
+            for event in events
+            for key_position, key in enumerate(event.keys)
+        )
+
+    def may_match(self, keys: List[List[int]]) -> bool:
+        """Return `False` if no event of the block has any of the keys (by position)"""
+        for key_position, accepted_keys in enumerate(keys[: self.min_keys_count]):
+            if accepted_keys and not any(
+                (key_position, key) in self.bloom_filter for key in accepted_keys
+            ):
+                return False
+        return True
+
+
+class EventIndex:
+    """
+    Maps the address of the emitting contract and the first key of events
+    to the positions of the matching events, so that filtered queries only visit those.
+    Positions are kept sorted; blocks are added and removed in the order of block numbers.
+    Blocks that can't match the other keys are ruled out by their bloom filters.
+    """
+
+    def __init__(self):
+        self.__all: List[EventPosition] = []
+        self.__by_address: Dict[int, List[EventPosition]] = {}
+        self.__by_key: Dict[Optional[int], List[EventPosition]] = {}
+        self.__by_address_and_key: Dict[
+            Tuple[int, Optional[int]], List[EventPosition]
+        ] = {}
+        self.__block_postings: Dict[int, List[List[EventPosition]]] = {}
+        """Lists of positions that each block was added to"""
+        self.__block_events: Dict[int, _BlockEvents] = {}
+        self.__blocks_ruled_out = 0
+        self.__false_positives = 0
+
+    def add_block(self, block: StarknetBlock):
+        """Index the events of an accepted block"""
+        touched: Dict[int, List[EventPosition]] = {}
+        for tx_index, receipt in enumerate(block.transaction_receipts or []):
+            for event_index, event in enumerate(receipt.events):
+                position = (block.block_number, tx_index, event_index)
+                first_key = event.keys[0] if event.keys else None
+                postings = [
+                    self.__all,
+                    self.__by_address.setdefault(event.from_address, []),
+                    self.__by_key.setdefault(first_key, []),
+                    self.__by_address_and_key.setdefault(
+                        (event.from_address, first_key), []
+                    ),
+                ]
+                for positions in postings:
+                    positions.append(position)
+                    touched[id(positions)] = positions
+
+        if touched:
+            self.__block_postings[block.block_number] = list(touched.values())
+            self.__block_events[block.block_number] = _BlockEvents(block)
+
+    def remove_block(self, block_number: int):
+        """Remove the events of the latest indexed block, which has `block_number`"""
+        self.__block_events.pop(block_number, None)
+        for positions in self.__block_postings.pop(block_number, []):
+            # the positions of the latest block are at the end
+            while positions and positions[-1][0] == block_number:
+                positions.pop()
+
+    def get_positions(
+        self,
+        start: EventPosition,
+        to_block: int,
+        address: Optional[int],
+        keys: List[List[int]],
+    ) -> Iterator[EventPosition]:
+        """
+        Iterate in order over the positions, starting at `start`, of events emitted by `address`
+        in blocks up to `to_block` (inclusive), having one of `keys[0]` as the first key.
+        `None` address and empty `keys[0]` match any. Events without keys are not filtered by keys.
+        Keys at other positions are used only for ruling out whole blocks,
+        so the events at the returned positions still need to be checked against them.
+        """
+        first_keys = set(keys[0]) if keys else set()
+        if first_keys:
+            first_keys.add(None)
+
+        if address is not None and first_keys:
+            postings = [
+                self.__by_address_and_key.get((address, key), []) for key in first_keys
+            ]
+        elif address is not None:
+            postings = [self.__by_address.get(address, [])]
+        elif first_keys:
+            postings = [self.__by_key.get(key, []) for key in first_keys]
+        else:
+            postings = [self.__all]
+
+        may_match_block = self.__get_block_filter(keys)
+        # the postings are disjoint, so merging doesn't produce duplicates
+        return heapq.merge(
+            *[
+                _iter_positions(positions, start, to_block, may_match_block)
+                for positions in postings
+            ]
+        )
+
+    def __get_block_filter(self, keys: List[List[int]]) -> Callable[[int], bool]:
+        if not any(keys[1:]):
+            # address and the first key are matched exactly by the postings
+            return lambda block_number: True
+
+        decisions: Dict[int, bool] = {}
+
+        def may_match_block(block_number: int) -> bool:
+            if block_number not in decisions:
+                decisions[block_number] = self.__block_events[block_number].may_match(
+                    keys
+                )
+                if not decisions[block_number]:
+                    self.__blocks_ruled_out += 1
+            return decisions[block_number]
+
+        return may_match_block
+
+    def report_false_positive(self):
+        """
+        Report that a block not ruled out by its bloom filter had no matching events;
+        used for the statistics
+        """
+        self.__false_positives += 1
+
+    def get_stats(self) -> dict:
+        """Return the statistics of the usage of bloom filters"""
+        without_matches = self.__blocks_ruled_out + self.__false_positives
+        return {
+            "blocks_ruled_out": self.__blocks_ruled_out,
+            "false_positives": self.__false_positives,
+            "false_positive_rate": (
+                self.__false_positives / without_matches if without_matches else 0.0
+            ),
+        }
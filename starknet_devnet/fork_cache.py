@@ -0,0 +1,189 @@
+"""
+Cache of the responses of the forked network, persisted across restarts
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from starkware.starknet.definitions.general_config import StarknetChainId
+
+Query = Tuple[str, Dict[str, Any]]
+
+
+class ForkCache:
+    """
+    Responses of the forked network at the forked block. These never change, so they are stored
+    in an SQLite database at `path` (if provided), shared by restarts and by other instances
+    forking the same block of the same network and chain. The recently used responses are also kept in memory,
+    and the pinned ones (e.g. prefetched) are kept in memory until the cache is dropped.
+    """
+
+    MEMORY_SIZE = 4096
+
+    def __init__(
+        self,
+        path: Optional[str],
+        network: str,
+        block_number: int,
+        chain_id: Optional[StarknetChainId] = None,
+        memory_size: int = MEMORY_SIZE,
+    ):
+        self.__path = path
+        self.__namespace = f"{network}@{block_number}"
+        if chain_id is not None:
+            # the same url might serve different chains (e.g. a local node)
+            self.__namespace = f"{chain_id.name}:{self.__namespace}"
+        self.__memory_size = memory_size
+        self.__pinned: Dict[str, dict] = {}
+        """Responses which aren't evicted from memory"""
+        self.__init_runtime()
+
+    def __init_runtime(self):
+        self.__lock = threading.Lock()
+        self.__connection: sqlite3.Connection = None
+        self.__owner_pid = None
+        self.__memory: Dict[str, dict] = OrderedDict()
+        self.__memory_hits = 0
+        self.__disk_hits = 0
+        self.__misses = 0
+
+    def __deepcopy__(self, memo):
+        # shared by the copies of the forked state
+        return self
+
+    def __getstate__(self):
+        return {
+            "path": self.__path,
+            "namespace": self.__namespace,
+            "memory_size": self.__memory_size,
+            # without a database, they would be requested again after loading
+            "pinned": self.__pinned,
+        }
+
+    def __setstate__(self, state: dict):
+        self.__path = state["path"]
+        self.__namespace = state["namespace"]
+        self.__memory_size = state["memory_size"]
+        self.__pinned = state.get("pinned", {})
+        self.__init_runtime()
+
+    def __ensure_open(self) -> Optional[sqlite3.Connection]:
+        """
+        Open the database if not done in this process.
+        Checking the pid is needed because connections mustn't be used after forking (e.g. by gunicorn).
+        """
+        if self.__path is None or self.__owner_pid == os.getpid():
+            return self.__connection
+
+        directory = os.path.dirname(self.__path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(
+            self.__path, timeout=30, isolation_level=None, check_same_thread=False
+        )
+        # allows reading while another instance is writing
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses "
+            "(namespace TEXT, query TEXT, response TEXT, PRIMARY KEY (namespace, query))"
+        )
+        self.__connection = connection
+        self.__owner_pid = os.getpid()
+        return connection
+
+    def __remember(self, key: str, response: dict):
+        self.__memory[key] = response
+        self.__memory.move_to_end(key)
+        if len(self.__memory) > self.__memory_size:
+            self.__memory.popitem(last=False)
+
+    def get(self, query: Query) -> Optional[dict]:
+        """Return the response to `query` if cached, otherwise `None`"""
+        key = json.dumps(query, sort_keys=True)
+        with self.__lock:
+            if key in self.__pinned:
+                self.__memory_hits += 1
+                return self.__pinned[key]
+
+            if key in self.__memory:
+                self.__memory_hits += 1
+                self.__memory.move_to_end(key)
+                return self.__memory[key]
+
+            connection = self.__ensure_open()
+            row = None
+            if connection is not None:
+                row = connection.execute(
+                    "SELECT response FROM responses WHERE namespace = ? AND query = ?",
+                    (self.__namespace, key),
+                ).fetchone()
+
+            if row is None:
+                self.__misses += 1
+                return None
+
+            self.__disk_hits += 1
+            response = json.loads(row[0])
+            self.__remember(key, response)
+            return response
+
+    def set(self, query: Query, response: dict):
+        """Cache `response` (json serializable) to `query`"""
+        key = json.dumps(query, sort_keys=True)
+        with self.__lock:
+            self.__remember(key, response)
+            connection = self.__ensure_open()
+            if connection is not None:
+                connection.execute(
+                    "INSERT OR REPLACE INTO responses VALUES (?, ?, ?)",
+                    (self.__namespace, key, json.dumps(response)),
+                )
+
+    def set_many(self, responses: Iterable[Tuple[Query, dict]], pin=False):
+        """
+        Cache each response (json serializable) to its query, writing them at once.
+        If `pin`, the responses are kept in memory regardless of the memory size.
+        """
+        rows = []
+        with self.__lock:
+            for query, response in responses:
+                key = json.dumps(query, sort_keys=True)
+                if pin:
+                    self.__pinned[key] = response
+                else:
+                    self.__remember(key, response)
+                rows.append((self.__namespace, key, json.dumps(response)))
+
+            connection = self.__ensure_open()
+            if connection is not None:
+                with connection:
+                    connection.execute("BEGIN")
+                    connection.executemany(
+                        "INSERT OR REPLACE INTO responses VALUES (?, ?, ?)", rows
+                    )
+
+    def get_stats(self) -> dict:
+        """Return how many queries were answered from memory, from disk and by the network"""
+        with self.__lock:
+            hits = self.__memory_hits + self.__disk_hits
+            queries = hits + self.__misses
+            return {
+                "path": self.__path,
+                "pinned": len(self.__pinned),
+                "memory_hits": self.__memory_hits,
+                "disk_hits": self.__disk_hits,
+                "misses": self.__misses,
+                "hit_ratio": hits / queries if queries else None,
+            }
+
+    def close(self):
+        """Close the database"""
+        with self.__lock:
+            if self.__connection is not None and self.__owner_pid == os.getpid():
+                self.__connection.close()
+            self.__connection = None
+            self.__owner_pid = None
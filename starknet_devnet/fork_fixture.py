@@ -0,0 +1,232 @@
+"""
+Recording the responses of the forked network to a fixture file, and forking the fixture
+"""
+
+import importlib
+import json
+import os
+import threading
+from typing import Any, Dict
+
+from services.external_api.client import BadRequest
+from starkware.starknet.services.api.feeder_gateway.feeder_gateway_client import (
+    FeederGatewayClient,
+)
+from starkware.starkware_utils.validated_dataclass import ValidatedMarshmallowDataclass
+
+FORK_FIXTURE_VERSION = 1
+"""Version of the format of fork fixtures; increased on incompatible changes"""
+
+
+def is_fork_fixture(path: str) -> bool:
+    """Return `True` if `path` is a fork fixture file (as opposed to e.g. a URL)"""
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            header = json.loads(file.readline())
+        return header.get("fork_fixture_version") is not None
+    except (OSError, ValueError, AttributeError):
+        return False
+
+
+def _get_query(method_name: str, kwargs: Dict[str, Any]) -> str:
+    return json.dumps([method_name, kwargs], sort_keys=True)
+
+
+def _encode_result(result: Any) -> dict:
+    if isinstance(result, ValidatedMarshmallowDataclass):
+        result_type = type(result)
+        return {
+            "type": f"{result_type.__module__}:{result_type.__qualname__}",
+            "result": result.dump(),
+        }
+    return {"result": result}
+
+
+def _decode_result(response: dict) -> Any:
+    if "type" not in response:
+        return response["result"]
+
+    module_name, type_name = response["type"].split(":")
+    result_type = getattr(importlib.import_module(module_name), type_name)
+    return result_type.load(response["result"])
+
+
+class _ForkedFeederGateway:
+    """
+    The requests to the feeder gateway made by a forked devnet, with their arguments named,
+    so that the same request is made the same way regardless of how the arguments are passed
+    """
+
+    url: str
+
+    async def _request(self, method_name: str, **kwargs) -> Any:
+        raise NotImplementedError
+
+    # pylint: disable=missing-function-docstring
+
+    async def get_block(self, block_hash=None, block_number=None):
+        return await self._request(
+            "get_block", block_hash=block_hash, block_number=block_number
+        )
+
+    async def get_state_update(self, block_hash=None, block_number=None):
+        return await self._request(
+            "get_state_update", block_hash=block_hash, block_number=block_number
+        )
+
+    async def get_transaction_status(self, tx_hash):
+        return await self._request("get_transaction_status", tx_hash=tx_hash)
+
+    async def get_transaction(self, tx_hash):
+        return await self._request("get_transaction", tx_hash=tx_hash)
+
+    async def get_transaction_receipt(self, tx_hash):
+        return await self._request("get_transaction_receipt", tx_hash=tx_hash)
+
+    async def get_transaction_trace(self, tx_hash):
+        return await self._request("get_transaction_trace", tx_hash=tx_hash)
+
+    async def get_class_by_hash(self, class_hash, block_hash=None, block_number=None):
+        return await self._request(
+            "get_class_by_hash",
+            class_hash=class_hash,
+            block_hash=block_hash,
+            block_number=block_number,
+        )
+
+    async def get_compiled_class_by_class_hash(
+        self, class_hash, block_hash=None, block_number=None
+    ):
+        return await self._request(
+            "get_compiled_class_by_class_hash",
+            class_hash=class_hash,
+            block_hash=block_hash,
+            block_number=block_number,
+        )
+
+    async def get_class_hash_at(
+        self, contract_address, block_hash=None, block_number=None
+    ):
+        return await self._request(
+            "get_class_hash_at",
+            contract_address=contract_address,
+            block_hash=block_hash,
+            block_number=block_number,
+        )
+
+    async def get_storage_at(
+        self, contract_address, key, block_hash=None, block_number=None
+    ):
+        return await self._request(
+            "get_storage_at",
+            contract_address=contract_address,
+            key=key,
+            block_hash=block_hash,
+            block_number=block_number,
+        )
+
+    async def get_nonce(self, contract_address, block_hash=None, block_number=None):
+        return await self._request(
+            "get_nonce",
+            contract_address=contract_address,
+            block_hash=block_hash,
+            block_number=block_number,
+        )
+
+
+class RecordingFeederGatewayClient(_ForkedFeederGateway):
+    """
+    Requests the feeder gateway through `feeder_gateway_client`,
+    recording the responses (including errors) to the fixture file at `path`
+    """
+
+    def __init__(self, feeder_gateway_client: FeederGatewayClient, path: str):
+        self.__feeder_gateway_client = feeder_gateway_client
+        self.__path = path
+        self.__lock = threading.Lock()
+        with open(path, "w", encoding="utf-8") as file:
+            header = {
+                "fork_fixture_version": FORK_FIXTURE_VERSION,
+                "url": feeder_gateway_client.url,
+            }
+            file.write(json.dumps(header) + "\n")
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state[f"_{RecordingFeederGatewayClient.__name__}__lock"]
+        return state
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        self.__lock = threading.Lock()
+
+    def __deepcopy__(self, memo):
+        # the copies of the forked state record to the same file
+        return self
+
+    @property
+    def url(self) -> str:
+        """URL of the recorded feeder gateway"""
+        return self.__feeder_gateway_client.url
+
+    async def _request(self, method_name: str, **kwargs) -> Any:
+        method = getattr(self.__feeder_gateway_client, method_name)
+        try:
+            result = await method(**kwargs)
+        except BadRequest as bad_request:
+            # e.g. a contract not deployed at the forked block, replayed as such
+            self.__record(
+                method_name,
+                kwargs,
+                {"status_code": bad_request.status_code, "error": bad_request.text},
+            )
+            raise
+
+        self.__record(method_name, kwargs, _encode_result(result))
+        return result
+
+    def __record(self, method_name: str, kwargs: Dict[str, Any], response: dict):
+        record = {"query": _get_query(method_name, kwargs), "response": response}
+        with self.__lock:
+            # appended by every process (e.g. the server and its workers)
+            with open(self.__path, "a", encoding="utf-8") as file:
+                file.write(json.dumps(record) + "\n")
+
+
+class FixtureFeederGatewayClient(_ForkedFeederGateway):
+    """Answers the requests to the feeder gateway with the responses recorded at `path`"""
+
+    def __init__(self, path: str):
+        self.url = os.path.abspath(path)
+        self.__responses: Dict[str, dict] = {}
+        with open(path, "r", encoding="utf-8") as file:
+            header = json.loads(file.readline())
+            if header["fork_fixture_version"] > FORK_FIXTURE_VERSION:
+                raise ValueError(
+                    f"Fork fixture version {header['fork_fixture_version']} is not supported; "
+                    f"the latest supported version is {FORK_FIXTURE_VERSION}"
+                )
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # the recording was interrupted
+                    break
+                self.__responses[record["query"]] = record["response"]
+
+    def __deepcopy__(self, memo):
+        # shared by the copies of the forked state
+        return self
+
+    async def _request(self, method_name: str, **kwargs) -> Any:
+        query = _get_query(method_name, kwargs)
+        if query not in self.__responses:
+            raise BadRequest(
+                500,
+                f"No response to {query} was recorded in the fork fixture {self.url}",
+            )
+
+        response = self.__responses[query]
+        if "error" in response:
+            raise BadRequest(response["status_code"], response["error"])
+        return _decode_result(response)
@@ -1,6 +1,9 @@
 """Forked state"""
 
+import asyncio
+import functools
 import json
+from typing import Any, Dict, List, Set
 
 from services.external_api.client import BadRequest
 from starkware.starknet.business_logic.state.state import BlockInfo, CachedState
@@ -24,7 +27,9 @@ from starkware.starknet.testing.state import StarknetState
 from starkware.starkware_utils.error_handling import StarkException
 
 from .block_info_generator import now
+from .fork_cache import ForkCache
 from .general_config import build_devnet_general_config
+from .request_coalescer import RequestCoalescer
 from .util import StarknetDevnetException, suppress_feeder_gateway_client_logger
 
 
@@ -55,15 +60,62 @@ def _load_compiled_class(class_dict: dict) -> CompiledClassBase:
 
 
 class ForkedStateReader(StateReader):
-    """State with a fallback to a forked origin"""
+    """
+    State with a fallback to a forked origin.
+    Requests reading the state at the same time share the loaded classes and compiled class hashes.
+    These are only ever added (single dict operations, so safe across threads), never iterated,
+    since copies of the forked state share the reader.
+    """
 
     def __init__(
         self,
         feeder_gateway_client: FeederGatewayClient,
         block_number: int,
+        fork_cache: ForkCache = None,
+        request_coalescer: RequestCoalescer = None,
     ):
         self.__feeder_gateway_client = feeder_gateway_client
         self.__block_number = block_number
+        self.__fork_cache = fork_cache or ForkCache(
+            None, feeder_gateway_client.url, block_number
+        )
+        self.__request_coalescer = request_coalescer or RequestCoalescer()
+        self.__compiled_class_hashes: Dict[int, int] = {}
+        """Compiled class hashes by class hash; 0 for deprecated classes"""
+        self.__compiled_classes: Dict[int, CompiledClassBase] = {}
+        """Loaded classes by compiled class hash (class hash for deprecated classes)"""
+
+    def __deepcopy__(self, memo):
+        # the origin at the forked block never changes, so what's loaded is valid for every copy
+        return self
+
+    async def __request(self, method_name: str, **kwargs) -> Any:
+        """
+        Call `method_name` of the feeder gateway client at the forked block, unless cached.
+        Starknet errors (e.g. of an undeclared class) are cached as well, since they don't change either.
+        """
+        kwargs["block_number"] = self.__block_number
+        query = (method_name, kwargs)
+        response = self.__fork_cache.get(query)
+        if response is None:
+            response = await self.__request_coalescer.request(
+                (method_name, *sorted(kwargs.items())),
+                functools.partial(self.__fetch, method_name, kwargs),
+            )
+            self.__fork_cache.set(query, response)
+
+        if "error" in response:
+            raise BadRequest(response["status_code"], response["error"])
+        return response["result"]
+
+    async def __fetch(self, method_name: str, kwargs: dict) -> dict:
+        method = getattr(self.__feeder_gateway_client, method_name)
+        try:
+            return {"result": await method(**kwargs)}
+        except BadRequest as bad_request:
+            if not is_originally_starknet_exception(bad_request):
+                raise
+            return {"status_code": bad_request.status_code, "error": bad_request.text}
 
     async def get_compiled_class_by_class_hash(
         self, class_hash: int
@@ -71,14 +123,12 @@ class ForkedStateReader(StateReader):
         """
         Returns the compiled class of the given class hash. Handles both class versions.
         """
-        # nothing is fetched by this value, it's just used to determine if cairo 0 or 1
+        # the class loaded to compute this value is kept, so it's not fetched again
         compiled_class_hash = await self.get_compiled_class_hash(class_hash=class_hash)
         if compiled_class_hash != 0:
             # The class appears in the class commitment tree, it must be of version > 0.
             # But it's not present locally if we are here
-            compiled_class = await self.get_compiled_class(
-                compiled_class_hash=class_hash
-            )
+            compiled_class = self.__compiled_classes[compiled_class_hash]
             assert isinstance(
                 compiled_class, CompiledClass
             ), "Class of version 0 cannot be committed."
@@ -93,28 +143,37 @@ class ForkedStateReader(StateReader):
         return compiled_class
 
     async def _get_class_by_hash(self, class_hash: int) -> CompiledClassBase:
+        if class_hash in self.__compiled_classes:
+            return self.__compiled_classes[class_hash]
+
         try:
             with suppress_feeder_gateway_client_logger:
-                class_dict = await self.__feeder_gateway_client.get_class_by_hash(
-                    class_hash=hex(class_hash), block_number=self.__block_number
+                class_dict = await self.__request(
+                    "get_class_by_hash", class_hash=hex(class_hash)
                 )
-            return _load_compiled_class(class_dict)
+            compiled_class = _load_compiled_class(class_dict)
         except BadRequest as bad_request:
             if is_originally_starknet_exception(bad_request):
                 original_error = _extract_original_stark_exception(bad_request)
                 raise original_error from bad_request
             raise
 
+        self.__compiled_classes[class_hash] = compiled_class
+        return compiled_class
+
     async def get_compiled_class(self, compiled_class_hash: int) -> CompiledClassBase:
+        if compiled_class_hash in self.__compiled_classes:
+            return self.__compiled_classes[compiled_class_hash]
+
         try:
             with suppress_feeder_gateway_client_logger:
-                compiled_class_dict = (
-                    await self.__feeder_gateway_client.get_compiled_class_by_class_hash(
-                        hex(compiled_class_hash),
-                        block_number=self.__block_number,
-                    )
+                compiled_class_dict = await self.__request(
+                    "get_compiled_class_by_class_hash",
+                    class_hash=hex(compiled_class_hash),
                 )
-            return CompiledClass.load(compiled_class_dict)
+            compiled_class = CompiledClass.load(compiled_class_dict)
+            self.__compiled_classes[compiled_class_hash] = compiled_class
+            return compiled_class
         except BadRequest as bad_request:
             if is_originally_starknet_exception(bad_request):
                 original_error = _extract_original_stark_exception(bad_request)
@@ -124,25 +183,29 @@ class ForkedStateReader(StateReader):
             raise
 
     async def get_compiled_class_hash(self, class_hash: int) -> int:
+        if class_hash in self.__compiled_class_hashes:
+            return self.__compiled_class_hashes[class_hash]
+
         try:
             with suppress_feeder_gateway_client_logger:
-                compiled_class_dict = (
-                    await self.__feeder_gateway_client.get_compiled_class_by_class_hash(
-                        hex(class_hash),
-                        block_number=self.__block_number,
-                    )
+                compiled_class_dict = await self.__request(
+                    "get_compiled_class_by_class_hash", class_hash=hex(class_hash)
                 )
             compiled_class = _load_compiled_class(compiled_class_dict)
         except BadRequest as bad_request:
             if is_originally_starknet_exception(bad_request):
                 original_error = _extract_original_stark_exception(bad_request)
                 if original_error.code == str(StarknetErrorCode.UNDECLARED_CLASS):
+                    self.__compiled_class_hashes[class_hash] = 0
                     return 0
                 raise original_error from bad_request
             raise
 
         if isinstance(compiled_class, CompiledClass):
-            return compute_compiled_class_hash(compiled_class)
+            compiled_class_hash = compute_compiled_class_hash(compiled_class)
+            self.__compiled_class_hashes[class_hash] = compiled_class_hash
+            self.__compiled_classes[compiled_class_hash] = compiled_class
+            return compiled_class_hash
 
         raise StarknetDevnetException(
             code=StarknetErrorCode.INVALID_CONTRACT_CLASS,
@@ -152,9 +215,8 @@ class ForkedStateReader(StateReader):
     async def get_class_hash_at(self, contract_address: int) -> int:
         try:
             with suppress_feeder_gateway_client_logger:
-                class_hash_hex = await self.__feeder_gateway_client.get_class_hash_at(
-                    contract_address=contract_address,
-                    block_number=self.__block_number,
+                class_hash_hex = await self.__request(
+                    "get_class_hash_at", contract_address=contract_address
                 )
             return int(class_hash_hex, 16)
         except BadRequest as bad_request:
@@ -163,30 +225,89 @@ class ForkedStateReader(StateReader):
             raise
 
     async def get_nonce_at(self, contract_address: int) -> int:
-        return await self.__feeder_gateway_client.get_nonce(
-            contract_address=contract_address,
-            block_number=self.__block_number,
-        )
+        return await self.__request("get_nonce", contract_address=contract_address)
 
     async def get_storage_at(self, contract_address: int, key: int) -> int:
-        storage_hex = await self.__feeder_gateway_client.get_storage_at(
-            contract_address=contract_address,
-            key=key,
-            block_number=self.__block_number,
+        storage_hex = await self.__request(
+            "get_storage_at", contract_address=contract_address, key=key
         )
         return int(storage_hex, 16)
 
+    async def prefetch(
+        self, state_updates: List[dict], contract_addresses: Set[int] = None
+    ) -> int:
+        """
+        Cache the storage, nonces and class hashes changed by `state_updates` (of the blocks up to
+        the forked one, in ascending order), whose last changes are the values at the forked block,
+        so they aren't requested. If `contract_addresses` are provided, only their changes are cached,
+        and their class hashes, nonces and classes are requested in parallel.
+        The cached values are pinned in memory, so that none is evicted, even without a cache file.
+        Return the number of prefetched values.
+        """
+        # the last change of each value wins
+        values: Dict[tuple, Any] = {}
+        for state_update in state_updates:
+            state_diff = state_update["state_diff"]
+            for address_hex, storage_entries in state_diff["storage_diffs"].items():
+                address = int(address_hex, 16)
+                for storage_entry in storage_entries:
+                    key = int(storage_entry["key"], 16)
+                    values["get_storage_at", address, key] = storage_entry["value"]
+            for address_hex, nonce_hex in state_diff["nonces"].items():
+                values["get_nonce", int(address_hex, 16)] = int(nonce_hex, 16)
+            for contract in [
+                *state_diff["deployed_contracts"],
+                *state_diff.get("replaced_classes", []),
+            ]:
+                address = int(contract["address"], 16)
+                values["get_class_hash_at", address] = contract["class_hash"]
+
+        responses = []
+        for (method_name, contract_address, *key), value in values.items():
+            if (
+                contract_addresses is not None
+                and contract_address not in contract_addresses
+            ):
+                continue
+            # the same queries as made by `__request`
+            kwargs = {
+                "contract_address": contract_address,
+                "block_number": self.__block_number,
+            }
+            if key:
+                kwargs["key"] = key[0]
+            responses.append(((method_name, kwargs), {"result": value}))
+        self.__fork_cache.set_many(responses, pin=True)
+
+        await asyncio.gather(
+            *(self.__prefetch_contract(address) for address in contract_addresses or [])
+        )
+        return len(responses)
+
+    async def __prefetch_contract(self, contract_address: int):
+        class_hash = await self.get_class_hash_at(contract_address)
+        await self.get_nonce_at(contract_address)
+        if class_hash != 0:
+            await self.get_compiled_class_by_class_hash(class_hash)
+
 
 def get_forked_starknet(
     feeder_gateway_client: FeederGatewayClient,
     block_number: int,
     gas_price: int,
     chain_id: StarknetChainId,
+    fork_cache: ForkCache = None,
+    request_coalescer: RequestCoalescer = None,
 ) -> Starknet:
-    """Return a forked Starknet"""
+    """
+    Return a forked Starknet, whose reads of the origin are cached in `fork_cache`
+    and sent through `request_coalescer`
+    """
     state_reader = ForkedStateReader(
         feeder_gateway_client=feeder_gateway_client,
         block_number=block_number,
+        fork_cache=fork_cache,
+        request_coalescer=request_coalescer,
     )
     return Starknet(
         state=StarknetState(
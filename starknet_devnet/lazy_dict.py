@@ -0,0 +1,81 @@
+"""
+Dict whose values can be loaded on first access, e.g. from a dump
+"""
+
+import threading
+from typing import Any, Callable, Dict, Hashable, Iterator, MutableMapping
+
+
+class _Unloaded:
+    """Marks a value which hasn't been loaded yet"""
+
+
+class LazyDict(MutableMapping):
+    """
+    Dict storing a section of a dump (e.g. blocks).
+    When loaded from a dump, values are only loaded (by `load_value`) on first access.
+    """
+
+    def __init__(self, items: Dict[Hashable, Any] = None):
+        self.__items: Dict[Hashable, Any] = dict(items or {})
+        self.__load_value: Callable[[Hashable], Any] = None
+        self.__serialize_unloaded: Callable[[Hashable], bytes] = None
+        # requests handled in different threads can access the same unloaded value
+        self.__load_lock = threading.Lock()
+
+    def __reduce__(self):
+        # serialized in one piece (e.g. by a plain pickle dump), so everything is loaded
+        return (self.__class__, (dict(self.items()),))
+
+    def set_unloaded(
+        self,
+        keys: Iterator[Hashable],
+        load_value: Callable[[Hashable], Any],
+        serialize_unloaded: Callable[[Hashable], bytes],
+    ):
+        """
+        Replace the items with ones under `keys`, loaded by `load_value` on first access.
+        `serialize_unloaded` returns the serialized value without loading it.
+        """
+        self.__items = dict.fromkeys(keys, _Unloaded)
+        self.__load_value = load_value
+        self.__serialize_unloaded = serialize_unloaded
+
+    def is_loaded(self, key: Hashable) -> bool:
+        """Return `True` if the value of `key` is in memory"""
+        return self.__items[key] is not _Unloaded
+
+    def get_serialized_unloaded(self, key: Hashable) -> bytes:
+        """Return the serialized value of `key`, which isn't loaded"""
+        assert not self.is_loaded(key)
+        return self.__serialize_unloaded(key)
+
+    def get_loaded_count(self) -> int:
+        """Return the number of values in memory"""
+        return sum(value is not _Unloaded for value in self.__items.values())
+
+    def __getitem__(self, key: Hashable) -> Any:
+        value = self.__items[key]
+        if value is _Unloaded:
+            # loaded once, so that every reader gets the same instance
+            with self.__load_lock:
+                value = self.__items[key]
+                if value is _Unloaded:
+                    value = self.__load_value(key)
+                    self.__items[key] = value
+        return value
+
+    def __setitem__(self, key: Hashable, value: Any):
+        self.__items[key] = value
+
+    def __delitem__(self, key: Hashable):
+        del self.__items[key]
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.__items
+
+    def __iter__(self) -> Iterator[Hashable]:
+        return iter(self.__items)
+
+    def __len__(self) -> int:
+        return len(self.__items)
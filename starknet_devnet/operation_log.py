@@ -0,0 +1,141 @@
+"""
+Log of the operations changing the state of devnet, for dumping it incrementally
+"""
+
+import functools
+import inspect
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pickle import UnpicklingError
+from typing import IO, Any, Callable, Dict, Iterator, List, Tuple
+
+import cloudpickle as pickle
+
+
+@dataclass
+class LoggedOperation:
+    """Call of a method of `StarknetWrapper`, performed at `timestamp`"""
+
+    method_name: str
+    args: Tuple[Any, ...]
+    kwargs: Dict[str, Any]
+    timestamp: int
+    succeeded: bool = True
+
+
+class OperationLog:
+    """Operations performed since the log was last cleared"""
+
+    def __init__(self):
+        self.operations: List[LoggedOperation] = []
+        self.replayable = True
+        """`False` if an operation that can't be replayed (e.g. communicating with L1) was performed"""
+        self.__depth = 0
+
+    def clear(self):
+        """Forget the operations, e.g. after they have been dumped"""
+        self.operations = []
+        self.replayable = True
+
+    @contextmanager
+    def record(self, operation: LoggedOperation) -> Iterator[None]:
+        """
+        Record `operation` performed within the context,
+        unless it's a part of another operation (which is replayed as a whole)
+        """
+        if self.__depth == 0:
+            self.operations.append(operation)
+        self.__depth += 1
+        try:
+            yield
+        except Exception:
+            operation.succeeded = False
+            raise
+        finally:
+            self.__depth -= 1
+
+
+def logged_operation(method: Callable) -> Callable:
+    """
+    Decorate a method of `StarknetWrapper` changing its state, so that its calls are logged
+    (if the wrapper has an operation log) and can be replayed with the same outcome
+    """
+
+    def get_context(starknet_wrapper, args: tuple, kwargs: dict):
+        operation_log: OperationLog = starknet_wrapper.operation_log
+        if operation_log is None:
+            return None
+        # within another operation, the time is already frozen
+        timestamp = starknet_wrapper.block_info_generator.current_time()
+        operation = LoggedOperation(method.__name__, args, kwargs, timestamp)
+        return operation_log.record(operation), timestamp
+
+    if inspect.iscoroutinefunction(method):
+
+        @functools.wraps(method)
+        async def async_wrapper(starknet_wrapper, *args, **kwargs):
+            context = get_context(starknet_wrapper, args, kwargs)
+            if context is None:
+                return await method(starknet_wrapper, *args, **kwargs)
+
+            record, timestamp = context
+            block_info_generator = starknet_wrapper.block_info_generator
+            with record, block_info_generator.frozen_time(timestamp):
+                return await method(starknet_wrapper, *args, **kwargs)
+
+        return async_wrapper
+
+    @functools.wraps(method)
+    def wrapper(starknet_wrapper, *args, **kwargs):
+        context = get_context(starknet_wrapper, args, kwargs)
+        if context is None:
+            return method(starknet_wrapper, *args, **kwargs)
+
+        record, timestamp = context
+        with record, starknet_wrapper.block_info_generator.frozen_time(timestamp):
+            return method(starknet_wrapper, *args, **kwargs)
+
+    return wrapper
+
+
+def unreplayable_operation(method: Callable) -> Callable:
+    """
+    Decorate an async method of `StarknetWrapper` changing its state in a way that can't be
+    replayed (e.g. depending on L1), so that the next dump is a snapshot
+    """
+
+    @functools.wraps(method)
+    async def wrapper(starknet_wrapper, *args, **kwargs):
+        if starknet_wrapper.operation_log is not None:
+            starknet_wrapper.operation_log.replayable = False
+        return await method(starknet_wrapper, *args, **kwargs)
+
+    return wrapper
+
+
+def read_logged_operations(file: IO[bytes]) -> List[LoggedOperation]:
+    """
+    Read the batches of operations appended to `file` after the snapshot.
+    A batch whose appending was interrupted is ignored.
+    """
+    operations = []
+    while True:
+        try:
+            operations.extend(pickle.load(file))
+        except (EOFError, UnpicklingError):
+            return operations
+
+
+async def replay_operations(starknet_wrapper, operations: List[LoggedOperation]):
+    """Perform the logged `operations` again on `starknet_wrapper`"""
+    for operation in operations:
+        method = getattr(starknet_wrapper, operation.method_name)
+        with starknet_wrapper.block_info_generator.frozen_time(operation.timestamp):
+            try:
+                result = method(*operation.args, **operation.kwargs)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception:  # pylint: disable=broad-except
+                # failing the same way as when originally performed is expected
+                if operation.succeeded:
+                    raise
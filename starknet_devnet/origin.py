@@ -2,6 +2,10 @@
 Contains classes that provide the abstraction of L2 blockchain.
 """
 
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Union
+
 from services.external_api.client import BadRequest
 from starkware.starknet.definitions.error_codes import StarknetErrorCode
 from starkware.starknet.services.api.feeder_gateway.feeder_gateway_client import (
@@ -16,6 +20,7 @@ from starkware.starknet.services.api.feeder_gateway.response_objects import (
 )
 
 from starknet_devnet.forked_state import is_originally_starknet_exception
+from starknet_devnet.request_coalescer import RequestCoalescer
 from starknet_devnet.util import (
     StarknetDevnetException,
     UndeclaredClassDevnetException,
@@ -73,6 +78,10 @@ class Origin:
         """Return DeprecatedCompiledClass for cairo0 contracts and ContractClass for cairo1 contracts"""
         raise NotImplementedError
 
+    def get_cache_stats(self) -> Optional[dict]:
+        """Returns the statistics of the cache of the data retrieved from the origin, if any"""
+        raise NotImplementedError
+
 
 class NullOrigin(Origin):
     """
@@ -150,38 +159,164 @@ class NullOrigin(Origin):
     ) -> dict:
         raise UndeclaredClassDevnetException(class_hash)
 
+    def get_cache_stats(self) -> Optional[dict]:
+        return None
+
+
+def _parse_hash(value: Union[int, str]) -> Optional[int]:
+    """Return the numeric value of a block or transaction hash; `None` if not parsable"""
+    if isinstance(value, int):
+        return value
+    try:
+        return int(value, 16)
+    except (TypeError, ValueError):
+        return None
+
 
 class ForkedOrigin(Origin):
     """
     Abstracts an origin that the devnet was forked from.
+    Blocks up to the forked one never change, so they are cached, along with
+    their state updates and the receipts and traces of their transactions.
     """
 
+    CACHE_SIZE = 1024
+    """Maximum number of cached blocks, state updates, receipts and traces"""
+
     def __init__(
-        self, feeder_gateway_client: FeederGatewayClient, last_block_number: int
+        self,
+        feeder_gateway_client: FeederGatewayClient,
+        last_block_number: int,
+        request_coalescer: RequestCoalescer = None,
+        cache_size: int = CACHE_SIZE,
     ):
         self.__feeder_gateway_client = feeder_gateway_client
         self.__number_of_blocks = last_block_number + 1
+        self.__request_coalescer = request_coalescer or RequestCoalescer()
+        self.__cache_size = cache_size
+        self.__init_cache()
+
+    def __init_cache(self):
+        self.__cache_lock = threading.Lock()
+        self.__cache: Dict[Hashable, Any] = OrderedDict()
+        # hashes of blocks and transactions known to be at or before the forked block
+        self.__pre_fork_hashes: Dict[int, bool] = OrderedDict()
+        self.__cache_hits = 0
+        self.__cache_misses = 0
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # the cache is rebuilt on demand
+        for name in [
+            "cache_lock",
+            "cache",
+            "pre_fork_hashes",
+            "cache_hits",
+            "cache_misses",
+        ]:
+            del state[f"_{ForkedOrigin.__name__}__{name}"]
+        return state
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        self.__init_cache()
+
+    def __is_pre_fork(self, block_number: Any) -> bool:
+        return isinstance(block_number, int) and block_number < self.__number_of_blocks
+
+    def __remember(self, key: Hashable, response: Any):
+        """Cache `response`, known to never change; call with the lock held"""
+        self.__cache[key] = response
+        self.__cache.move_to_end(key)
+        if len(self.__cache) > self.__cache_size:
+            self.__cache.popitem(last=False)
+
+    def __remember_pre_fork_hash(self, pre_fork_hash: int):
+        """Call with the lock held"""
+        self.__pre_fork_hashes[pre_fork_hash] = True
+        self.__pre_fork_hashes.move_to_end(pre_fork_hash)
+        # hashes are small, and there are many transactions per block
+        if len(self.__pre_fork_hashes) > 64 * self.__cache_size:
+            self.__pre_fork_hashes.popitem(last=False)
+
+    def __remember_pre_fork_block(self, block: StarknetBlock):
+        if not self.__is_pre_fork(block.block_number):
+            return
+
+        self.__remember(("block", block.block_number), block)
+        self.__remember(("block_by_hash", block.block_hash), block)
+        # e.g. a scan of blocks requests the traces of their transactions next
+        self.__remember_pre_fork_hash(block.block_hash)
+        for transaction in block.transactions:
+            self.__remember_pre_fork_hash(transaction.transaction_hash)
+
+    async def __cached_request(
+        self,
+        key: Optional[Hashable],
+        get_response: Callable[[], Any],
+        remember_response: Callable[[Any], None],
+    ):
+        """
+        Return the cached response under `key` (if not `None`), otherwise `await get_response()`,
+        passed to `remember_response` to be cached if it is known to never change
+        """
+        if key is not None:
+            with self.__cache_lock:
+                if key in self.__cache:
+                    self.__cache_hits += 1
+                    self.__cache.move_to_end(key)
+                    return self.__cache[key]
+                self.__cache_misses += 1
+
+        response = await get_response()
+        with self.__cache_lock:
+            remember_response(response)
+        return response
+
+    async def __request(self, method_name: str, *args, **kwargs):
+        """Call `method_name` of the feeder gateway client, sharing an identical request in flight"""
+        method = getattr(self.__feeder_gateway_client, method_name)
+        return await self.__request_coalescer.request(
+            (method_name, *args, *sorted(kwargs.items())),
+            lambda: method(*args, **kwargs),
+        )
 
     async def get_transaction_status(self, transaction_hash: str):
-        return await self.__feeder_gateway_client.get_transaction_status(
-            transaction_hash
-        )
+        return await self.__request("get_transaction_status", transaction_hash)
 
     async def get_transaction(self, transaction_hash: str):
-        return await self.__feeder_gateway_client.get_transaction(transaction_hash)
+        return await self.__request("get_transaction", transaction_hash)
 
     async def get_transaction_receipt(
         self, transaction_hash: str
     ) -> TransactionReceipt:
-        return await self.__feeder_gateway_client.get_transaction_receipt(
-            transaction_hash
+        numeric_hash = _parse_hash(transaction_hash)
+
+        def remember_receipt(receipt: TransactionReceipt):
+            if numeric_hash is not None and self.__is_pre_fork(receipt.block_number):
+                self.__remember(("receipt", numeric_hash), receipt)
+                self.__remember_pre_fork_hash(numeric_hash)
+
+        return await self.__cached_request(
+            None if numeric_hash is None else ("receipt", numeric_hash),
+            lambda: self.__request("get_transaction_receipt", transaction_hash),
+            remember_receipt,
         )
 
     async def get_transaction_trace(self, transaction_hash: str):
+        numeric_hash = _parse_hash(transaction_hash)
+
+        def remember_trace(trace: TransactionTrace):
+            # the trace doesn't tell the block of its transaction
+            if numeric_hash is not None and numeric_hash in self.__pre_fork_hashes:
+                self.__remember(("trace", numeric_hash), trace)
+
         try:
             with suppress_feeder_gateway_client_logger:
-                return await self.__feeder_gateway_client.get_transaction_trace(
-                    transaction_hash
+                return await self.__cached_request(
+                    None if numeric_hash is None else ("trace", numeric_hash),
+                    lambda: self.__request("get_transaction_trace", transaction_hash),
+                    remember_trace,
                 )
         except BadRequest as bad_request:
             if is_originally_starknet_exception(bad_request):
@@ -196,10 +331,13 @@ class ForkedOrigin(Origin):
             code=StarknetErrorCode.BLOCK_NOT_FOUND,
             message=f"Block hash {block_hash} does not exist.",
         )
+        numeric_hash = _parse_hash(block_hash)
         try:
             with suppress_feeder_gateway_client_logger:
-                block = await self.__feeder_gateway_client.get_block(
-                    block_hash=block_hash
+                block = await self.__cached_request(
+                    None if numeric_hash is None else ("block_by_hash", numeric_hash),
+                    lambda: self.__request("get_block", block_hash=block_hash),
+                    self.__remember_pre_fork_block,
                 )
             if block.block_number > self.get_number_of_blocks():
                 raise custom_exception
@@ -210,7 +348,11 @@ class ForkedOrigin(Origin):
             raise
 
     async def get_block_by_number(self, block_number: int):
-        return await self.__feeder_gateway_client.get_block(block_number=block_number)
+        return await self.__cached_request(
+            ("block", block_number) if self.__is_pre_fork(block_number) else None,
+            lambda: self.__request("get_block", block_number=block_number),
+            self.__remember_pre_fork_block,
+        )
 
     def get_number_of_blocks(self):
         return self.__number_of_blocks
@@ -218,11 +360,30 @@ class ForkedOrigin(Origin):
     async def get_state_update(
         self, block_hash: str = None, block_number: int = None
     ) -> dict:
+        numeric_hash = _parse_hash(block_hash)
+        key = None
+        if self.__is_pre_fork(block_number):
+            key = ("state_update", block_number)
+        elif block_number is None and numeric_hash is not None:
+            key = ("state_update_by_hash", numeric_hash)
+
+        def remember_state_update(state_update):
+            # by hash, the number of the block is only known if the block was retrieved
+            if self.__is_pre_fork(block_number) or (
+                key is not None and numeric_hash in self.__pre_fork_hashes
+            ):
+                self.__remember(key, state_update)
+
         try:
             with suppress_feeder_gateway_client_logger:
-                return await self.__feeder_gateway_client.get_state_update(
-                    block_hash=block_hash,
-                    block_number=block_number,
+                return await self.__cached_request(
+                    key,
+                    lambda: self.__request(
+                        "get_state_update",
+                        block_hash=block_hash,
+                        block_number=block_number,
+                    ),
+                    remember_state_update,
                 )
         except BadRequest as bad_request:
             if is_originally_starknet_exception(bad_request):
@@ -237,10 +398,20 @@ class ForkedOrigin(Origin):
     ) -> dict:
         try:
             with suppress_feeder_gateway_client_logger:
-                return await self.__feeder_gateway_client.get_class_by_hash(
-                    hex(class_hash), block_number=block_number
+                return await self.__request(
+                    "get_class_by_hash", hex(class_hash), block_number=block_number
                 )
         except BadRequest as bad_request:
             if is_originally_starknet_exception(bad_request):
                 raise UndeclaredClassDevnetException(class_hash) from bad_request
             raise
+
+    def get_cache_stats(self) -> Optional[dict]:
+        with self.__cache_lock:
+            requests = self.__cache_hits + self.__cache_misses
+            return {
+                "size": len(self.__cache),
+                "hits": self.__cache_hits,
+                "misses": self.__cache_misses,
+                "hit_ratio": self.__cache_hits / requests if requests else None,
+            }
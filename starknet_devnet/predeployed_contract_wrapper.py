@@ -30,10 +30,13 @@ class PredeployedContractWrapper(ABC):
         starknet: Starknet = self.starknet_wrapper.starknet
 
         # declare
-        starknet.state.state.compiled_classes[self.class_hash] = self.contract_class
+        contract_class = self.starknet_wrapper.class_store.add(
+            self.class_hash, self.contract_class
+        )
+        starknet.state.state.compiled_classes[self.class_hash] = contract_class
 
         # pylint: disable=protected-access
-        self.starknet_wrapper._contract_classes[self.class_hash] = self.contract_class
+        self.starknet_wrapper._contract_classes[self.class_hash] = contract_class
 
         starknet.state.state.cache._class_hash_writes[self.address] = self.class_hash
         # replace with await starknet.state.state.deploy_contract
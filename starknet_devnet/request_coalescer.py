@@ -0,0 +1,95 @@
+"""
+Coalescing and limiting of the requests sent to the forked network
+"""
+
+import asyncio
+import os
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from .constants import DEFAULT_FORK_MAX_CONCURRENT_REQUESTS
+
+
+class RequestCoalescer:
+    """
+    Sends requests to the forked network. A request made while an identical one (with the same key)
+    is in flight shares its outcome instead of being sent again, and at most `max_concurrent`
+    requests are in flight at once.
+    Requests are sent from an event loop in a dedicated thread, since requests handled
+    in different threads (each with its own event loop) can wait for the same request.
+    """
+
+    def __init__(self, max_concurrent: int = DEFAULT_FORK_MAX_CONCURRENT_REQUESTS):
+        self.__max_concurrent = max_concurrent
+        self.__init_runtime()
+
+    def __init_runtime(self):
+        self.__lock = threading.Lock()
+        self.__loop: asyncio.AbstractEventLoop = None
+        self.__owner_pid = None
+        self.__semaphore: asyncio.Semaphore = None
+        self.__in_flight: Dict[Hashable, asyncio.Future] = {}
+        self.__sent = 0
+        self.__coalesced = 0
+
+    def __deepcopy__(self, memo):
+        # shared by the copies of the forked state
+        return self
+
+    def __getstate__(self):
+        return {"max_concurrent": self.__max_concurrent}
+
+    def __setstate__(self, state: dict):
+        self.__max_concurrent = state["max_concurrent"]
+        self.__init_runtime()
+
+    def __ensure_running(self) -> asyncio.AbstractEventLoop:
+        """
+        Start the event loop thread if not done in this process.
+        Checking the pid is needed because threads don't survive forking (e.g. by gunicorn).
+        """
+        with self.__lock:
+            if self.__owner_pid != os.getpid():
+                self.__semaphore = None
+                self.__in_flight = {}
+                self.__loop = asyncio.new_event_loop()
+                threading.Thread(target=self.__loop.run_forever, daemon=True).start()
+                self.__owner_pid = os.getpid()
+            return self.__loop
+
+    async def request(self, key: Hashable, send: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the result of `send()`, unless a request with `key` is in flight, then its result"""
+        loop = self.__ensure_running()
+        future = asyncio.run_coroutine_threadsafe(self.__request(key, send), loop)
+        return await asyncio.wrap_future(future)
+
+    async def __request(self, key: Hashable, send: Callable[[], Awaitable[Any]]):
+        """Runs in the dedicated event loop, so no locking is needed"""
+        task = self.__in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self.__send(send))
+            self.__in_flight[key] = task
+            task.add_done_callback(lambda _: self.__in_flight.pop(key, None))
+        else:
+            self.__coalesced += 1
+
+        # a waiter being cancelled mustn't cancel the request shared by others
+        return await asyncio.shield(task)
+
+    async def __send(self, send: Callable[[], Awaitable[Any]]):
+        if self.__semaphore is None:
+            # bound to the dedicated event loop
+            self.__semaphore = asyncio.Semaphore(self.__max_concurrent)
+
+        async with self.__semaphore:
+            self.__sent += 1
+            return await send()
+
+    def get_stats(self) -> dict:
+        """Return how many requests were sent and how many were coalesced with an in-flight one"""
+        return {
+            "max_concurrent": self.__max_concurrent,
+            "sent": self.__sent,
+            "coalesced": self.__coalesced,
+            "in_flight": len(self.__in_flight),
+        }
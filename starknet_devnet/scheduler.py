@@ -0,0 +1,75 @@
+"""
+Scheduling of the requests changing the state and of those only reading it
+"""
+
+import threading
+from contextlib import contextmanager
+from typing import Iterator
+
+
+class ExecutionScheduler:
+    """
+    Runs the operations changing the state (writes) one at a time, in the order of their arrival.
+    The other operations (reads) run concurrently with each other, but never during a write,
+    so they only see the state left by complete writes.
+    A read arriving after a write waits for it, so that reads can't hold off writes indefinitely.
+    Requests are handled in separate threads (each with its own event loop), hence the thread locking.
+    Reads don't modify the states they read (see `create_read_layer`), and the caches they share
+    (e.g. of call results or of loaded values) are guarded by locks of their own.
+    """
+
+    def __init__(self):
+        self.__condition = threading.Condition()
+        self.__active_reads = 0
+        self.__next_ticket = 0
+        """Ticket of the next arriving write"""
+        self.__serving = 0
+        """Ticket of the running or next write; equal to `__next_ticket` if none is queued"""
+        self.__reads = 0
+        self.__writes = 0
+        self.__max_concurrent_reads = 0
+
+    @contextmanager
+    def read(self) -> Iterator[None]:
+        """Run the block after the writes arrived so far, concurrently with other reads"""
+        with self.__condition:
+            self.__condition.wait_for(lambda: self.__serving == self.__next_ticket)
+            self.__active_reads += 1
+            self.__reads += 1
+            self.__max_concurrent_reads = max(
+                self.__max_concurrent_reads, self.__active_reads
+            )
+
+        try:
+            yield
+        finally:
+            with self.__condition:
+                self.__active_reads -= 1
+                self.__condition.notify_all()
+
+    @contextmanager
+    def write(self) -> Iterator[None]:
+        """Run the block alone, after the writes arrived so far"""
+        with self.__condition:
+            ticket = self.__next_ticket
+            self.__next_ticket += 1
+            self.__condition.wait_for(
+                lambda: self.__serving == ticket and not self.__active_reads
+            )
+            self.__writes += 1
+
+        try:
+            yield
+        finally:
+            with self.__condition:
+                self.__serving += 1
+                self.__condition.notify_all()
+
+    def get_stats(self) -> dict:
+        """Return the numbers of scheduled reads and writes"""
+        with self.__condition:
+            return {
+                "reads": self.__reads,
+                "writes": self.__writes,
+                "max_concurrent_reads": self.__max_concurrent_reads,
+            }
@@ -6,8 +6,9 @@ import asyncio
 import json
 import os
 import sys
+from contextlib import ExitStack
 
-from flask import Flask, jsonify
+from flask import Flask, g, jsonify, request
 from flask_cors import CORS
 from gunicorn.app.base import BaseApplication
 from starkware.starkware_utils.error_handling import StarkErrorCode, StarkException
@@ -16,6 +17,7 @@ from .blueprints.base import base
 from .blueprints.feeder_gateway import feeder_gateway
 from .blueprints.gateway import gateway
 from .blueprints.postman import postman
+from .blueprints.rpc.routes import changes_state as rpc_changes_state
 from .blueprints.rpc.routes import rpc
 from .devnet_config import DevnetConfig, DumpOn, parse_args
 from .starknet_wrapper import StarknetWrapper
@@ -32,6 +34,55 @@ async def initialize_starknet():
     await state.starknet_wrapper.initialize()
 
 
+STATE_CHANGING_ENDPOINTS = {
+    "base.restart",
+    "base.load",
+    "base.increase_time",
+    "base.set_time",
+    "base.mint",
+    "base.create_block",
+    "base.abort_blocks",
+    "base.dump",
+    "gateway.add_transaction",
+    "postman.load_l1_messaging_contract",
+    "postman.flush",
+    "postman.send_message_to_l2",
+    "postman.consume_message_from_l2",
+}
+"""
+Endpoints changing the state, or needing to be handled alone (dumping forks the process);
+the others only read it
+"""
+
+UNSCHEDULED_ENDPOINTS = {"base.is_alive", "api"}
+"""Endpoints not touching the state, which don't wait for the writes"""
+
+
+@app.before_request
+def schedule_request():
+    """Wait until the request can be handled without seeing an incomplete change of the state"""
+    if request.endpoint in UNSCHEDULED_ENDPOINTS:
+        return
+
+    if request.endpoint == "rpc.base_route":
+        is_write = rpc_changes_state(request.get_json(silent=True))
+    else:
+        is_write = request.endpoint in STATE_CHANGING_ENDPOINTS
+
+    g.scheduled = ExitStack()
+    g.scheduled.enter_context(
+        state.scheduler.write() if is_write else state.scheduler.read()
+    )
+
+
+@app.teardown_request
+def finish_request(_error=None):
+    """Let the next scheduled requests be handled"""
+    scheduled = g.pop("scheduled", None)
+    if scheduled is not None:
+        scheduled.close()
+
+
 app.register_blueprint(base)
 app.register_blueprint(gateway)
 app.register_blueprint(feeder_gateway)
@@ -50,7 +101,9 @@ class GunicornServer(BaseApplication):
 
     def load_config(self):
         self.cfg.set("bind", f"{self.args.host}:{self.args.port}")
+        # one process, since the state is held in memory; its requests are ordered by the scheduler
         self.cfg.set("workers", 1)
+        self.cfg.set("threads", self.args.request_threads)
         self.cfg.set("timeout", self.args.timeout)
         self.cfg.set(
             "logconfig_dict",
@@ -89,11 +142,19 @@ def main():
         else:
             state.set_starknet_wrapper(StarknetWrapper(DevnetConfig(args)))
 
-        state.set_dump_options(args.dump_path, args.dump_on)
+        state.set_dump_options(
+            args.dump_path,
+            args.dump_on,
+            args.dump_format,
+            args.dump_snapshot_interval,
+            args.dump_in_background,
+        )
     except StarknetDevnetException as error:
         sys.exit(error.message)
 
-    asyncio.run(state.starknet_wrapper.initialize())
+    prefetched = asyncio.run(state.starknet_wrapper.initialize())
+    if prefetched is not None:
+        print(f"Prefetched {prefetched} values of block {args.fork_block}")
 
     main_pid = os.getpid()
     print(f" * Listening on http://{args.host}:{args.port}/ (Press CTRL+C to quit)")
@@ -103,9 +164,12 @@ def main():
         pass
     finally:
         # Dump only if process is worker (not main)
-        if args.dump_on == DumpOn.EXIT and os.getpid() != main_pid:
-            state.dumper.dump()
-            sys.exit(0)
+        if os.getpid() != main_pid:
+            # let the dump in background (if any) finish
+            state.dumper.wait()
+            if args.dump_on == DumpOn.EXIT:
+                state.dumper.dump(in_background=False)
+                sys.exit(0)
 
 
 @app.errorhandler(StarkException)
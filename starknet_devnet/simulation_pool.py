@@ -0,0 +1,277 @@
+"""
+Simulates transactions (e.g. for fee estimation) in worker processes
+"""
+
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from starkware.starknet.business_logic.state.state import BlockInfo, CachedState
+from starkware.starknet.definitions.general_config import StarknetGeneralConfig
+from starkware.starknet.definitions.transaction_type import TransactionType
+from starkware.starknet.services.api.contract_class.contract_class import (
+    CompiledClassBase,
+)
+from starkware.starknet.services.api.feeder_gateway.response_objects import (
+    FeeEstimationInfo,
+    TransactionTrace,
+)
+from starkware.starknet.services.utils.sequencer_api_utils import (
+    InternalInvokeFunctionForSimulate,
+)
+from starkware.starknet.testing.objects import FunctionInvocation
+from starkware.starknet.testing.state import StarknetState
+from starkware.starkware_utils.error_handling import StarkException
+
+from .state_archive import get_cache_writes
+from .state_journal import WriteTracker
+from .util import create_read_layer, get_fee_estimation_info
+
+SimulationResults = Tuple[
+    List[TransactionTrace], List[FeeEstimationInfo], List[TransactionType]
+]
+
+
+async def simulate_transactions(
+    cached_state: CachedState,
+    general_config: StarknetGeneralConfig,
+    internal_txs: List[InternalInvokeFunctionForSimulate],
+    signatures: List[List[int]],
+) -> SimulationResults:
+    """
+    Simulate `internal_txs` one after another, each on a throwaway layer over the state
+    resulting from the previous ones, so that `cached_state` isn't modified.
+    """
+    traces = []
+    fee_estimation_infos = []
+    transaction_types = []
+
+    state_layer = create_read_layer(cached_state)
+    for internal_tx, signature in zip(internal_txs, signatures):
+        # pylint: disable=protected-access
+        state_layer = state_layer._copy()
+        execution_info = await internal_tx.apply_state_updates(
+            state_layer, general_config
+        )
+
+        traces.append(
+            TransactionTrace(
+                validate_invocation=FunctionInvocation.from_optional_internal(
+                    execution_info.validate_info
+                ),
+                function_invocation=FunctionInvocation.from_optional_internal(
+                    execution_info.call_info
+                ),
+                fee_transfer_invocation=FunctionInvocation.from_optional_internal(
+                    execution_info.fee_transfer_info
+                ),
+                signature=signature,
+            )
+        )
+        fee_estimation_infos.append(
+            get_fee_estimation_info(
+                execution_info.actual_fee, cached_state.block_info.gas_price
+            )
+        )
+        transaction_types.append(internal_tx.tx_type)
+
+    return traces, fee_estimation_infos, transaction_types
+
+
+@dataclass
+class _SnapshotDelta:
+    """What was written to a state since it was last shipped to a worker"""
+
+    reset: bool
+    """Whether the state is shipped anew, in full"""
+    written: Dict[str, dict]
+    added_classes: Dict[int, CompiledClassBase]
+
+
+class _ShippedSnapshot:
+    """Tracks what of a state was shipped to a worker"""
+
+    def __init__(self):
+        self.__write_tracker = WriteTracker()
+
+    def ship(self, cached_state: CachedState) -> _SnapshotDelta:
+        """
+        Return what was written to `cached_state` since last shipped, and record it as shipped.
+        Only the written keys are inspected, unless the state was replaced (e.g. by aborting blocks)
+        or never shipped, in which case it's shipped in full.
+        """
+        mappings = {
+            **get_cache_writes(cached_state),
+            "compiled_classes": cached_state.compiled_classes,
+        }
+        written_keys = {
+            kind: self.__write_tracker.get_written_keys(kind, mapping)
+            for kind, mapping in mappings.items()
+        }
+        reset = any(keys is None for keys in written_keys.values())
+
+        shipped = {
+            kind: dict(mapping)
+            if reset
+            else {key: mapping[key] for key in written_keys[kind]}
+            for kind, mapping in mappings.items()
+        }
+        return _SnapshotDelta(
+            reset=reset,
+            written=shipped,
+            added_classes=shipped.pop("compiled_classes"),
+        )
+
+
+@dataclass
+class _SimulationFailure:
+    """A failure of a simulation, sent back from a worker"""
+
+    code: Any
+    message: Optional[str]
+
+
+_snapshots: Dict[str, CachedState] = {}
+"""States held by a worker process, by name"""
+
+
+async def _simulate_on_snapshot(
+    name: str,
+    delta: _SnapshotDelta,
+    block_info: BlockInfo,
+    general_config: StarknetGeneralConfig,
+    internal_txs: List[InternalInvokeFunctionForSimulate],
+    signatures: List[List[int]],
+):
+    if delta.reset or name not in _snapshots:
+        # the states of devnet (not forked) are all written over an empty state
+        empty_state = await StarknetState.empty(general_config=general_config)
+        _snapshots[name] = empty_state.state
+    cached_state = _snapshots[name]
+
+    cache_writes = get_cache_writes(cached_state)
+    for kind, written in delta.written.items():
+        cache_writes[kind].update(written)
+    cached_state.compiled_classes.update(delta.added_classes)
+    cached_state.block_info = block_info
+
+    try:
+        return await simulate_transactions(
+            cached_state, general_config, internal_txs, signatures
+        )
+    except StarkException as error:
+        # sent back as plain data, since not every exception survives pickling
+        return _SimulationFailure(code=error.code, message=error.message)
+
+
+def _simulate_in_worker(*args) -> SimulationResults:
+    return asyncio.run(_simulate_on_snapshot(*args))
+
+
+class _SimulationWorker:
+    """A worker process and the snapshots shipped to it"""
+
+    def __init__(self):
+        # spawned rather than forked, since the main process runs other threads (e.g. request handlers)
+        # whose locks would be copied to the worker in whatever state they are
+        self.executor = ProcessPoolExecutor(
+            max_workers=1, mp_context=multiprocessing.get_context("spawn")
+        )
+        self.snapshots: Dict[str, _ShippedSnapshot] = {}
+        self.running = 0
+
+
+class SimulationPool:
+    """
+    Simulates transactions in a pool of worker processes, so that simulations don't block
+    the main process and independent simulations run in parallel.
+    Each worker holds its own copies of the simulated-on states, by name,
+    and receives only what was written to a state since it was last shipped to that worker
+    (found without inspecting the rest of the state, see `WriteTracker`).
+    The transactions of a single request are simulated one after another by the same worker.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.__pool: List[_SimulationWorker] = []
+        self.__owner_pid: Optional[int] = None
+        # requests handled in different threads can simulate at the same time
+        self.__lock = threading.Lock()
+
+    def __getstate__(self):
+        return {"workers": self.workers}
+
+    def __setstate__(self, state: dict):
+        self.__init__(**state)
+
+    def __get_pool(self) -> List[_SimulationWorker]:
+        """
+        Return the workers started by this process.
+        Checking the pid is needed because the workers don't survive forking.
+        """
+        if self.__owner_pid != os.getpid():
+            self.__pool = [_SimulationWorker() for _ in range(self.workers)]
+            self.__owner_pid = os.getpid()
+        return self.__pool
+
+    async def simulate(
+        self,
+        name: str,
+        state: StarknetState,
+        internal_txs: List[InternalInvokeFunctionForSimulate],
+        signatures: List[List[int]],
+    ) -> SimulationResults:
+        """
+        Simulate `internal_txs` one after another on `state`, which is known to the workers as `name`.
+        Only states whose writes are all held by `state` itself, over an empty state, are supported,
+        i.e. not forked ones nor views over archived states (see `--state-archive`).
+        """
+        with self.__lock:
+            worker = min(self.__get_pool(), key=lambda w: w.running)
+            snapshot = worker.snapshots.setdefault(name, _ShippedSnapshot())
+
+            # tasks are run by a worker in the order of submission, so the deltas are applied in order
+            delta = snapshot.ship(state.state)
+            future = worker.executor.submit(
+                _simulate_in_worker,
+                name,
+                delta,
+                state.state.block_info,
+                state.general_config,
+                internal_txs,
+                signatures,
+            )
+            worker.running += 1
+
+        try:
+            results = await asyncio.wrap_future(future)
+        except Exception:
+            # the snapshots of the worker might not match what was shipped anymore
+            with self.__lock:
+                self.__replace(worker)
+            raise
+        finally:
+            with self.__lock:
+                worker.running -= 1
+
+        if isinstance(results, _SimulationFailure):
+            raise StarkException(code=results.code, message=results.message)
+        return results
+
+    def __replace(self, worker: _SimulationWorker):
+        if worker in self.__pool:
+            worker.executor.shutdown(wait=False)
+            self.__pool[self.__pool.index(worker)] = _SimulationWorker()
+
+    def close(self):
+        """Stop the worker processes"""
+        with self.__lock:
+            if self.__owner_pid == os.getpid():
+                for worker in self.__pool:
+                    worker.executor.shutdown()
+            self.__pool = []
+            self.__owner_pid = None
@@ -3,9 +3,9 @@
 This module introduces `StarknetWrapper`, a wrapper class of
 starkware.starknet.testing.starknet.Starknet.
 """
-from copy import deepcopy
+import asyncio
 from types import TracebackType
-from typing import Dict, List, Optional, Set, Tuple, Type, Union
+from typing import Dict, List, Optional, Tuple, Type, Union
 
 import cloudpickle as pickle
 from starkware.starknet.business_logic.state.state import BlockInfo, CachedState
@@ -46,9 +46,7 @@ from starkware.starknet.services.api.feeder_gateway.response_objects import (
     ContractAddressHashPair,
     StarknetBlock,
     StateDiff,
-    StorageEntry,
     TransactionStatus,
-    TransactionTrace,
 )
 from starkware.starknet.services.api.gateway.transaction import (
     Declare,
@@ -62,6 +60,7 @@ from starkware.starknet.services.utils.sequencer_api_utils import (
 )
 from starkware.starknet.testing.objects import FunctionInvocation
 from starkware.starknet.testing.starknet import Starknet
+from starkware.starknet.testing.state import StarknetState
 from starkware.starknet.third_party.open_zeppelin.starknet_contracts import (
     account_contract as oz_account_class,
 )
@@ -71,7 +70,9 @@ from .accounts import Accounts
 from .block_info_generator import BlockInfoGenerator
 from .blocks import DevnetBlocks
 from .blueprints.rpc.structures.types import BlockId, Felt
+from .call_cache import CallResultCache
 from .chargeable_account import ChargeableAccount
+from .class_store import ClassStore, ClassStoreStateReader
 from .compiler import select_compiler
 from .constants import (
     DUMMY_PENDING_BLOCK_HASH,
@@ -80,11 +81,25 @@ from .constants import (
     STARKNET_CLI_ACCOUNT_CLASS_HASH,
 )
 from .devnet_config import DevnetConfig
+from .event_hasher import EventHasher
 from .fee_token import FeeToken
-from .forked_state import get_forked_starknet
+from .fork_cache import ForkCache
+from .forked_state import ForkedStateReader, get_forked_starknet
 from .general_config import build_devnet_general_config
+from .lazy_dict import LazyDict
+from .operation_log import (
+    OperationLog,
+    logged_operation,
+    read_logged_operations,
+    replay_operations,
+    unreplayable_operation,
+)
 from .origin import ForkedOrigin, NullOrigin
 from .postman_wrapper import DevnetL1L2
+from .request_coalescer import RequestCoalescer
+from .simulation_pool import SimulationPool, simulate_transactions
+from .state_archive import select_state_archive
+from .state_journal import StateJournal
 from .transactions import (
     DevnetTransaction,
     DevnetTransactions,
@@ -98,15 +113,18 @@ from .util import (
     UndeclaredClassDevnetException,
     assert_not_declared,
     assert_recompiled_class_hash,
+    create_read_layer,
     enable_pickling,
     get_all_declared_cairo0_classes,
     get_all_declared_cairo1_classes,
     get_fee_estimation_info,
+    get_nonces,
     get_replaced_classes,
     get_storage_diffs,
     group_classes_by_version,
     warn,
 )
+from .zip_dump import is_zip_dump, load_zip_dump
 
 enable_pickling()
 
@@ -123,8 +141,14 @@ class StarknetWrapper:
     """
 
     def __init__(self, config: DevnetConfig):
+        self.fork_requests = (
+            RequestCoalescer(config.fork_max_concurrent_requests)
+            if config.fork_network
+            else None
+        )
+        """Sends the requests to the forked network, if forking"""
         self.origin = (
-            ForkedOrigin(config.fork_network, config.fork_block)
+            ForkedOrigin(config.fork_network, config.fork_block, self.fork_requests)
             if config.fork_network
             else NullOrigin()
         )
@@ -134,19 +158,35 @@ class StarknetWrapper:
         self.blocks = None
         self.config = config
         self.l1l2 = DevnetL1L2()
-        self.transactions = DevnetTransactions(self.origin)
+        self.transactions = DevnetTransactions(
+            self.origin, self.wait_for_block_hashes
+        )
         self.starknet: Starknet = None
-        self.__current_cached_state = None
+        self.__forked_state_reader: ForkedStateReader = None
+        self.__state_journal: StateJournal = None
         self.__initialized = False
         self.fee_token = FeeToken(self)
         self.accounts = Accounts(self)
         self.__udc = UDC(self)
         self.pending_txs: List[DevnetTransaction] = []
-        self.__latest_state = None
         self._contract_classes: Dict[int, Union[DeprecatedCompiledClass, ContractClass]]
         """If v2 - store sierra, otherwise store old class; needed for get_class_by_hash"""
+        self.class_store = ClassStore()
+        """Holds each class once, for all the states"""
+        self.fork_cache: Optional[ForkCache] = None
+        """Responses of the forked network, if forking"""
         self.genesis_block_number = None
+        self.call_cache = CallResultCache()
+        """Results of calls on the states of past blocks"""
+        self.simulation_pool = (
+            SimulationPool(config.simulation_workers)
+            if config.simulation_workers
+            else None
+        )
+        """Simulates transactions on the latest and pending state, if enabled"""
         self._compiler = select_compiler(config)
+        self.operation_log: Optional[OperationLog] = None
+        """If set, the operations changing the state are recorded in it"""
 
         if config.start_time is not None:
             self.set_block_time(config.start_time)
@@ -155,17 +195,48 @@ class StarknetWrapper:
 
     @staticmethod
     def load(path: str) -> "StarknetWrapper":
-        """Load a serialized instance of this class from `path`."""
+        """
+        Load a serialized instance of this class from `path`.
+        Operations logged after it in the same file are replayed.
+        From zip dumps, blocks, transactions etc. are loaded when first needed.
+        """
+        if is_zip_dump(path):
+            return load_zip_dump(path)
+
         with open(path, "rb") as file:
-            return pickle.load(file)
+            starknet_wrapper: "StarknetWrapper" = pickle.load(file)
+            operations = read_logged_operations(file)
+
+        if operations:
+            asyncio.run(replay_operations(starknet_wrapper, operations))
+        return starknet_wrapper
 
-    async def initialize(self):
-        """Initialize the underlying starknet instance, fee_token and accounts."""
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # operations are logged only for the dumper of this instance
+        state["operation_log"] = None
+        return state
+
+    async def initialize(self) -> Optional[int]:
+        """
+        Initialize the underlying starknet instance, fee_token and accounts.
+        Return the number of values prefetched from the forked network, if prefetched.
+        """
+        prefetched = None
         if not self.__initialized:
             starknet = await self.__init_starknet()
+            prefetched = await self.__prefetch_fork()
 
             # ok that it's here so that e.g. reset includes reset of blocks
-            self.blocks = DevnetBlocks(self.origin, lite=self.config.lite_mode)
+            self.blocks = DevnetBlocks(
+                self.origin,
+                lite=self.config.lite_mode,
+                state_archive=select_state_archive(self.config, self.class_store),
+                hash_in_background=self.config.hash_blocks_in_background,
+                event_hasher=EventHasher(self.config.event_hash_workers)
+                if self.config.event_hash_workers
+                else None,
+            )
 
             self._contract_classes = {}
             await self.fee_token.deploy()
@@ -176,9 +247,27 @@ class StarknetWrapper:
 
             await self.__preserve_current_state(starknet.state.state)
             await self.__create_genesis_block()
-            self.__latest_state = self.get_state().copy()
             self.__initialized = True
 
+        return prefetched
+
+    def close(self):
+        """Release the resources (e.g. open files) held by this instance."""
+        if self.blocks:
+            self.blocks.close()
+        if self.fork_cache:
+            self.fork_cache.close()
+        if self.simulation_pool:
+            self.simulation_pool.close()
+
+    def get_dump_sections(self) -> Dict[str, LazyDict]:
+        """Return the containers which can be dumped and loaded item by item, by name"""
+        return {
+            "classes": self.class_store.get_dump_section(),
+            **self.transactions.get_dump_sections(),
+            **self.blocks.get_dump_sections(),
+        }
+
     async def __create_genesis_block(self):
         """Create genesis block"""
         transactions: List[DevnetTransaction] = []
@@ -238,11 +327,11 @@ class StarknetWrapper:
         """Create empty block."""
         self._update_block_number()
         state_update = await self.update_pending_state()
-        self.__latest_state = self.get_state().copy()
         return await self.blocks.generate_empty_block(self.get_state(), state_update)
 
     async def __preserve_current_state(self, state: CachedState):
-        self.__current_cached_state = deepcopy(state)
+        """Start journaling the writes to `state`, so that its current version can be read later"""
+        self.__state_journal = StateJournal(state)
 
     async def __init_starknet(self):
         """
@@ -254,19 +343,62 @@ class StarknetWrapper:
                     f"Forking {self.config.fork_network.url} from block {self.config.fork_block}"
                 )
 
+                self.fork_cache = ForkCache(
+                    self.config.fork_cache_path,
+                    network=self.config.fork_network.url,
+                    block_number=self.config.fork_block,
+                    chain_id=self.config.chain_id,
+                )
                 self.starknet = get_forked_starknet(
                     feeder_gateway_client=self.config.fork_network,
                     block_number=self.config.fork_block,
                     gas_price=self.block_info_generator.gas_price,
                     chain_id=self.config.chain_id,
+                    fork_cache=self.fork_cache,
+                    request_coalescer=self.fork_requests,
                 )
+                self.__forked_state_reader = self.starknet.state.state.state_reader
             else:
                 self.starknet = await Starknet.empty(
                     general_config=build_devnet_general_config(self.config.chain_id)
                 )
 
+            state = self.starknet.state.state
+            state.state_reader = ClassStoreStateReader(
+                state.state_reader, self.class_store
+            )
+
         return self.starknet
 
+    async def __prefetch_fork(self) -> Optional[int]:
+        """
+        Cache what executing is likely to read from the origin, requesting it in parallel.
+        Return the number of prefetched values, or `None` if not prefetching.
+        """
+        if not self.__is_fork() or (
+            not self.config.fork_prefetch_blocks
+            and not self.config.fork_prefetch_contracts
+        ):
+            return None
+
+        if self.config.fork_record_path:
+            # prefetched values wouldn't be requested when read, so they'd be missing from the fixture
+            return None
+
+        last_block_number = self.config.fork_block
+        first_block_number = max(
+            last_block_number - self.config.fork_prefetch_blocks + 1, 0
+        )
+        state_updates = await asyncio.gather(
+            *(
+                self.origin.get_state_update(block_number=block_number)
+                for block_number in range(first_block_number, last_block_number + 1)
+            )
+        )
+        return await self.__forked_state_reader.prefetch(
+            state_updates, self.config.fork_prefetch_contracts
+        )
+
     def __is_fork(self):
         return bool(self.config.fork_network)
 
@@ -281,25 +413,21 @@ class StarknetWrapper:
         deployed_contracts: List[ContractAddressHashPair] = None,
         explicitly_declared_old: List[int] = None,
         explicitly_declared: List[ClassHashPair] = None,
-        visited_storage_entries: Set[StorageEntry] = None,
-        nonces: Dict[int, int] = None,
     ):
         """Update pending state."""
         # defaulting
         deployed_contracts = deployed_contracts or []
         explicitly_declared_old = explicitly_declared_old or []
         explicitly_declared = explicitly_declared or []
-        visited_storage_entries = visited_storage_entries or set()
 
         # state update and preservation
-        previous_state = self.__current_cached_state
+        previous_state = self.__state_journal
         assert previous_state is not None
         current_state = self.get_state().state
         current_state.block_info = self.block_info_generator.next_block(
             block_info=current_state.block_info,
             general_config=self.get_state().general_config,
         )
-        await self.__preserve_current_state(current_state)
 
         (
             deployed_cairo0_contracts,
@@ -313,18 +441,18 @@ class StarknetWrapper:
         declared_classes = await get_all_declared_cairo1_classes(
             previous_state, explicitly_declared, deployed_cairo1_contracts
         )
-        replaced = await get_replaced_classes(previous_state, current_state)
-        storage_diffs = await get_storage_diffs(
-            previous_state, current_state, visited_storage_entries
-        )
+        # only what was written since the previous update is inspected
+        replaced = await get_replaced_classes(previous_state)
+        storage_diffs = await get_storage_diffs(previous_state)
         state_diff = StateDiff(
             deployed_contracts=deployed_contracts,
             old_declared_contracts=old_declared_contracts,
             declared_classes=declared_classes,
             replaced_classes=replaced,
             storage_diffs=storage_diffs,
-            nonces=nonces or {},
+            nonces=await get_nonces(previous_state),
         )
+        await self.__preserve_current_state(current_state)
 
         return BlockStateUpdate(
             block_hash=DUMMY_PENDING_BLOCK_HASH,
@@ -345,6 +473,7 @@ class StarknetWrapper:
 
         self.transactions.store(transaction.transaction_hash, transaction)
 
+    @logged_operation
     async def declare(
         self, external_tx: Union[Declare, DeprecatedDeclare]
     ) -> Tuple[int, int]:
@@ -398,8 +527,12 @@ class StarknetWrapper:
                 compiled_class = external_tx.contract_class
                 tx_handler.explicitly_declared_old.append(class_hash)
 
-            state.state.compiled_classes[compiled_class_hash] = compiled_class
-            self._contract_classes[class_hash] = external_tx.contract_class
+            state.state.compiled_classes[compiled_class_hash] = self.class_store.add(
+                compiled_class_hash, compiled_class
+            )
+            self._contract_classes[class_hash] = self.class_store.add(
+                class_hash, external_tx.contract_class
+            )
 
         return class_hash, tx_handler.internal_tx.hash_value
 
@@ -426,7 +559,6 @@ class StarknetWrapper:
             deployed_contracts: List[ContractAddressHashPair] = []
             explicitly_declared_old: List[int] = []
             explicitly_declared: List[ClassHashPair] = []
-            visited_storage_entries: Set[StorageEntry] = set()
 
             def __init__(self, starknet_wrapper: StarknetWrapper):
                 self.starknet_wrapper = starknet_wrapper
@@ -494,7 +626,6 @@ class StarknetWrapper:
                         deployed_contracts=self.deployed_contracts,
                         explicitly_declared=self.explicitly_declared,
                         explicitly_declared_old=self.explicitly_declared_old,
-                        visited_storage_entries=self.visited_storage_entries,
                     )
 
                     transaction = DevnetTransaction(
@@ -506,15 +637,18 @@ class StarknetWrapper:
                     self.starknet_wrapper.pending_txs.append(transaction)
                     self.starknet_wrapper._store_transaction(transaction)
 
-                    await self.starknet_wrapper.update_pending_block(state_update)
+                    await self.starknet_wrapper.update_pending_block(
+                        transaction, state_update
+                    )
 
                     if not self.starknet_wrapper.config.blocks_on_demand:
-                        await self.starknet_wrapper.generate_latest_block()
+                        await self.starknet_wrapper.seal_latest_block()
 
                 return True  # indicates the caught exception was handled successfully
 
         return TransactionHandler(self)
 
+    @logged_operation
     async def deploy_account(self, external_tx: DeployAccount):
         """Deploys account and returns (address, tx_hash)"""
 
@@ -543,6 +677,7 @@ class StarknetWrapper:
             tx_handler.internal_tx.hash_value,
         )
 
+    @logged_operation
     async def invoke(self, external_tx: InvokeFunction):
         """Perform invoke according to specifications in `transaction`."""
         state = self.get_state()
@@ -556,27 +691,19 @@ class StarknetWrapper:
             tx_handler.internal_calls = (
                 tx_handler.execution_info.call_info.internal_calls
             )
-            tx_handler.visited_storage_entries = (
-                tx_handler.execution_info.get_visited_storage_entries()
-            )
 
         return external_tx.sender_address, tx_handler.internal_tx.hash_value
 
-    async def __get_query_state(self, block_id: BlockId = DEFAULT_BLOCK_ID):
-        if block_id == PENDING_BLOCK_ID:
-            return self.get_state()
-        if block_id == LATEST_BLOCK_ID:
-            return self.__latest_state
-
+    async def __get_archived_block_hash(self, block_id: BlockId) -> int:
+        """Return the hash of the past block identified by `block_id`"""
         assert isinstance(block_id, dict)
         if block_id.get("block_hash"):
-            numeric_hash = self.blocks.get_numeric_hash(block_id.get("block_hash"))
-            return self.blocks.get_state(numeric_hash)
+            return self.blocks.get_numeric_hash(block_id.get("block_hash"))
 
         try:
             block_number = block_id.get("block_number")
             block = await self.blocks.get_by_number(int(block_number))
-            return self.blocks.get_state(block.block_hash)
+            return block.block_hash
         except ValueError:
             pass
 
@@ -585,14 +712,22 @@ class StarknetWrapper:
             message=f"Invalid block id: {block_id}",
         )
 
+    async def __get_query_state(self, block_id: BlockId = DEFAULT_BLOCK_ID):
+        if block_id == PENDING_BLOCK_ID:
+            return self.get_state()
+        if block_id == LATEST_BLOCK_ID:
+            # archived when sealed, so no copy of the state is needed
+            return self.blocks.get_latest_state()
+
+        block_hash = await self.__get_archived_block_hash(block_id)
+        return self.blocks.get_state(block_hash)
+
     async def call(
         self,
         transaction: Union[CallFunction, InvokeFunction],
         block_id: BlockId = DEFAULT_BLOCK_ID,
     ):
         """Perform call according to specifications in `transaction`."""
-        state = await self.__get_query_state(block_id)
-
         # property name different since starknet 0.11
         address = (
             transaction.contract_address
@@ -600,13 +735,40 @@ class StarknetWrapper:
             else transaction.sender_address
         )
 
-        call_info = await state.copy().execute_entry_point_raw(
+        # the state of a past block never changes, so neither do the results of calls on it;
+        # the entry point type isn't part of the key since calls are always external
+        cache_key = None
+        if block_id not in (PENDING_BLOCK_ID, LATEST_BLOCK_ID):
+            block_hash = await self.__get_archived_block_hash(block_id)
+            cache_key = CallResultCache.get_key(
+                block_hash,
+                address,
+                transaction.entry_point_selector,
+                transaction.calldata,
+            )
+            cached_retdata = self.call_cache.get(cache_key)
+            if cached_retdata is not None:
+                return {"result": list(map(hex, cached_retdata))}
+            state = self.blocks.get_state(block_hash)
+        else:
+            state = await self.__get_query_state(block_id)
+
+        # executed on a throwaway layer buffering the writes of the call over the state,
+        # so that the state isn't copied (a copy grows with the state)
+        call_state = StarknetState(
+            state=create_read_layer(state.state),
+            general_config=state.general_config,
+        )
+        call_info = await call_state.execute_entry_point_raw(
             contract_address=address,
             selector=transaction.entry_point_selector,
             calldata=transaction.calldata,
             caller_address=0,
         )
 
+        if cache_key is not None:
+            self.call_cache.put(cache_key, call_info.retdata)
+
         result = list(map(hex, call_info.retdata))
         return {"result": result}
 
@@ -654,8 +816,9 @@ class StarknetWrapper:
 
         # first handle the case of artifact being locally present
         if class_hash in self._contract_classes:
-            compiled_class_hash = await state.get_compiled_class_hash(class_hash)
-            return await state.get_compiled_class(compiled_class_hash)
+            read_layer = create_read_layer(state)
+            compiled_class_hash = await read_layer.get_compiled_class_hash(class_hash)
+            return await read_layer.get_compiled_class(compiled_class_hash)
 
         try:
             # directly on state_reader to ensure overridden method is called if forking
@@ -675,7 +838,7 @@ class StarknetWrapper:
     ) -> int:
         """Return class hash given the contract address"""
         state = await self.__get_query_state(block_id)
-        cached_state = state.state
+        cached_state = create_read_layer(state.state)
         class_hash = await cached_state.get_class_hash_at(contract_address)
 
         if not class_hash:
@@ -724,8 +887,11 @@ class StarknetWrapper:
         Returns the storage identified by `key` from the contract at `contract_address`.
         """
         state = await self.__get_query_state(block_id)
-        return hex(await state.state.get_storage_at(contract_address, key))
+        return hex(
+            await create_read_layer(state.state).get_storage_at(contract_address, key)
+        )
 
+    @unreplayable_operation
     async def load_messaging_contract_in_l1(
         self, network_url: str, contract_address: str, network_id: str
     ) -> dict:
@@ -734,6 +900,7 @@ class StarknetWrapper:
             self.starknet, network_url, contract_address, network_id
         )
 
+    @logged_operation
     async def consume_message_from_l2(
         self, from_address: int, to_address: int, payload: List[int]
     ) -> str:
@@ -749,6 +916,7 @@ class StarknetWrapper:
         state.consume_message_hash(message_hash=message_hash)
         return message_hash
 
+    @logged_operation
     async def mock_message_to_l2(self, transaction: InternalL1Handler) -> dict:
         """Handles L1 to L2 message mock endpoint"""
 
@@ -763,6 +931,7 @@ class StarknetWrapper:
 
         return transaction.hash_value
 
+    @unreplayable_operation
     async def postman_flush(self) -> dict:
         """Handles all pending L1 <> L2 messages and sends them to the other layer."""
 
@@ -787,39 +956,63 @@ class StarknetWrapper:
         parsed_l1_l2_messages["generated_l2_transactions"] = tx_hashes
         return parsed_l1_l2_messages
 
-    async def update_pending_block(self, state_update: BlockStateUpdate = None):
-        """Update pending block"""
-        await self.blocks.generate_pending(
-            transactions=self.pending_txs,
+    async def update_pending_block(
+        self, transaction: DevnetTransaction, state_update: BlockStateUpdate = None
+    ):
+        """Append `transaction` to the pending block"""
+        await self.blocks.append_pending(
+            transactions=[transaction],
             state=self.get_state(),
             state_update=state_update,
         )
 
+    @logged_operation
     async def generate_latest_block(self, block_hash=None) -> StarknetBlock:
         """
         Generate new block with pending transactions or empty block.
         Block hash can be specified in special cases.
         """
+        block_number = await self.seal_latest_block(block_hash=block_hash)
+        return await self.blocks.get_by_number(block_number)
+
+    async def seal_latest_block(self, block_hash=None) -> int:
+        """
+        Like `generate_latest_block`, but return the number of the new block
+        without waiting for it to be hashed (if hashing in background).
+        """
 
         # Store transactions and clear pending txs
         state = self.get_state()
+        accepted_txs = self.pending_txs
+
+        def accept_transactions(block: StarknetBlock):
+            for transaction in accepted_txs:
+                transaction.status = TransactionStatus.ACCEPTED_ON_L2
+                transaction.set_block(block=block)
+
         if self.blocks.is_block_pending():
-            block = await self.blocks.store_pending(state, block_hash=block_hash)
+            block_number = await self.blocks.seal_pending(
+                state, block_hash=block_hash, on_stored=accept_transactions
+            )
         else:
             # if no pending, default to creating an empty block
             assert not self.pending_txs
             block = await self.create_empty_block()
+            block_number = block.block_number
 
-        for transaction in self.pending_txs:
-            transaction.status = TransactionStatus.ACCEPTED_ON_L2
-            transaction.set_block(block=block)
+        self.pending_txs = []
 
-        # Update latest state before block generation
-        self.__latest_state = state.copy()
+        return block_number
 
-        self.pending_txs = []
+    async def wait_for_block_hashes(self):
+        """Wait until the blocks being hashed in background are stored"""
+        if self.blocks is not None:
+            await self.blocks.wait_for_hashes()
 
-        return block
+    def settle(self):
+        """Finish the work done in background threads (e.g. hashing blocks), e.g. before forking"""
+        if self.blocks is not None:
+            self.blocks.settle()
 
     async def calculate_trace_and_fee(
         self,
@@ -843,53 +1036,38 @@ class StarknetWrapper:
         """Calculates traces and fees by simulating tx on state copy.
         Uses the resulting state for each consecutive estimation"""
         state = await self.__get_query_state(block_id)
-        cached_state_copy = state.state
-
-        traces = []
-        fee_estimation_infos = []
-        transaction_types = []
 
-        for external_tx in external_txs:
-            # pylint: disable=protected-access
-            cached_state_copy = cached_state_copy._copy()
-            try:
-                internal_tx = InternalInvokeFunctionForSimulate.create_for_simulate(
+        try:
+            internal_txs = [
+                InternalInvokeFunctionForSimulate.create_for_simulate(
                     external_tx,
                     state.general_config,
                     skip_validate=skip_validate,
                 )
-            except AssertionError as error:
-                raise StarknetDevnetException(
-                    code=StarkErrorCode.MALFORMED_REQUEST,
-                    status_code=400,
-                    message="Invalid format of fee estimation request",
-                ) from error
-
-            execution_info = await internal_tx.apply_state_updates(
-                cached_state_copy,
-                state.general_config,
-            )
-
-            trace = TransactionTrace(
-                validate_invocation=FunctionInvocation.from_optional_internal(
-                    execution_info.validate_info
-                ),
-                function_invocation=FunctionInvocation.from_optional_internal(
-                    execution_info.call_info
-                ),
-                fee_transfer_invocation=FunctionInvocation.from_optional_internal(
-                    execution_info.fee_transfer_info
-                ),
-                signature=external_tx.signature,
+                for external_tx in external_txs
+            ]
+        except AssertionError as error:
+            raise StarknetDevnetException(
+                code=StarkErrorCode.MALFORMED_REQUEST,
+                status_code=400,
+                message="Invalid format of fee estimation request",
+            ) from error
+        signatures = [external_tx.signature for external_tx in external_txs]
+
+        # only the current state is shipped to the workers, since archived states might be views;
+        # unless there is a pending block, the latest state is the current one
+        is_current_state = block_id == PENDING_BLOCK_ID or (
+            block_id == LATEST_BLOCK_ID and not self.blocks.is_block_pending()
+        )
+        if self.simulation_pool and is_current_state:
+            results = await self.simulation_pool.simulate(
+                "current", self.get_state(), internal_txs, signatures
             )
-            traces.append(trace)
-
-            fee_estimation_info = get_fee_estimation_info(
-                execution_info.actual_fee, state.state.block_info.gas_price
+        else:
+            results = await simulate_transactions(
+                state.state, state.general_config, internal_txs, signatures
             )
-            fee_estimation_infos.append(fee_estimation_info)
-
-            transaction_types.append(internal_tx.tx_type)
+        traces, fee_estimation_infos, transaction_types = results
 
         assert len(traces) == len(fee_estimation_infos) == len(external_txs)
         return traces, fee_estimation_infos, transaction_types
@@ -904,8 +1082,7 @@ class StarknetWrapper:
         )
 
         execution_info = await internal_call.apply_state_updates(
-            # pylint: disable=protected-access
-            state.state._copy(),
+            create_read_layer(state.state),
             state.general_config,
         )
 
@@ -920,10 +1097,22 @@ class StarknetWrapper:
         )
         return fee_estimation_info
 
+    @logged_operation
+    async def mint(self, to_address: int, amount: int, lite: bool):
+        """
+        Mint `amount` of fee tokens at `to_address`.
+        Returns the `tx_hash` (as hex str) if not `lite`; else returns `None`
+        """
+        return await self.fee_token.mint(
+            to_address=to_address, amount=amount, lite=lite
+        )
+
+    @logged_operation
     def increase_block_time(self, time_s: int):
         """Increases the block time by `time_s`."""
         self.block_info_generator.increase_time(time_s)
 
+    @logged_operation
     def set_block_time(self, time_s: int):
         """Sets the block time to `time_s`."""
         self.block_info_generator.set_next_block_time(time_s)
@@ -937,12 +1126,14 @@ class StarknetWrapper:
     ):
         """Returns nonce of contract with `contract_address`"""
         state = await self.__get_query_state(block_id)
-        return await state.state.get_nonce_at(contract_address)
+        return await create_read_layer(state.state).get_nonce_at(contract_address)
 
     async def __predeclare_starknet_cli_account(self):
         """Predeclares the account class used by Starknet CLI"""
         state = self.get_state().state
-        state.compiled_classes[STARKNET_CLI_ACCOUNT_CLASS_HASH] = oz_account_class
+        state.compiled_classes[STARKNET_CLI_ACCOUNT_CLASS_HASH] = self.class_store.add(
+            STARKNET_CLI_ACCOUNT_CLASS_HASH, oz_account_class
+        )
 
     async def __deploy_chargeable_account(self):
         if await self.is_deployed(ChargeableAccount.ADDRESS):
@@ -957,6 +1148,7 @@ class StarknetWrapper:
         class_hash = await cached_state.get_class_hash_at(address)
         return bool(class_hash)
 
+    @logged_operation
     async def abort_blocks(self, starting_block: StarknetBlock) -> str:
         """
         Abort blocks.
@@ -1020,7 +1212,11 @@ class StarknetWrapper:
             else:
                 break
 
-        # Revert state.
-        self.starknet.state = self.blocks.get_state(last_block.block_hash)
+        # results of calls on the aborted blocks mustn't be served anymore
+        self.call_cache.clear()
+
+        # Revert state; copied so that new transactions don't modify the archived state
+        self.starknet.state = self.blocks.get_state(last_block.block_hash).copy()
+        await self.__preserve_current_state(self.starknet.state.state)
 
         return aborted_blocks
@@ -6,8 +6,9 @@ from pickle import UnpicklingError
 
 from starkware.starkware_utils.error_handling import StarkErrorCode
 
-from .devnet_config import DevnetConfig
+from .devnet_config import DevnetConfig, DumpFormat, DumpOn
 from .dump import Dumper
+from .scheduler import ExecutionScheduler
 from .starknet_wrapper import StarknetWrapper
 from .util import StarknetDevnetException, check_valid_dump_path
 
@@ -18,12 +19,18 @@ class State:
     """
 
     def __init__(self):
+        self.scheduler = ExecutionScheduler()
+        """Orders the requests; kept across restarts and loads, which are scheduled by it"""
         self.set_starknet_wrapper(StarknetWrapper(DevnetConfig()))
 
     def set_starknet_wrapper(self, starknet_wrapper: StarknetWrapper):
         """Sets starknet wrapper and creates new instance of dumper"""
+        previous_wrapper = getattr(self, "starknet_wrapper", None)
+        if previous_wrapper is not None and previous_wrapper is not starknet_wrapper:
+            previous_wrapper.close()
+
         self.starknet_wrapper = starknet_wrapper
-        self.dumper = Dumper(starknet_wrapper)
+        self.dumper = Dumper(starknet_wrapper, self.scheduler)
 
     async def reset(self):
         """Reset the starknet wrapper and dumper instances"""
@@ -41,7 +48,14 @@ class State:
                 code=StarkErrorCode.INVALID_REQUEST, message=message, status_code=400
             ) from error
 
-    def set_dump_options(self, dump_path: str, dump_on: str):
+    def set_dump_options(
+        self,
+        dump_path: str,
+        dump_on: DumpOn,
+        dump_format: DumpFormat = DumpFormat.PICKLE,
+        snapshot_interval: int = None,
+        in_background: bool = False,
+    ):
         """Assign dumping options from args to state."""
         if dump_path:
             try:
@@ -53,6 +67,8 @@ class State:
 
         self.dumper.dump_path = dump_path
         self.dumper.dump_on = dump_on
+        self.dumper.set_format(dump_format, snapshot_interval)
+        self.dumper.in_background = in_background
 
 
 state = State()
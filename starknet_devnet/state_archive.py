@@ -2,12 +2,31 @@
 Stores Starknet states
 """
 
-import shelve
+import dbm
+import os
+import queue
+import tempfile
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Hashable, List, Tuple
 
+from starkware.starknet.business_logic.state.state import BlockInfo, CachedState
+from starkware.starknet.business_logic.state.state_api import StateReader
 from starkware.starknet.definitions.error_codes import StarknetErrorCode
+from starkware.starknet.definitions.general_config import StarknetGeneralConfig
+from starkware.starknet.services.api.contract_class.contract_class import (
+    CompiledClassBase,
+)
 from starkware.starknet.testing.state import StarknetState
 
-from .util import StarknetDevnetException
+from .class_store import ClassStore
+from .constants import DEFAULT_CHECKPOINT_INTERVAL
+from .devnet_config import DevnetConfig, StateArchiveType
+from .lazy_dict import LazyDict
+from .state_journal import WriteTracker
+from .util import StarknetDevnetException, warn
 
 
 class StateArchive:
@@ -15,8 +34,13 @@ class StateArchive:
     Stores Starknet states
     """
 
+    def __init__(self, class_store: ClassStore = None):
+        self._class_store = ClassStore() if class_store is None else class_store
+        """Holds the classes of the stored states, so that they are shared instead of copied"""
+
     def store(self, number: int, state: StarknetState):
         """Store the state under the given number"""
+        self._class_store.intern(state.state.compiled_classes)
         self._storage_write(number, state)
 
     def remove(self, number: int):
@@ -36,6 +60,16 @@ class StateArchive:
                 message=f"State at block {number} not present",
             ) from error
 
+    def flush(self):
+        """Wait until the stored states are written, if written in background"""
+
+    def close(self):
+        """Release the resources (e.g. open files) held by the archive"""
+
+    def get_dump_sections(self) -> Dict[str, LazyDict]:
+        """Return the containers which can be dumped and loaded item by item, by name"""
+        return {}
+
     def _storage_write(self, number: int, state: StarknetState):
         raise NotImplementedError
 
@@ -51,9 +85,12 @@ class MemoryStateArchive(StateArchive):
     Stores Starknet states in memory
     """
 
-    def __init__(self):
-        super().__init__()
-        self.__storage = {}
+    def __init__(self, class_store: ClassStore = None):
+        super().__init__(class_store)
+        self.__storage = LazyDict()
+
+    def get_dump_sections(self) -> Dict[str, LazyDict]:
+        return {"archived_states": self.__storage}
 
     def _storage_write(self, number: int, state: StarknetState):
         self.__storage[number] = state.copy()
@@ -67,25 +104,667 @@ class MemoryStateArchive(StateArchive):
 
 class DiskStateArchive(StateArchive):
     """
-    Stores Starknet states on disk
+    Stores Starknet states on disk, keeping the most recently read ones in memory.
+    States are written by a background thread, so storing doesn't wait for the disk.
+    When pickled (e.g. dumped), the states on disk are included, so that a loaded archive
+    doesn't depend on the file; it writes them to a new temporary file instead.
     """
 
-    PATH = "/tmp/starknet-devnet-state.db"
+    CACHE_SIZE = 16
 
-    def __init__(self):
-        super().__init__()
-        with shelve.open(self.PATH, flag="n"):
-            # just create the database (always a new - overwrite the old one)
+    def __init__(
+        self,
+        path: str = None,
+        cache_size: int = CACHE_SIZE,
+        class_store: ClassStore = None,
+    ):
+        super().__init__(class_store)
+        self.__path = path or self.__create_path()
+        self.__cache_size = cache_size
+        with dbm.open(self.__path, "n"):
+            # just create the database (always a new - overwrite the old one, e.g. on restart)
             pass
 
+        self.__open_lock = threading.Lock()
+        self.__init_runtime()
+
+    def __init_runtime(self):
+        self.__db = None
+        self.__lock = threading.Lock()
+        self.__queue = queue.Queue()
+        self.__owner_pid = None
+        self.__pending: Dict[int, StarknetState] = {}
+        """States not yet written to disk"""
+        self.__cache: Dict[int, StarknetState] = OrderedDict()
+        """Recently read states"""
+
+    @staticmethod
+    def __create_path() -> str:
+        return os.path.join(tempfile.mkdtemp(prefix="starknet-devnet-"), "state.db")
+
+    def __getstate__(self):
+        self.flush()
+        with self.__lock:
+            # states which couldn't be written
+            pending = dict(self.__pending)
+            # read through the open database (if any), which might be inherited by a forked process
+            written = (
+                {}
+                if self.__db is None
+                else {key: self.__db[key] for key in self.__db.keys()}
+            )
+        return {
+            "cache_size": self.__cache_size,
+            "class_store": self._class_store,
+            "written": written,
+            "pending": pending,
+        }
+
+    def __setstate__(self, state: dict):
+        # the file of the dumped archive might be gone or used by another instance
+        self.__path = self.__create_path()
+        self.__cache_size = state["cache_size"]
+        self._class_store = state["class_store"]
+        with dbm.open(self.__path, "n") as database:
+            for number, serialized in state["written"].items():
+                database[number] = serialized
+
+        self.__open_lock = threading.Lock()
+        self.__init_runtime()
+        # written once opened
+        self.__pending = state["pending"]
+
+    def __ensure_open(self):
+        """
+        Open the database and start the writer thread if not done in this process.
+        Checking the pid is needed because threads don't survive forking (e.g. by gunicorn).
+        """
+        if self.__owner_pid == os.getpid():
+            return
+
+        # reads handled in different threads can get here at the same time
+        with self.__open_lock:
+            if self.__owner_pid == os.getpid():
+                return
+
+            pending = self.__pending
+            self.__init_runtime()
+            self.__pending = pending
+            self.__db = dbm.open(self.__path, "c")
+            for number in pending:
+                self.__queue.put(number)
+
+            threading.Thread(
+                target=self.__write_pending, args=(self.__queue,), daemon=True
+            ).start()
+            self.__owner_pid = os.getpid()
+
+    def __write_pending(self, pending_queue: queue.Queue):
+        while True:
+            number = pending_queue.get()
+            try:
+                if number is None:
+                    # closed
+                    return
+
+                with self.__lock:
+                    state = self.__pending.get(number)
+
+                if state is not None:
+                    self.__write(number, state)
+            except Exception as error:  # pylint: disable=broad-except
+                # the state stays pending, so it can still be read
+                warn(f"Could not write the state of block {number} to disk: {error}")
+            finally:
+                pending_queue.task_done()
+
+    def __write(self, number: int, state: StarknetState):
+        # the classes are stored once, in the class store
+        serialized = self._class_store.dumps(state)
+        with self.__lock:
+            # skip if removed in the meantime
+            if self.__pending.get(number) is state:
+                self.__db[str(number)] = serialized
+                del self.__pending[number]
+
+    def flush(self):
+        """Wait until all stored states are written to disk"""
+        if self.__owner_pid == os.getpid():
+            self.__queue.join()
+
+    def close(self):
+        self.flush()
+        self.__queue.put(None)
+        with self.__lock:
+            if self.__db is not None:
+                self.__db.close()
+                self.__db = None
+                self.__owner_pid = None
+
     def _storage_write(self, number: int, state: StarknetState):
-        with shelve.open(self.PATH, flag="w") as storage:
-            storage[str(number)] = state
+        self.__ensure_open()
+        state_copy = state.copy()
+        with self.__lock:
+            self.__pending[number] = state_copy
+        self.__queue.put(number)
 
     def _storage_read(self, number: int) -> StarknetState:
-        with shelve.open(self.PATH, flag="r") as storage:
-            return storage[str(number)]
+        self.__ensure_open()
+        with self.__lock:
+            if number in self.__cache:
+                self.__cache.move_to_end(number)
+                return self.__cache[number]
 
-    def _storage_remove(self, number: int) -> StarknetState:
-        with shelve.open(self.PATH, flag="w") as storage:
-            del storage[str(number)]
+            if number in self.__pending:
+                return self.__pending[number]
+
+            state = self._class_store.loads(self.__db[str(number)])
+            self.__cache[number] = state
+            if len(self.__cache) > self.__cache_size:
+                self.__cache.popitem(last=False)
+
+            return state
+
+    def _storage_remove(self, number: int):
+        self.__ensure_open()
+        with self.__lock:
+            self.__cache.pop(number, None)
+            if self.__pending.pop(number, None) is None:
+                del self.__db[str(number)]
+
+
+_MISSING = object()
+
+
+class _VersionedMapping:
+    """
+    Stores the history of values of each key, ordered by the sequence number of the
+    archived state in which the value was written.
+    """
+
+    def __init__(self):
+        self.__history: Dict[Hashable, Tuple[List[int], List[Any]]] = {}
+
+    def __contains__(self, key: Hashable):
+        return key in self.__history
+
+    def get(self, key: Hashable, seq: int, default: Any = _MISSING) -> Any:
+        """Return the value of `key` as it was in the state with sequence number `seq`"""
+        history = self.__history.get(key)
+        if history is None:
+            return default
+
+        seqs, values = history
+        index = bisect_right(seqs, seq)
+        return values[index - 1] if index else default
+
+    def latest(self, key: Hashable, default: Any = _MISSING) -> Any:
+        """Return the last written value of `key`"""
+        history = self.__history.get(key)
+        return history[1][-1] if history else default
+
+    def set(self, key: Hashable, seq: int, value: Any):
+        """Write `value` under `key`; `seq` has to be greater than all previous ones"""
+        seqs, values = self.__history.setdefault(key, ([], []))
+        seqs.append(seq)
+        values.append(value)
+
+    def remove(self, key: Hashable, seq: int):
+        """Remove the value of `key` written in the state with sequence number `seq`"""
+        seqs, values = self.__history[key]
+        index = bisect_right(seqs, seq) - 1
+        if index >= 0 and seqs[index] == seq:
+            del seqs[index]
+            del values[index]
+
+        if not seqs:
+            del self.__history[key]
+
+
+_WRITE_KINDS = ("storage", "nonces", "class_hashes", "compiled_class_hashes")
+
+
+def get_cache_writes(cached_state: CachedState) -> Dict[str, dict]:
+    """Return what was written to `cached_state`, by the kind of the written value"""
+    # pylint: disable=protected-access
+    cache = cached_state.cache
+    return {
+        "storage": cache._storage_writes,
+        "nonces": cache._nonce_writes,
+        "class_hashes": cache._class_hash_writes,
+        "compiled_class_hashes": cache._compiled_class_hash_writes,
+    }
+
+
+def _get_candidate_keys(
+    write_tracker: WriteTracker, kind: str, writes: dict
+) -> List[Hashable]:
+    """Return the keys of `writes` possibly written since they were last tracked"""
+    written_keys = write_tracker.get_written_keys(kind, writes)
+    return list(writes) if written_keys is None else written_keys
+
+
+@dataclass
+class _StateDelta:
+    """What changed in an archived state relative to its predecessor"""
+
+    block_info: BlockInfo
+    general_config: StarknetGeneralConfig
+    written_keys: Dict[str, List[Hashable]]
+    l2_to_l1_messages: Dict[str, int]
+    l2_to_l1_messages_log: tuple
+
+
+class _DeltaStateReader(StateReader):
+    """
+    Read-only view of the state archived under sequence number `seq` in a `DeltaStateArchive`.
+    Everything not written by devnet is read from the archive's base reader.
+    """
+
+    def __init__(self, archive: "DeltaStateArchive", seq: int):
+        self.__archive = archive
+        self.__seq = seq
+
+    def __deepcopy__(self, memo):
+        # the view is immutable, so copies of states built on top of it can share it
+        return self
+
+    def __read(self, kind: str, key: Hashable) -> Any:
+        # pylint: disable=protected-access
+        return self.__archive._mappings[kind].get(key, self.__seq)
+
+    @property
+    def __base_reader(self) -> StateReader:
+        # pylint: disable=protected-access
+        return self.__archive._base_reader
+
+    async def get_compiled_class(self, compiled_class_hash: int) -> CompiledClassBase:
+        compiled_class = self.__read("compiled_classes", compiled_class_hash)
+        if compiled_class is _MISSING:
+            return await self.__base_reader.get_compiled_class(compiled_class_hash)
+        return compiled_class
+
+    async def get_compiled_class_hash(self, class_hash: int) -> int:
+        compiled_class_hash = self.__read("compiled_class_hashes", class_hash)
+        if compiled_class_hash is _MISSING:
+            return await self.__base_reader.get_compiled_class_hash(class_hash)
+        return compiled_class_hash
+
+    async def get_compiled_class_by_class_hash(
+        self, class_hash: int
+    ) -> CompiledClassBase:
+        if (
+            self.__read("compiled_class_hashes", class_hash) is _MISSING
+            and self.__read("compiled_classes", class_hash) is _MISSING
+        ):
+            # not known locally; the base reader (e.g. forked) knows how to resolve it
+            return await self.__base_reader.get_compiled_class_by_class_hash(class_hash)
+        return await super().get_compiled_class_by_class_hash(class_hash)
+
+    async def get_class_hash_at(self, contract_address: int) -> int:
+        class_hash = self.__read("class_hashes", contract_address)
+        if class_hash is _MISSING:
+            return await self.__base_reader.get_class_hash_at(contract_address)
+        return class_hash
+
+    async def get_nonce_at(self, contract_address: int) -> int:
+        nonce = self.__read("nonces", contract_address)
+        if nonce is _MISSING:
+            return await self.__base_reader.get_nonce_at(contract_address)
+        return nonce
+
+    async def get_storage_at(self, contract_address: int, key: int) -> int:
+        value = self.__read("storage", (contract_address, key))
+        if value is _MISSING:
+            return await self.__base_reader.get_storage_at(contract_address, key)
+        return value
+
+
+class DeltaStateArchive(StateArchive):
+    """
+    Stores only what changed in each state (storage, nonces, class hashes, classes)
+    on top of a base state reader shared by all archived states.
+    States are rebuilt as lightweight views on read.
+    """
+
+    def __init__(self, class_store: ClassStore = None):
+        super().__init__(class_store)
+        self._base_reader: StateReader = None
+        self._mappings: Dict[str, _VersionedMapping] = {
+            "storage": _VersionedMapping(),
+            "nonces": _VersionedMapping(),
+            "class_hashes": _VersionedMapping(),
+            "compiled_class_hashes": _VersionedMapping(),
+            "compiled_classes": _VersionedMapping(),
+        }
+        self.__number2seq: Dict[int, int] = {}
+        self.__deltas: Dict[int, _StateDelta] = {}
+        self.__last_delta: _StateDelta = None
+        # never reused, so that views of removed states never see newer writes
+        self.__next_seq = 0
+        self.__write_tracker = WriteTracker()
+
+    def __record_writes(self, seq: int, kind: str, writes: dict) -> List[Hashable]:
+        mapping = self._mappings[kind]
+        written_keys = [
+            key
+            for key in _get_candidate_keys(self.__write_tracker, kind, writes)
+            if mapping.latest(key) != writes[key]
+        ]
+        for key in written_keys:
+            mapping.set(key, seq, writes[key])
+        return written_keys
+
+    def __record_classes(self, seq: int, compiled_classes: dict) -> List[Hashable]:
+        # classes are immutable, so comparing keys is enough (and much cheaper)
+        mapping = self._mappings["compiled_classes"]
+        written_keys = [
+            key
+            for key in _get_candidate_keys(
+                self.__write_tracker, "compiled_classes", compiled_classes
+            )
+            if key not in mapping
+        ]
+        for key in written_keys:
+            mapping.set(key, seq, compiled_classes[key])
+        return written_keys
+
+    def __get_messages(self, state: StarknetState) -> Tuple[Dict[str, int], tuple]:
+        # pylint: disable=protected-access
+        messages = state._l2_to_l1_messages
+        messages_log = tuple(state.l2_to_l1_messages_log)
+        last_delta = self.__last_delta
+        if last_delta is None:
+            return dict(messages), messages_log
+
+        # reuse the previous snapshot if unchanged
+        if messages != last_delta.l2_to_l1_messages:
+            messages = dict(messages)
+        else:
+            messages = last_delta.l2_to_l1_messages
+        if messages_log == last_delta.l2_to_l1_messages_log:
+            messages_log = last_delta.l2_to_l1_messages_log
+        return messages, messages_log
+
+    def _storage_write(self, number: int, state: StarknetState):
+        seq = self.__next_seq
+        self.__next_seq += 1
+
+        cached_state = state.state
+        if self._base_reader is None:
+            self._base_reader = cached_state.state_reader
+
+        written_keys = {
+            kind: self.__record_writes(seq, kind, writes)
+            for kind, writes in get_cache_writes(cached_state).items()
+        }
+        written_keys["compiled_classes"] = self.__record_classes(
+            seq, cached_state.compiled_classes
+        )
+
+        messages, messages_log = self.__get_messages(state)
+        delta = _StateDelta(
+            block_info=cached_state.block_info,
+            general_config=state.general_config,
+            written_keys=written_keys,
+            l2_to_l1_messages=messages,
+            l2_to_l1_messages_log=messages_log,
+        )
+        self.__number2seq[number] = seq
+        self.__deltas[seq] = delta
+        self.__last_delta = delta
+
+    def _storage_remove(self, number: int):
+        seq = self.__number2seq.pop(number)
+        delta = self.__deltas.pop(seq)
+        for kind, keys in delta.written_keys.items():
+            for key in keys:
+                self._mappings[kind].remove(key, seq)
+
+        if delta is self.__last_delta:
+            self.__last_delta = (
+                self.__deltas[max(self.__deltas)] if self.__deltas else None
+            )
+
+    def _storage_read(self, number: int) -> StarknetState:
+        seq = self.__number2seq[number]
+        delta = self.__deltas[seq]
+
+        state = StarknetState(
+            state=CachedState(
+                block_info=delta.block_info,
+                state_reader=_DeltaStateReader(self, seq),
+                compiled_class_cache={},
+            ),
+            general_config=delta.general_config,
+        )
+        # pylint: disable=protected-access
+        state._l2_to_l1_messages = dict(delta.l2_to_l1_messages)
+        state.l2_to_l1_messages_log = list(delta.l2_to_l1_messages_log)
+        return state
+
+
+@dataclass
+class _StateChanges:
+    """
+    What changed in an archived state relative to its predecessor, along with the
+    values overwritten (needed for undoing the changes). Checkpoints also hold the full state.
+    """
+
+    block_info: BlockInfo
+    general_config: StarknetGeneralConfig
+    writes: Dict[str, dict]
+    overwritten: Dict[str, dict]
+    l2_to_l1_messages: Dict[str, int]
+    l2_to_l1_messages_log: tuple
+    checkpoint: StarknetState = None
+
+
+class CheckpointStateArchive(StateArchive):
+    """
+    Stores a full copy of every `interval`-th state and only the changes of the states in between.
+    Other states are reconstructed by applying the changes to the nearest preceding checkpoint;
+    the most recently reconstructed states are cached.
+    """
+
+    CACHE_SIZE = 8
+
+    def __init__(
+        self,
+        interval: int = DEFAULT_CHECKPOINT_INTERVAL,
+        cache_size: int = CACHE_SIZE,
+        class_store: ClassStore = None,
+    ):
+        super().__init__(class_store)
+        self.__interval = interval
+        self.__cache_size = cache_size
+        self.__numbers: List[int] = []
+        """Numbers of the archived states, in the order of storing"""
+        self.__changes: Dict[int, _StateChanges] = {}
+        self.__latest: Dict[str, dict] = {
+            kind: {} for kind in (*_WRITE_KINDS, "compiled_classes")
+        }
+        """Values as in the last archived state"""
+        self.__cache: Dict[int, StarknetState] = OrderedDict()
+        """Recently reconstructed states"""
+        self.__cache_lock = threading.Lock()
+        self.__write_tracker = WriteTracker()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_CheckpointStateArchive__cache_lock"]
+        return state
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        self.__cache_lock = threading.Lock()
+
+    def __record_writes(self, cached_state: CachedState) -> Tuple[dict, dict]:
+        writes = {}
+        for kind, kind_writes in get_cache_writes(cached_state).items():
+            latest = self.__latest[kind]
+            writes[kind] = {
+                key: kind_writes[key]
+                for key in _get_candidate_keys(self.__write_tracker, kind, kind_writes)
+                if latest.get(key, _MISSING) != kind_writes[key]
+            }
+
+        # classes are immutable, so comparing keys is enough (and much cheaper)
+        compiled_classes = cached_state.compiled_classes
+        latest_classes = self.__latest["compiled_classes"]
+        writes["compiled_classes"] = {
+            key: compiled_classes[key]
+            for key in _get_candidate_keys(
+                self.__write_tracker, "compiled_classes", compiled_classes
+            )
+            if key not in latest_classes
+        }
+
+        overwritten = {}
+        for kind, kind_writes in writes.items():
+            latest = self.__latest[kind]
+            overwritten[kind] = {key: latest.get(key, _MISSING) for key in kind_writes}
+            latest.update(kind_writes)
+
+        return writes, overwritten
+
+    def __undo_writes(self, changes: _StateChanges):
+        for kind, kind_overwritten in changes.overwritten.items():
+            latest = self.__latest[kind]
+            for key, value in kind_overwritten.items():
+                if value is _MISSING:
+                    del latest[key]
+                else:
+                    latest[key] = value
+
+    def __is_checkpoint_due(self) -> bool:
+        since_checkpoint = 0
+        for number in reversed(self.__numbers):
+            if self.__changes[number].checkpoint is not None:
+                return since_checkpoint + 1 >= self.__interval
+            since_checkpoint += 1
+        return True
+
+    def _storage_write(self, number: int, state: StarknetState):
+        cached_state = state.state
+        writes, overwritten = self.__record_writes(cached_state)
+
+        # pylint: disable=protected-access
+        messages = state._l2_to_l1_messages
+        messages_log = tuple(state.l2_to_l1_messages_log)
+        previous = self.__changes[self.__numbers[-1]] if self.__numbers else None
+        # reuse the previous snapshot if unchanged
+        if previous is not None and messages == previous.l2_to_l1_messages:
+            messages = previous.l2_to_l1_messages
+        else:
+            messages = dict(messages)
+        if previous is not None and messages_log == previous.l2_to_l1_messages_log:
+            messages_log = previous.l2_to_l1_messages_log
+
+        self.__changes[number] = _StateChanges(
+            block_info=cached_state.block_info,
+            general_config=state.general_config,
+            writes=writes,
+            overwritten=overwritten,
+            l2_to_l1_messages=messages,
+            l2_to_l1_messages_log=messages_log,
+            checkpoint=state.copy() if self.__is_checkpoint_due() else None,
+        )
+        self.__numbers.append(number)
+
+    def _storage_remove(self, number: int):
+        changes = self.__changes[number]
+        index = self.__numbers.index(number)
+        if index == len(self.__numbers) - 1:
+            self.__undo_writes(changes)
+        else:
+            successor_number = self.__numbers[index + 1]
+            successor = self.__changes[successor_number]
+            if changes.checkpoint is not None and successor.checkpoint is None:
+                successor.checkpoint = self._storage_read(successor_number).copy()
+
+            # the successor now takes over the changes of the removed state
+            for kind, kind_writes in changes.writes.items():
+                successor.writes[kind] = {**kind_writes, **successor.writes[kind]}
+                successor.overwritten[kind] = {
+                    **successor.overwritten[kind],
+                    **changes.overwritten[kind],
+                }
+
+        del self.__numbers[index]
+        del self.__changes[number]
+        self.__cache.pop(number, None)
+
+    def _storage_read(self, number: int) -> StarknetState:
+        # reads handled in different threads can reconstruct states at the same time
+        with self.__cache_lock:
+            return self.__reconstruct(number)
+
+    def __reconstruct(self, number: int) -> StarknetState:
+        if number in self.__cache:
+            self.__cache.move_to_end(number)
+            return self.__cache[number]
+
+        changes = self.__changes[number]
+        if changes.checkpoint is not None:
+            return changes.checkpoint
+
+        # go back to the closest checkpoint (or already reconstructed state)
+        index = self.__numbers.index(number)
+        start_index = index - 1
+        while True:
+            start_number = self.__numbers[start_index]
+            if start_number in self.__cache:
+                start_state = self.__cache[start_number]
+                break
+            start_state = self.__changes[start_number].checkpoint
+            if start_state is not None:
+                break
+            start_index -= 1
+
+        writes = {kind: {} for kind in (*_WRITE_KINDS, "compiled_classes")}
+        for replayed_number in self.__numbers[start_index + 1 : index + 1]:
+            for kind, kind_writes in self.__changes[replayed_number].writes.items():
+                writes[kind].update(kind_writes)
+
+        state = start_state.copy()
+        cached_state = state.state
+        cached_state.block_info = changes.block_info
+        cached_state.cache.update_writes(
+            address_to_class_hash=writes["class_hashes"],
+            address_to_nonce=writes["nonces"],
+            class_hash_to_compiled_class_hash=writes["compiled_class_hashes"],
+            storage_updates=writes["storage"],
+        )
+        cached_state.compiled_classes.update(writes["compiled_classes"])
+        state.general_config = changes.general_config
+        # pylint: disable=protected-access
+        state._l2_to_l1_messages = dict(changes.l2_to_l1_messages)
+        state.l2_to_l1_messages_log = list(changes.l2_to_l1_messages_log)
+
+        self.__cache[number] = state
+        if len(self.__cache) > self.__cache_size:
+            self.__cache.popitem(last=False)
+
+        return state
+
+
+def select_state_archive(
+    config: DevnetConfig, class_store: ClassStore = None
+) -> StateArchive:
+    """
+    Selects the state archive class according to the specification in the config object.
+    The classes of the archived states are held by `class_store`.
+    """
+    if config.state_archive == StateArchiveType.DELTA:
+        return DeltaStateArchive(class_store=class_store)
+
+    if config.state_archive == StateArchiveType.CHECKPOINT:
+        return CheckpointStateArchive(
+            config.checkpoint_interval, class_store=class_store
+        )
+
+    if config.state_archive == StateArchiveType.DISK:
+        return DiskStateArchive(config.state_archive_path, class_store=class_store)
+
+    return MemoryStateArchive(class_store=class_store)
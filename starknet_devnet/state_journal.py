@@ -0,0 +1,248 @@
+"""
+Journaling of state writes, used for reading the state as it was before the latest writes
+"""
+
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+from starkware.starknet.business_logic.state.state import CachedState
+from starkware.starknet.business_logic.state.state_api import StateReader
+from starkware.starknet.services.api.contract_class.contract_class import (
+    CompiledClassBase,
+)
+
+
+class _Missing:
+    """Marks the absence of a value; a class, so that it survives copying and pickling"""
+
+
+class _JournaledDict(dict):
+    """
+    Dict remembering the values overwritten since the journal was last cleared,
+    and which keys were written most recently
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.journal: Dict[Hashable, Any] = {}
+        self.version = 0
+        """Number of writes so far"""
+        self.versions: Dict[Hashable, int] = OrderedDict()
+        """Version of the last write of each written key, in the order of writing"""
+
+    def __reduce__(self):
+        # avoids replaying the items through __setitem__ when copying or unpickling;
+        # the order of writes isn't copied (e.g. to archived states), since only the original is tracked
+        return (self.__class__, (dict(self),), {"journal": self.journal})
+
+    def __setitem__(self, key: Hashable, value: Any):
+        if key not in self.journal:
+            self.journal[key] = self.get(key, _Missing)
+        super().__setitem__(key, value)
+        self.version += 1
+        self.versions[key] = self.version
+        self.versions.move_to_end(key)
+
+    def get_written_since(self, version: int) -> List[Hashable]:
+        """Return the keys written after the write numbered `version`"""
+        keys = []
+        for key, key_version in reversed(self.versions.items()):
+            if key_version <= version:
+                break
+            keys.append(key)
+        return keys
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def setdefault(self, key: Hashable, default: Any = None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+
+def _journal(mapping: dict) -> _JournaledDict:
+    return mapping if isinstance(mapping, _JournaledDict) else _JournaledDict(mapping)
+
+
+class WriteTracker:
+    """
+    Lists the keys written to the mappings of a state (e.g. its cached storage writes)
+    since they were last listed, without inspecting the other keys.
+    Only the writes to journaled mappings (see `StateJournal`) are tracked.
+    """
+
+    def __init__(self):
+        self.__marks: Dict[str, Tuple[_JournaledDict, int]] = {}
+
+    def __getstate__(self):
+        # the tracked mappings aren't pickled along, so tracking starts over
+        return {}
+
+    def __setstate__(self, state: dict):
+        self.__init__()
+
+    def get_written_keys(self, name: str, mapping: dict) -> Optional[List[Hashable]]:
+        """
+        Return the keys written to `mapping` since it was last listed under `name`.
+        Return `None` if unknown, i.e. if `mapping` isn't journaled or wasn't listed under `name`
+        (e.g. because the state was replaced), in which case any key might have been written.
+        """
+        mark = self.__marks.pop(name, None)
+        if not isinstance(mapping, _JournaledDict):
+            return None
+
+        self.__marks[name] = (mapping, mapping.version)
+        if mark is None or mark[0] is not mapping:
+            return None
+        return mapping.get_written_since(mark[1])
+
+
+class StateJournal(StateReader):
+    """
+    Read-only view of `state` as it was when the journal was created.
+    Only the values of the keys written in the meantime are recorded, so creating a journal
+    doesn't depend on the size of the state (unlike copying the state).
+    The view is valid until a new journal is created for the same state.
+    """
+
+    def __init__(self, state: CachedState):
+        self.__state = state
+
+        # pylint: disable=protected-access
+        cache = state.cache
+        cache._storage_writes = _journal(cache._storage_writes)
+        cache.storage_view.maps[0] = cache._storage_writes
+        cache._nonce_writes = _journal(cache._nonce_writes)
+        cache.address_to_nonce.maps[0] = cache._nonce_writes
+        cache._class_hash_writes = _journal(cache._class_hash_writes)
+        cache.address_to_class_hash.maps[0] = cache._class_hash_writes
+        cache._compiled_class_hash_writes = _journal(cache._compiled_class_hash_writes)
+        cache.class_hash_to_compiled_class_hash.maps[
+            0
+        ] = cache._compiled_class_hash_writes
+        state._compiled_classes = _journal(state.compiled_classes)
+
+        self.__storage = cache._storage_writes
+        self.__nonces = cache._nonce_writes
+        self.__class_hashes = cache._class_hash_writes
+        self.__compiled_class_hashes = cache._compiled_class_hash_writes
+        self.__compiled_classes = state._compiled_classes
+        for journaled in (
+            self.__storage,
+            self.__nonces,
+            self.__class_hashes,
+            self.__compiled_class_hashes,
+            self.__compiled_classes,
+        ):
+            journaled.journal.clear()
+
+    async def __read(
+        self, journaled: _JournaledDict, journal_key: Hashable, method: str, **kwargs
+    ):
+        if journal_key not in journaled.journal:
+            # not changed since
+            return await getattr(self.__state, method)(**kwargs)
+
+        value = journaled.journal[journal_key]
+        if value is _Missing:
+            # not written before, so as in the underlying reader
+            return await getattr(self.__state.state_reader, method)(**kwargs)
+        return value
+
+    async def get_compiled_class(self, compiled_class_hash: int) -> CompiledClassBase:
+        return await self.__read(
+            self.__compiled_classes,
+            compiled_class_hash,
+            "get_compiled_class",
+            compiled_class_hash=compiled_class_hash,
+        )
+
+    async def get_compiled_class_hash(self, class_hash: int) -> int:
+        return await self.__read(
+            self.__compiled_class_hashes,
+            class_hash,
+            "get_compiled_class_hash",
+            class_hash=class_hash,
+        )
+
+    async def get_class_hash_at(self, contract_address: int) -> int:
+        return await self.__read(
+            self.__class_hashes,
+            contract_address,
+            "get_class_hash_at",
+            contract_address=contract_address,
+        )
+
+    async def get_nonce_at(self, contract_address: int) -> int:
+        return await self.__read(
+            self.__nonces,
+            contract_address,
+            "get_nonce_at",
+            contract_address=contract_address,
+        )
+
+    async def get_storage_at(self, contract_address: int, key: int) -> int:
+        return await self.__read(
+            self.__storage,
+            (contract_address, key),
+            "get_storage_at",
+            contract_address=contract_address,
+            key=key,
+        )
+
+    async def __get_changes(
+        self,
+        journaled: _JournaledDict,
+        initial_values: dict,
+        read_previous: Callable[[Hashable], Awaitable[Any]],
+    ) -> Dict[Hashable, Tuple[Any, Any]]:
+        changes = {}
+        for key, previous in journaled.journal.items():
+            if previous is _Missing:
+                # the value read before writing, if any, is the previous one
+                previous = initial_values.get(key, _Missing)
+            if previous is _Missing:
+                previous = await read_previous(key)
+
+            current = journaled[key]
+            if previous != current:
+                changes[key] = (previous, current)
+        return changes
+
+    async def get_storage_changes(self) -> Dict[Tuple[int, int], Tuple[int, int]]:
+        """
+        Return (previous value, current value) of storage entries changed since the journal was created;
+        keyed by (contract address, storage key)
+        """
+        # pylint: disable=protected-access
+        return await self.__get_changes(
+            self.__storage,
+            self.__state.cache._storage_initial_values,
+            lambda entry: self.__state.state_reader.get_storage_at(
+                contract_address=entry[0], key=entry[1]
+            ),
+        )
+
+    async def get_nonce_changes(self) -> Dict[int, Tuple[int, int]]:
+        """Return (previous nonce, current nonce) of contracts whose nonce changed since the journal was created"""
+        # pylint: disable=protected-access
+        return await self.__get_changes(
+            self.__nonces,
+            self.__state.cache._nonce_initial_values,
+            lambda address: self.__state.state_reader.get_nonce_at(
+                contract_address=address
+            ),
+        )
+
+    async def get_class_hash_changes(self) -> Dict[int, Tuple[int, int]]:
+        """Return (previous class hash, current class hash) of contracts whose class hash changed since the journal was created"""
+        # pylint: disable=protected-access
+        return await self.__get_changes(
+            self.__class_hashes,
+            self.__state.cache._class_hash_initial_values,
+            lambda address: self.__state.state_reader.get_class_hash_at(
+                contract_address=address
+            ),
+        )
@@ -2,7 +2,7 @@
 Classes for storing and handling transactions.
 """
 
-from typing import Dict, List
+from typing import Awaitable, Callable, Dict, List
 
 from services.everest.business_logic.transaction_execution_objects import (
     TransactionFailureReason,
@@ -30,6 +30,7 @@ from starkware.starknet.testing.objects import StarknetCallInfo
 from starkware.starkware_utils.error_handling import StarkErrorCode
 from web3 import Web3
 
+from .lazy_dict import LazyDict
 from .origin import Origin
 from .util import StarknetDevnetException
 
@@ -188,14 +189,27 @@ class DevnetTransactions:
     This class is used to store transactions.
     """
 
-    def __init__(self, origin: Origin):
+    def __init__(
+        self, origin: Origin, wait_for_blocks: Callable[[], Awaitable[None]] = None
+    ):
         self.origin = origin
-        self.__instances: Dict[int, DevnetTransaction] = {}
+        self.__instances: Dict[int, DevnetTransaction] = LazyDict()
+        self.__wait_for_blocks = wait_for_blocks
+        """Waits until the transactions of blocks hashed in background are accepted"""
 
-    def __get_transaction_by_hash(self, tx_hash: str) -> DevnetTransaction or None:
+    def get_dump_sections(self) -> Dict[str, LazyDict]:
+        """Return the containers which can be dumped and loaded item by item, by name"""
+        return {"transactions": self.__instances}
+
+    async def __get_transaction_by_hash(
+        self, tx_hash: str
+    ) -> DevnetTransaction or None:
         """
         Get a transaction by hash.
         """
+        if self.__wait_for_blocks is not None:
+            await self.__wait_for_blocks()
+
         if tx_hash.startswith("0x"):
             try:
                 return self.__instances.get(int(tx_hash, 16))
@@ -223,7 +237,7 @@ class DevnetTransactions:
         """
         Get a transaction info.
         """
-        transaction = self.__get_transaction_by_hash(tx_hash)
+        transaction = await self.__get_transaction_by_hash(tx_hash)
 
         if transaction is None:
             return await self.origin.get_transaction(tx_hash)
@@ -234,7 +248,7 @@ class DevnetTransactions:
         """
         Get a transaction trace.
         """
-        transaction = self.__get_transaction_by_hash(tx_hash)
+        transaction = await self.__get_transaction_by_hash(tx_hash)
 
         if transaction is None:
             return await self.origin.get_transaction_trace(tx_hash)
@@ -251,7 +265,7 @@ class DevnetTransactions:
         """
         Get a transaction receipt.
         """
-        transaction = self.__get_transaction_by_hash(tx_hash)
+        transaction = await self.__get_transaction_by_hash(tx_hash)
 
         if transaction is None:
             return await self.origin.get_transaction_receipt(tx_hash)
@@ -262,7 +276,7 @@ class DevnetTransactions:
         """
         Get a transaction status.
         """
-        transaction = self.__get_transaction_by_hash(tx_hash)
+        transaction = await self.__get_transaction_by_hash(tx_hash)
 
         if transaction is None:
             return await self.origin.get_transaction_status(tx_hash)
@@ -5,10 +5,14 @@ import logging
 import os
 import sys
 from dataclasses import dataclass
-from typing import Dict, List, Set, Tuple
+from typing import Any, Dict, Hashable, List, Mapping, Tuple
 
 from starkware.starknet.business_logic.state.state import CachedState
+from starkware.starknet.business_logic.state.state_api import StateReader
 from starkware.starknet.definitions.error_codes import StarknetErrorCode
+from starkware.starknet.services.api.contract_class.contract_class import (
+    CompiledClassBase,
+)
 from starkware.starknet.services.api.feeder_gateway.response_objects import (
     ClassHashPair,
     ContractAddressHashPair,
@@ -18,6 +22,8 @@ from starkware.starknet.services.api.feeder_gateway.response_objects import (
 from starkware.starknet.testing.contract import StarknetContract
 from starkware.starkware_utils.error_handling import StarkErrorCode, StarkException
 
+from .state_journal import StateJournal
+
 
 def parse_hex_string(arg: str) -> int:
     """
@@ -135,7 +141,7 @@ async def group_classes_by_version(
 
 
 async def get_all_declared_cairo0_classes(
-    previous_state: CachedState,
+    previous_state: StateReader,
     explicitly_declared_contracts: List[int],
     deployed_cairo0_classes: List[int],
 ) -> Tuple[int]:
@@ -150,7 +156,7 @@ async def get_all_declared_cairo0_classes(
 
 
 async def get_all_declared_cairo1_classes(
-    previous_state: CachedState,
+    previous_state: StateReader,
     explicitly_declared_classes: List[ClassHashPair],
     deployed_cairo1_contracts: List[ContractAddressHashPair],
 ) -> List[ClassHashPair]:
@@ -167,44 +173,33 @@ async def get_all_declared_cairo1_classes(
 
 
 async def get_replaced_classes(
-    previous_state: CachedState,
-    current_state: CachedState,
+    journal: StateJournal,
 ) -> List[ContractAddressHashPair]:
-    """Find contracts whose class has been replaced"""
-    replaced: List[ContractAddressHashPair] = []
-    for address, class_hash in current_state.cache.address_to_class_hash.items():
-        previous_class_hash = await previous_state.get_class_hash_at(address)
-        if previous_class_hash and previous_class_hash != class_hash:
-            replaced.append(
-                ContractAddressHashPair(address=address, class_hash=class_hash)
-            )
-    return replaced
-
-
-async def get_storage_diffs(
-    previous_state: CachedState,
-    current_state: CachedState,
-    visited_storage_entries: Set[StorageEntry],
-):
-    """Returns storages modified from change"""
-    assert previous_state is not current_state
-
+    """Find contracts whose class has been replaced since the journal was created"""
+    return [
+        ContractAddressHashPair(address=address, class_hash=class_hash)
+        for address, (
+            previous_class_hash,
+            class_hash,
+        ) in (await journal.get_class_hash_changes()).items()
+        if previous_class_hash
+    ]
+
+
+async def get_storage_diffs(journal: StateJournal) -> Dict[int, List[StorageEntry]]:
+    """Returns storages modified since the journal was created"""
     storage_diffs: Dict[int, List[StorageEntry]] = {}
+    for (address, key), (_, value) in (await journal.get_storage_changes()).items():
+        storage_diffs.setdefault(address, []).append(StorageEntry(key=key, value=value))
+    return storage_diffs
 
-    for address, key in visited_storage_entries or {}:
-        old_storage_value = await previous_state.get_storage_at(address, key)
-        new_storage_value = await current_state.get_storage_at(address, key)
-        if old_storage_value != new_storage_value:
-            if address not in storage_diffs:
-                storage_diffs[address] = []
-            storage_diffs[address].append(
-                StorageEntry(
-                    key=key,
-                    value=await current_state.get_storage_at(address, key),
-                )
-            )
 
-    return storage_diffs
+async def get_nonces(journal: StateJournal) -> Dict[int, int]:
+    """Returns nonces modified since the journal was created"""
+    return {
+        address: nonce
+        for address, (_, nonce) in (await journal.get_nonce_changes()).items()
+    }
 
 
 async def assert_not_declared(class_hash: int, compiled_class_hash: int):
@@ -240,6 +235,75 @@ def get_fee_estimation_info(tx_fee: int, gas_price: int):
     )
 
 
+class _UncachedStateReader(StateReader):
+    """
+    Reads `cached_state` like the state itself, except that what it reads from its underlying reader
+    isn't cached in `cached_state`
+    """
+
+    def __init__(self, cached_state: CachedState):
+        self.__state = cached_state
+
+    async def __read(self, view: Mapping, key: Hashable, method: str, **kwargs) -> Any:
+        if key in view:
+            return view[key]
+        return await getattr(self.__state.state_reader, method)(**kwargs)
+
+    async def get_compiled_class(self, compiled_class_hash: int) -> CompiledClassBase:
+        return await self.__read(
+            self.__state.compiled_classes,
+            compiled_class_hash,
+            "get_compiled_class",
+            compiled_class_hash=compiled_class_hash,
+        )
+
+    async def get_compiled_class_hash(self, class_hash: int) -> int:
+        return await self.__read(
+            self.__state.cache.class_hash_to_compiled_class_hash,
+            class_hash,
+            "get_compiled_class_hash",
+            class_hash=class_hash,
+        )
+
+    async def get_class_hash_at(self, contract_address: int) -> int:
+        return await self.__read(
+            self.__state.cache.address_to_class_hash,
+            contract_address,
+            "get_class_hash_at",
+            contract_address=contract_address,
+        )
+
+    async def get_nonce_at(self, contract_address: int) -> int:
+        return await self.__read(
+            self.__state.cache.address_to_nonce,
+            contract_address,
+            "get_nonce_at",
+            contract_address=contract_address,
+        )
+
+    async def get_storage_at(self, contract_address: int, key: int) -> int:
+        return await self.__read(
+            self.__state.cache.storage_view,
+            (contract_address, key),
+            "get_storage_at",
+            contract_address=contract_address,
+            key=key,
+        )
+
+
+def create_read_layer(cached_state: CachedState) -> CachedState:
+    """
+    Return a throwaway layer over `cached_state`, buffering the writes of e.g. a call.
+    Unlike `CachedState._copy`, reading through the layer doesn't cache anything in `cached_state`
+    (or in its classes), so requests reading the same state at the same time don't modify it.
+    """
+    return CachedState(
+        block_info=cached_state.block_info,
+        state_reader=_UncachedStateReader(cached_state),
+        compiled_class_cache={},
+    )
+
+
 def warn(msg: str, file=sys.stderr):
     """Log a warning"""
     print(f"\033[93m{msg}\033[0m", file=file)
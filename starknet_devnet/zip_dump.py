@@ -0,0 +1,185 @@
+"""
+Dumps stored as zip archives: a manifest, the main section with the current state
+and separately compressed items of the other sections (e.g. blocks), loaded on first access
+"""
+
+import functools
+import io
+import json
+import os
+import pickle
+import zipfile
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+import cloudpickle
+
+from . import __version__
+from .lazy_dict import LazyDict
+
+ZIP_DUMP_VERSION = 1
+"""Version of the layout of zip dumps; increased on incompatible changes"""
+
+ZIP_SIGNATURE = b"PK\x03\x04"
+MANIFEST_NAME = "manifest.json"
+MAIN_SECTION_NAME = "main.pkl"
+
+_SectionsById = Dict[int, str]
+_ItemsById = Dict[int, Tuple[str, Hashable]]
+
+
+def _get_item_name(section: str, key: int) -> str:
+    return f"{section}/{key:x}.pkl"
+
+
+class _SectionPickler(cloudpickle.CloudPickler):
+    """Pickler replacing sections and their items with references"""
+
+    def __init__(
+        self,
+        file: io.BytesIO,
+        sections: _SectionsById,
+        items: _ItemsById,
+        pickled_item: Any = None,
+    ):
+        super().__init__(file)
+        self.__sections = sections
+        self.__items = items
+        self.__pickled_item = pickled_item
+
+    def persistent_id(self, obj: Any) -> Optional[tuple]:
+        obj_id = id(obj)
+        if obj_id in self.__sections:
+            return ("section", self.__sections[obj_id])
+        if obj_id in self.__items and obj is not self.__pickled_item:
+            return ("item", *self.__items[obj_id])
+        return None
+
+
+class _SectionUnpickler(pickle.Unpickler):
+    """Unpickler resolving the references to sections and their items"""
+
+    def __init__(self, file: io.BytesIO, sections: Dict[str, LazyDict]):
+        super().__init__(file)
+        self.__sections = sections
+
+    def persistent_load(self, pid: tuple) -> Any:
+        if pid[0] == "section":
+            return self.__sections[pid[1]]
+        _, section, key = pid
+        return self.__sections[section][key]
+
+
+def _dumps(obj: Any, sections: _SectionsById, items: _ItemsById) -> bytes:
+    file = io.BytesIO()
+    _SectionPickler(file, sections, items, pickled_item=obj).dump(obj)
+    return file.getvalue()
+
+
+def _loads(data: bytes, sections: Dict[str, LazyDict]) -> Any:
+    return _SectionUnpickler(io.BytesIO(data), sections).load()
+
+
+def _is_referenceable(value: Any) -> bool:
+    """Values like `None` or numbers are shared by unrelated objects, so not referenced"""
+    return not isinstance(value, (type(None), bool, int, float, str, bytes))
+
+
+def write_zip_dump(dumpable, path: str):
+    """
+    Write `dumpable`, which has containers loadable item by item (`get_dump_sections`), to `path`.
+    Items which haven't been loaded are copied without loading them.
+    """
+    sections: Dict[str, LazyDict] = dumpable.get_dump_sections()
+    sections_by_id = {id(section): name for name, section in sections.items()}
+    items_by_id = {
+        id(section[key]): (name, key)
+        for name, section in sections.items()
+        for key in section
+        if section.is_loaded(key) and _is_referenceable(section[key])
+    }
+
+    manifest = {
+        "version": ZIP_DUMP_VERSION,
+        "devnet_version": __version__,
+        "sections": {
+            name: [hex(key) for key in section] for name, section in sections.items()
+        },
+    }
+
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as zip_file:
+        zip_file.writestr(MANIFEST_NAME, json.dumps(manifest))
+        zip_file.writestr(
+            MAIN_SECTION_NAME, _dumps(dumpable, sections_by_id, items_by_id)
+        )
+        for name, section in sections.items():
+            for key in section:
+                if section.is_loaded(key):
+                    data = _dumps(section[key], sections_by_id, items_by_id)
+                else:
+                    data = section.get_serialized_unloaded(key)
+                zip_file.writestr(_get_item_name(name, key), data)
+
+
+class _ZipSource:
+    """
+    Zip dump from which the items are read.
+    The archive is reopened in forked processes (e.g. by gunicorn or dumping in background),
+    since the position in a shared file would be changed by both processes.
+    """
+
+    def __init__(self, path: str):
+        self.__path = path
+        self.__zip_file = zipfile.ZipFile(path)
+        self.__owner_pid = os.getpid()
+
+    def read(self, name: str) -> bytes:
+        """Return the decompressed member `name`"""
+        if self.__owner_pid != os.getpid():
+            # the inherited descriptor refers to the loaded file even if replaced since
+            fd_path = f"/proc/self/fd/{self.__zip_file.fp.fileno()}"
+            self.__zip_file = zipfile.ZipFile(
+                fd_path if os.path.exists(fd_path) else self.__path
+            )
+            self.__owner_pid = os.getpid()
+        return self.__zip_file.read(name)
+
+
+def is_zip_dump(path: str) -> bool:
+    """Return `True` if `path` is a zip dump (as opposed to a pickle dump)"""
+    try:
+        with open(path, "rb") as file:
+            # unlike looking for the end of a zip archive, not matched by pickled data
+            return file.read(len(ZIP_SIGNATURE)) == ZIP_SIGNATURE
+    except OSError:
+        return False
+
+
+def load_zip_dump(path: str) -> Any:
+    """
+    Load the object dumped to `path` by `write_zip_dump`.
+    Only the main section is loaded; the items of the other sections are loaded on first access.
+    """
+    source = _ZipSource(path)
+    manifest = json.loads(source.read(MANIFEST_NAME))
+    if manifest["version"] > ZIP_DUMP_VERSION:
+        raise pickle.UnpicklingError(
+            f"Dump version {manifest['version']} is not supported; "
+            f"the latest supported version is {ZIP_DUMP_VERSION}"
+        )
+
+    sections = {name: LazyDict() for name in manifest["sections"]}
+
+    def load_item(name: str, key: int) -> Any:
+        return _loads(source.read(_get_item_name(name, key)), sections)
+
+    def read_item(name: str, key: int) -> bytes:
+        return source.read(_get_item_name(name, key))
+
+    for name, keys in manifest["sections"].items():
+        sections[name].set_unloaded(
+            [int(key, 16) for key in keys],
+            load_value=functools.partial(load_item, name),
+            serialize_unloaded=functools.partial(read_item, name),
+        )
+
+    return _loads(source.read(MAIN_SECTION_NAME), sections)
@@ -36,6 +36,30 @@ def test_call(deploy_info, latest_block_id):
     assert result == ["0x45"]
 
 
+@pytest.mark.usefixtures("run_devnet_in_background")
+def test_call_does_not_change_state(deploy_info, latest_block_id):
+    """Call a function writing storage; the write is discarded after the call"""
+    contract_address: str = deploy_info["address"]
+
+    def call_contract(function: str, calldata: list):
+        resp = rpc_call(
+            "starknet_call",
+            params={
+                "request": {
+                    "contract_address": rpc_felt(contract_address),
+                    "entry_point_selector": rpc_felt(get_selector_from_name(function)),
+                    "calldata": calldata,
+                },
+                "block_id": latest_block_id,
+            },
+        )
+        assert "error" not in resp
+        return resp["result"]
+
+    call_contract("increase_balance", [rpc_felt(10), rpc_felt(20)])
+    assert call_contract("get_balance", []) == ["0x45"]
+
+
 @pytest.mark.usefixtures("run_devnet_in_background", "deploy_info")
 def test_call_raises_on_incorrect_contract_address():
     """
@@ -18,10 +18,12 @@ from test.shared import (
     EVENTS_CONTRACT_PATH,
     EXPECTED_CLASS_HASH,
     EXPECTED_FEE_TOKEN_ADDRESS,
+    INCREASE_BALANCE_CALLED_EVENT_KEY,
     PREDEPLOY_ACCOUNT_CLI_ARGS,
     PREDEPLOYED_ACCOUNT_ADDRESS,
     PREDEPLOYED_ACCOUNT_PRIVATE_KEY,
 )
+from test.test_abort_blocks_after import abort_blocks
 from test.test_account import deploy_empty_contract
 from test.test_declare_v2 import load_cairo1_contract
 from test.test_state_update import get_class_hash_at_path
@@ -30,6 +32,7 @@ from test.util import (
     assert_hex_equal,
     assert_transaction,
     devnet_in_background,
+    get_block,
 )
 
 import pytest
@@ -280,12 +283,43 @@ def test_get_events_continuation_token():
     )
     assert_get_events_response(resp, expected_block_length=total_invokes)
 
+    # the token points at the first event of the next page
     resp = rpc_call(
         "starknet_getEvents",
         params=create_get_events_filter(from_block=first_invoke_block, chunk_size=1),
     )
-    assert_get_events_response(resp, expected_block_length=1, expected_token="1")
+    assert len(resp["result"]["events"]) == 1
+    assert resp["result"]["continuation_token"].startswith(
+        f"{first_invoke_block + 1}-0-"
+    )
+    assert resp["result"]["events"][0]["block_number"] == first_invoke_block
+
+    resp = rpc_call(
+        "starknet_getEvents",
+        params=create_get_events_filter(
+            from_block=first_invoke_block,
+            chunk_size=1,
+            continuation_token=resp["result"]["continuation_token"],
+        ),
+    )
+    assert len(resp["result"]["events"]) == 1
+    assert resp["result"]["continuation_token"].startswith(
+        f"{first_invoke_block + 2}-0-"
+    )
+    assert resp["result"]["events"][0]["block_number"] == first_invoke_block + 1
+
+    resp = rpc_call(
+        "starknet_getEvents",
+        params=create_get_events_filter(
+            from_block=first_invoke_block,
+            chunk_size=1,
+            continuation_token=resp["result"]["continuation_token"],
+        ),
+    )
+    assert_get_events_response(resp, expected_block_length=1)
+    assert resp["result"]["events"][0]["block_number"] == first_invoke_block + 2
 
+    # chunk numbers, as issued by older versions, are still supported
     resp = rpc_call(
         "starknet_getEvents",
         params=create_get_events_filter(
@@ -293,6 +327,7 @@ def test_get_events_continuation_token():
         ),
     )
     assert_get_events_response(resp, expected_block_length=1, expected_token="2")
+    assert resp["result"]["events"][0]["block_number"] == first_invoke_block + 1
 
     resp = rpc_call(
         "starknet_getEvents",
@@ -310,6 +345,51 @@ def test_get_events_continuation_token():
     )
     assert_get_events_response(resp, expected_block_length=0)
 
+    resp = rpc_call(
+        "starknet_getEvents",
+        params=create_get_events_filter(chunk_size=1, continuation_token="invalid"),
+    )
+    assert resp["error"]["code"] == PredefinedRpcErrorCode.INVALID_PARAMS.value
+
+
+@devnet_in_background(*PREDEPLOY_ACCOUNT_CLI_ARGS)
+def test_get_events_after_abort():
+    """Test RPC get_events not returning events of aborted blocks"""
+    deploy_info = declare_and_deploy_with_chargeable(EVENTS_CONTRACT_PATH)
+    for i in range(3):
+        invoke(
+            calls=[(deploy_info["address"], "increase_balance", [i])],
+            account_address=PREDEPLOYED_ACCOUNT_ADDRESS,
+            private_key=PREDEPLOYED_ACCOUNT_PRIVATE_KEY,
+        )
+    events_filter = create_get_events_filter(
+        address=deploy_info["address"],
+        keys=[[rpc_felt(INCREASE_BALANCE_CALLED_EVENT_KEY)]],
+    )
+    resp = rpc_call("starknet_getEvents", params=events_filter)
+    assert_get_events_response(resp, expected_block_length=3)
+
+    # abort the last two invoke blocks
+    first_invoke_block = (
+        get_block(block_number="latest", parse=True)["block_number"] - 2
+    )
+    second_invoke_block = get_block(
+        block_number=str(first_invoke_block + 1), parse=True
+    )
+    assert abort_blocks(second_invoke_block["block_hash"]).status_code == 200
+
+    resp = rpc_call("starknet_getEvents", params=events_filter)
+    assert_get_events_response(resp, expected_block_length=1)
+
+    invoke(
+        calls=[(deploy_info["address"], "increase_balance", [10])],
+        account_address=PREDEPLOYED_ACCOUNT_ADDRESS,
+        private_key=PREDEPLOYED_ACCOUNT_PRIVATE_KEY,
+    )
+    resp = rpc_call("starknet_getEvents", params=events_filter)
+    assert_get_events_response(resp, expected_block_length=2)
+    assert resp["result"]["events"][1]["block_number"] == first_invoke_block + 1
+
 
 @pytest.mark.usefixtures("run_devnet_in_background")
 @pytest.mark.parametrize(
@@ -203,6 +203,21 @@ def test_pending_block():
     pending_tx_hashes = [tx["transaction_hash"] for tx in pending_block["transactions"]]
     assert deploy_info["tx_hash"] in pending_tx_hashes
 
+    # assert a pending block already read is appended to
+    another_deploy_info = declare_and_deploy_with_chargeable(
+        CONTRACT_PATH, inputs=["1"]
+    )
+    pending_block = get_block(block_number="pending", parse=True)
+    _assert_block_is_pending(pending_block)
+    appended_tx_hashes = [
+        tx["transaction_hash"] for tx in pending_block["transactions"]
+    ]
+    assert appended_tx_hashes[: len(pending_tx_hashes)] == pending_tx_hashes
+    assert appended_tx_hashes[-1] == another_deploy_info["tx_hash"]
+    assert len(pending_block["transaction_receipts"]) == len(
+        pending_block["transactions"]
+    )
+
     # assert latest unchanged
     latest_block = get_block(block_number="latest", parse=True)
     assert_equal(latest_block_before, latest_block)
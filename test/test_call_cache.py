@@ -0,0 +1,62 @@
+"""
+Test the cache of the results of calls on past blocks
+"""
+
+import pickle
+
+from starknet_devnet.call_cache import CallResultCache
+
+
+def test_hits_and_misses():
+    """Test that a result is only served for the same block, contract, selector and calldata"""
+    cache = CallResultCache()
+    key = CallResultCache.get_key(1, 2, 3, [4, 5])
+    assert cache.get(key) is None
+
+    cache.put(key, [6])
+    assert cache.get(CallResultCache.get_key(1, 2, 3, [4, 5])) == (6,)
+    assert cache.get(CallResultCache.get_key(7, 2, 3, [4, 5])) is None
+    assert cache.get(CallResultCache.get_key(1, 2, 3, [4])) is None
+
+    assert cache.get_stats() == {
+        "size": 1,
+        "hits": 1,
+        "misses": 3,
+        "hit_ratio": 0.25,
+    }
+
+
+def test_empty_result_cached():
+    """Test that calls returning nothing are cached too"""
+    cache = CallResultCache()
+    key = CallResultCache.get_key(1, 2, 3, [])
+    cache.put(key, [])
+    assert cache.get(key) == ()
+
+
+def test_cache_bounded():
+    """Test that the least recently used result is evicted"""
+    cache = CallResultCache(cache_size=2)
+    keys = [CallResultCache.get_key(block_hash, 2, 3, []) for block_hash in range(3)]
+    cache.put(keys[0], [0])
+    cache.put(keys[1], [1])
+    cache.get(keys[0])
+    cache.put(keys[2], [2])
+
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) == (0,)
+    assert cache.get(keys[2]) == (2,)
+
+
+def test_clear_and_pickle():
+    """Test that results are dropped when cleared and when pickled"""
+    cache = CallResultCache(cache_size=2)
+    key = CallResultCache.get_key(1, 2, 3, [])
+    cache.put(key, [4])
+    cache.clear()
+    assert cache.get(key) is None
+
+    cache.put(key, [4])
+    loaded: CallResultCache = pickle.loads(pickle.dumps(cache))
+    assert loaded.get_stats()["size"] == 0
+    assert loaded.get(key) is None
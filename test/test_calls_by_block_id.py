@@ -1,5 +1,6 @@
 """Test old block support"""
 
+import requests
 from starkware.starknet.definitions.error_codes import StarknetErrorCode
 
 from .account import declare_and_deploy_with_chargeable, invoke
@@ -12,6 +13,8 @@ from .shared import (
     PREDEPLOYED_ACCOUNT_PRIVATE_KEY,
     SUFFICIENT_MAX_FEE,
 )
+from .settings import APP_URL
+from .test_abort_blocks_after import abort_blocks
 from .test_restart import restart
 from .util import (
     ErrorExpector,
@@ -123,6 +126,45 @@ def test_call_with_block_hash():
     assert_old_block_correct()
 
 
+def _get_call_cache_stats() -> dict:
+    return requests.get(f"{APP_URL}/stats").json()["call_cache"]
+
+
+@devnet_in_background(*PREDEPLOY_ACCOUNT_CLI_ARGS)
+def test_old_block_call_cached():
+    """Expect repeated calls of an old block to be served from the cache until it's aborted"""
+
+    initial_value = 5
+    deploy_info = declare_and_deploy_with_chargeable(
+        CONTRACT_PATH, inputs=[str(initial_value)]
+    )
+    contract_address = deploy_info["address"]
+    increment_value = 7
+    _increment(contract_address, increment_value)
+    increment_block = get_block(block_number="latest", parse=True)
+
+    for _ in range(3):
+        assert _get_value(contract_address, block_number="3") == (
+            initial_value + increment_value
+        )
+    # calls of the latest state aren't cached
+    _get_value(contract_address, block_number="latest")
+
+    stats = _get_call_cache_stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+    assert stats["size"] == 1
+
+    abort_blocks(increment_block["block_hash"])
+    assert _get_call_cache_stats()["size"] == 0
+
+    # a new block with the same number has a different hash, so it is not served from the cache
+    _increment(contract_address, increment_value + 1)
+    assert _get_value(contract_address, block_number="3") == (
+        initial_value + increment_value + 1
+    )
+
+
 FORK_BLOCK = 1000
 
 
@@ -0,0 +1,48 @@
+"""
+Test the store of contract classes shared by states
+"""
+
+import copy
+
+from starkware.starknet.services.api.contract_class.contract_class import (
+    DeprecatedCompiledClass,
+)
+from starkware.starknet.third_party.open_zeppelin.starknet_contracts import (
+    account_contract,
+)
+
+from starknet_devnet.class_store import ClassStore
+from starknet_devnet.constants import STARKNET_CLI_ACCOUNT_CLASS_HASH
+
+
+def test_interning_classes():
+    """Test that classes of the same hash are replaced with the stored instance"""
+    class_store = ClassStore()
+    duplicate = DeprecatedCompiledClass.load(account_contract.dump())
+    stored_class = class_store.add(STARKNET_CLI_ACCOUNT_CLASS_HASH, account_contract)
+    assert stored_class is account_contract
+
+    compiled_classes = {STARKNET_CLI_ACCOUNT_CLASS_HASH: duplicate}
+    class_store.intern(compiled_classes)
+    assert compiled_classes[STARKNET_CLI_ACCOUNT_CLASS_HASH] is account_contract
+    assert len(class_store) == 1
+
+    # copies of a state share the classes and the store
+    copied = copy.deepcopy({"classes": compiled_classes, "store": class_store})
+    assert copied["classes"][STARKNET_CLI_ACCOUNT_CLASS_HASH] is account_contract
+    assert copied["store"] is class_store
+
+
+def test_serializing_with_class_references():
+    """Test that stored classes are serialized as references"""
+    class_store = ClassStore()
+    class_store.add(STARKNET_CLI_ACCOUNT_CLASS_HASH, account_contract)
+    state = {"compiled_classes": {STARKNET_CLI_ACCOUNT_CLASS_HASH: account_contract}}
+
+    serialized = class_store.dumps(state)
+    assert len(serialized) < 1000
+
+    loaded = class_store.loads(serialized)
+    assert (
+        loaded["compiled_classes"][STARKNET_CLI_ACCOUNT_CLASS_HASH] is account_contract
+    )
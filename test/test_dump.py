@@ -10,6 +10,8 @@ from asyncio import subprocess
 import pytest
 import requests
 
+from starknet_devnet.dump import Dumper
+
 from .account import declare_and_deploy_with_chargeable, invoke
 from .settings import APP_URL
 from .shared import (
@@ -21,7 +23,13 @@ from .shared import (
 )
 from .test_account import get_account_balance
 from .test_fee_token import mint
-from .util import DevnetBackgroundProc, call, devnet_in_background, terminate_and_wait
+from .util import (
+    DevnetBackgroundProc,
+    call,
+    devnet_in_background,
+    get_block,
+    terminate_and_wait,
+)
 
 DUMP_PATH = "dump.pkl"
 
@@ -334,6 +342,19 @@ def test_dump_path_not_present_with_dump_on_present():
     assert expected_msg in devnet_proc.stderr.read()
 
 
+def test_dump_in_background_with_log_format():
+    """Test behavior when dumping in background is combined with the log format."""
+    devnet_proc = ACTIVE_DEVNET.start(
+        "--dump-in-background", "--dump-format", "log", stderr=subprocess.PIPE
+    )
+
+    assert devnet_proc.returncode == 1
+    expected_msg = (
+        b"Error: --dump-in-background can't be combined with --dump-format log\n"
+    )
+    assert expected_msg in devnet_proc.stderr.read()
+
+
 def assert_load(dump_path: str, contract_address: str, expected_value: str):
     """Load from `dump_path` and assert get_balance at `contract_address` returns `expected_value`."""
 
@@ -375,6 +396,131 @@ def test_dumping_on_each_tx():
     assert_load(dump_after_invoke_path, contract_address, "10")
 
 
+def test_dumping_on_each_tx_as_log():
+    """Test dumping on each transaction by appending to a log."""
+    ACTIVE_DEVNET.start(
+        *PREDEPLOY_ACCOUNT_CLI_ARGS,
+        "--dump-on",
+        "transaction",
+        "--dump-path",
+        DUMP_PATH,
+        "--dump-format",
+        "log",
+    )
+
+    contract_address = declare_and_deploy_empty_contract()
+    assert_dump_present(DUMP_PATH)
+    size_after_deploy = os.path.getsize(DUMP_PATH)
+
+    invoke(
+        calls=[(contract_address, "increase_balance", ["5", "5"])],
+        account_address=PREDEPLOYED_ACCOUNT_ADDRESS,
+        private_key=PREDEPLOYED_ACCOUNT_PRIVATE_KEY,
+    )
+    mint(address=PREDEPLOYED_ACCOUNT_ADDRESS, amount=10, lite=True)
+    invoke(
+        calls=[(contract_address, "increase_balance", ["1", "1"])],
+        account_address=PREDEPLOYED_ACCOUNT_ADDRESS,
+        private_key=PREDEPLOYED_ACCOUNT_PRIVATE_KEY,
+    )
+    assert_dump_present(DUMP_PATH)
+    # the operations are appended instead of dumping everything again
+    assert os.path.getsize(DUMP_PATH) - size_after_deploy < size_after_deploy / 10
+
+    balance_before_load = get_account_balance(PREDEPLOYED_ACCOUNT_ADDRESS)
+    ACTIVE_DEVNET.stop()
+
+    ACTIVE_DEVNET.start("--load-path", DUMP_PATH)
+    assert call("get_balance", contract_address, ABI_PATH) == "12"
+    assert get_account_balance(PREDEPLOYED_ACCOUNT_ADDRESS) == balance_before_load
+
+
+def get_dump_status():
+    """Get the dumps in progress and the recently completed ones"""
+    resp = requests.get(f"{APP_URL}/dump_status")
+    assert resp.status_code == 200
+    return resp.json()
+
+
+def test_dumping_on_each_tx_in_background():
+    """Test dumping on each transaction in background and reporting the dumps."""
+    ACTIVE_DEVNET.start(
+        *PREDEPLOY_ACCOUNT_CLI_ARGS,
+        "--dump-on",
+        "transaction",
+        "--dump-path",
+        DUMP_PATH,
+        "--dump-in-background",
+    )
+
+    contract_address = declare_and_deploy_empty_contract()
+    invoke(
+        calls=[(contract_address, "increase_balance", ["5", "5"])],
+        account_address=PREDEPLOYED_ACCOUNT_ADDRESS,
+        private_key=PREDEPLOYED_ACCOUNT_PRIVATE_KEY,
+    )
+
+    dump_status = get_dump_status()
+    while dump_status["in_progress"] or dump_status["queued"]:
+        time.sleep(0.1)
+        dump_status = get_dump_status()
+
+    assert_dump_present(DUMP_PATH)
+    # declare, deploy, invoke; the ones requested during a dump are coalesced
+    assert 1 <= len(dump_status["completed"]) <= 3
+    for record in dump_status["completed"]:
+        assert record["path"] == DUMP_PATH
+        assert record["background"]
+        assert not record["failed"]
+        assert record["size"] > 0
+        assert record["duration"] >= 0
+
+    ACTIVE_DEVNET.stop()
+    assert_load(DUMP_PATH, contract_address, "10")
+
+
+class _SlowDumpable:
+    """Takes a while to be pickled, so that dumps in background overlap"""
+
+    def settle(self):
+        """Nothing to finish before forking"""
+
+    def __getstate__(self):
+        time.sleep(0.2)
+        return {}
+
+
+def test_background_dumps_coalesced():
+    """Test that the dumps requested during a dump in background are coalesced into one per path"""
+    dumper = Dumper(_SlowDumpable())
+    for _ in range(3):
+        dumper.dump(DUMP_PATH, in_background=True)
+    dumper.dump("other.pkl", in_background=True)
+    assert dumper.get_status()["queued"] == [DUMP_PATH, "other.pkl"]
+
+    dumper.wait()
+    dump_status = dumper.get_status()
+    assert not dump_status["in_progress"]
+    assert not dump_status["queued"]
+    assert [record["path"] for record in dump_status["completed"]] == [
+        DUMP_PATH,
+        DUMP_PATH,
+        "other.pkl",
+    ]
+    assert not any(record["failed"] for record in dump_status["completed"])
+
+
+def test_dump_snapshot_interval_without_log_format():
+    """Test behavior when dump-snapshot-interval is provided without the log format."""
+    devnet_proc = ACTIVE_DEVNET.start(
+        "--dump-snapshot-interval", "10", stderr=subprocess.PIPE
+    )
+
+    assert devnet_proc.returncode == 1
+    expected_msg = b"Error: --dump-snapshot-interval requires --dump-format log\n"
+    assert expected_msg in devnet_proc.stderr.read()
+
+
 @devnet_in_background()
 def test_dumping_call_with_invalid_body():
     """Call with invalid body and test status code and message."""
@@ -425,3 +571,50 @@ def test_calling_old_state_after_load():
 
     value_after_invoke = call_at_block("3")
     assert value_after_invoke == increment_value
+
+
+def get_dump_sections():
+    """Get the number of items of each dump section and how many of them are loaded"""
+    resp = requests.get(f"{APP_URL}/stats")
+    assert resp.status_code == 200
+    return resp.json()["dump_sections"]
+
+
+def test_loading_zip_dump():
+    """Blocks and transactions of a zip dump are only loaded when requested"""
+    ACTIVE_DEVNET.start(
+        *PREDEPLOY_ACCOUNT_CLI_ARGS,
+        "--dump-on",
+        "exit",
+        "--dump-path",
+        DUMP_PATH,
+        "--dump-format",
+        "zip",
+    )
+
+    contract_address = declare_and_deploy_empty_contract()
+    invoke(
+        calls=[(contract_address, "increase_balance", ["10", "0"])],
+        account_address=PREDEPLOYED_ACCOUNT_ADDRESS,
+        private_key=PREDEPLOYED_ACCOUNT_PRIVATE_KEY,
+    )
+    block_before_load = get_block(block_number="1", parse=True)
+    ACTIVE_DEVNET.stop()
+    assert_dump_present(DUMP_PATH)
+
+    ACTIVE_DEVNET.start("--load-path", DUMP_PATH, "--dump-format", "zip")
+    dump_sections = get_dump_sections()
+    assert dump_sections["blocks"]["items"] == 4
+    assert dump_sections["blocks"]["loaded"] < 4
+
+    assert get_block(block_number="1", parse=True) == block_before_load
+    assert int(call("get_balance", contract_address, ABI_PATH)) == 10
+    assert int(call("get_balance", contract_address, ABI_PATH, block_number="2")) == 0
+
+    # dumping again copies the items which haven't been loaded
+    os.remove(DUMP_PATH)
+    dump_and_assert(DUMP_PATH)
+    ACTIVE_DEVNET.stop()
+    ACTIVE_DEVNET.start("--load-path", DUMP_PATH)
+    assert get_block(block_number="1", parse=True) == block_before_load
+    assert int(call("get_balance", contract_address, ABI_PATH)) == 10
@@ -1,6 +1,7 @@
 """Fee estimation tests"""
 
 import json
+import subprocess
 import typing
 
 import pytest
@@ -18,6 +19,7 @@ from .account import (
     declare_and_deploy_with_chargeable,
     get_estimate_fee_request_dict,
     get_nonce,
+    invoke,
 )
 from .settings import APP_URL
 from .shared import (
@@ -29,8 +31,15 @@ from .shared import (
     PREDEPLOY_ACCOUNT_CLI_ARGS,
     PREDEPLOYED_ACCOUNT_ADDRESS,
     PREDEPLOYED_ACCOUNT_PRIVATE_KEY,
+    SUFFICIENT_MAX_FEE,
+)
+from .util import (
+    DevnetBackgroundProc,
+    call,
+    devnet_in_background,
+    estimate_message_fee,
+    load_file_content,
 )
-from .util import call, devnet_in_background, estimate_message_fee, load_file_content
 
 DEPRECATED_DEPLOY_CONTENT = load_file_content("deprecated_deploy.json")
 INVOKE_CONTENT = load_file_content("invoke.json")
@@ -226,7 +235,15 @@ def _send_estimate_fee_bulk_request(txs: typing.List[AccountTransaction]):
     )
 
 
-@devnet_in_background(*PREDEPLOY_ACCOUNT_CLI_ARGS)
+@pytest.mark.usefixtures("run_devnet_in_background")
+@pytest.mark.parametrize(
+    "run_devnet_in_background",
+    [
+        PREDEPLOY_ACCOUNT_CLI_ARGS,
+        [*PREDEPLOY_ACCOUNT_CLI_ARGS, "--simulation-workers", "2"],
+    ],
+    indirect=True,
+)
 def test_estimate_fee_bulk_invalid():
     """Test estimating fee in a bulk when one tx is invalid"""
     # skip deployment to cause failure
@@ -253,7 +270,15 @@ def test_estimate_fee_bulk_invalid():
     assert resp.status_code == 500
 
 
-@devnet_in_background(*PREDEPLOY_ACCOUNT_CLI_ARGS)
+@pytest.mark.usefixtures("run_devnet_in_background")
+@pytest.mark.parametrize(
+    "run_devnet_in_background",
+    [
+        PREDEPLOY_ACCOUNT_CLI_ARGS,
+        [*PREDEPLOY_ACCOUNT_CLI_ARGS, "--simulation-workers", "2"],
+    ],
+    indirect=True,
+)
 def test_estimate_fee_bulk():
     """Test estimating fee in a bulk"""
 
@@ -302,3 +327,52 @@ def test_estimate_fee_bulk():
         function="get_balance", address=deploy_info["address"], abi_path=ABI_PATH
     )
     assert balance_after == initial_balance
+
+
+@devnet_in_background(*PREDEPLOY_ACCOUNT_CLI_ARGS, "--simulation-workers", "1")
+def test_estimate_fee_by_worker_after_state_change():
+    """Test that the worker estimates on the state changed since its previous estimation"""
+    deploy_info = declare_and_deploy_with_chargeable(
+        contract=CONTRACT_PATH, inputs=["10"]
+    )
+    contract_address = deploy_info["address"]
+
+    def estimate_increase(nonce: int):
+        tx_dict = get_estimate_fee_request_dict(
+            calls=[(contract_address, "increase_balance", [10, 20])],
+            account_address=PREDEPLOYED_ACCOUNT_ADDRESS,
+            private_key=PREDEPLOYED_ACCOUNT_PRIVATE_KEY,
+            nonce=nonce,
+        )
+        return send_estimate_fee_with_requests(tx_dict)
+
+    resp = estimate_increase(nonce=0)
+    assert resp.status_code == 200, resp.json()
+    common_estimate_response(resp.json())
+
+    invoke(
+        calls=[(contract_address, "increase_balance", [1, 0])],
+        account_address=PREDEPLOYED_ACCOUNT_ADDRESS,
+        private_key=PREDEPLOYED_ACCOUNT_PRIVATE_KEY,
+        max_fee=SUFFICIENT_MAX_FEE,
+    )
+
+    # estimated by the same worker, which only received the new nonce and balance
+    resp = estimate_increase(nonce=1)
+    assert resp.status_code == 200, resp.json()
+    common_estimate_response(resp.json())
+
+
+def test_simulation_workers_with_non_memory_state_archive():
+    """Test that the workers can't be combined with archives whose states are views over archived ones"""
+    devnet_proc = DevnetBackgroundProc().start(
+        "--simulation-workers",
+        "1",
+        "--state-archive",
+        "delta",
+        stderr=subprocess.PIPE,
+    )
+
+    assert devnet_proc.returncode == 1
+    expected_msg = b"Error: --simulation-workers requires --state-archive memory\n"
+    assert expected_msg in devnet_proc.stderr.read()
@@ -0,0 +1,100 @@
+"""
+Test calculating event and transaction hashes across processes
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from starkware.starknet.core.os.block_hash.block_hash import calculate_block_hash
+from starkware.starknet.definitions.general_config import StarknetGeneralConfig
+from starkware.starknet.services.api.feeder_gateway.response_objects import Event
+
+from starknet_devnet.constants import DUMMY_STATE_ROOT
+from starknet_devnet.event_hasher import EventHasher, hash_events, hash_transactions
+
+
+def _generate_events(count: int):
+    return [
+        Event(from_address=i + 1, keys=[i, 2 * i], data=[3 * i]) for i in range(count)
+    ]
+
+
+def test_parallel_hashes_equal_serial():
+    """Test that hashing in chunks across processes gives the hashes in the same order"""
+    events = _generate_events(50)
+    event_hasher = EventHasher(workers=3, chunk_size=8)
+    try:
+        assert asyncio.run(event_hasher.hash_events(events)) == hash_events(events)
+    finally:
+        event_hasher.close()
+
+
+def test_hashing_in_threads():
+    """Test hashing in several threads at the same time, sharing the workers"""
+    events = _generate_events(50)
+    event_hasher = EventHasher(workers=2, chunk_size=8)
+    try:
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(
+                executor.map(
+                    lambda _: asyncio.run(event_hasher.hash_events(events)), range(4)
+                )
+            )
+        assert results == [hash_events(events)] * 4
+    finally:
+        event_hasher.close()
+
+
+def test_single_chunk_hashed_in_process():
+    """Test that events fitting in a chunk are hashed without starting the workers"""
+    events = _generate_events(5)
+    event_hasher = EventHasher(workers=2, chunk_size=8)
+
+    assert asyncio.run(event_hasher.hash_events(events)) == hash_events(events)
+    event_hasher.close()
+
+
+def test_no_events():
+    """Test hashing a block without events"""
+    event_hasher = EventHasher(workers=2)
+    assert asyncio.run(event_hasher.hash_events([])) == []
+
+
+def test_parallel_transaction_hashes_equal_serial():
+    """Test that hashing transactions with their signatures across processes keeps their order"""
+    tx_hashes = list(range(1, 51))
+    tx_signatures = [[i, i + 1] for i in range(50)]
+    event_hasher = EventHasher(workers=3, chunk_size=8)
+    try:
+        assert asyncio.run(
+            event_hasher.hash_transactions(tx_hashes, tx_signatures)
+        ) == hash_transactions(tx_hashes, tx_signatures)
+    finally:
+        event_hasher.close()
+
+
+def test_block_hash_equals_serial():
+    """Test that the block hash calculated with the workers matches the one of cairo-lang"""
+    events = _generate_events(50)
+    block_hash_kwargs = {
+        "general_config": StarknetGeneralConfig(),
+        "parent_hash": 7,
+        "block_number": 3,
+        "global_state_root": DUMMY_STATE_ROOT,
+        "sequencer_address": 5,
+        "block_timestamp": 11,
+        "tx_hashes": list(range(1, 21)),
+        "tx_signatures": [[i, 2 * i] for i in range(20)],
+    }
+    event_hasher = EventHasher(workers=2, chunk_size=8)
+    try:
+        parallel_hash = asyncio.run(
+            event_hasher.calculate_block_hash(**block_hash_kwargs, events=events)
+        )
+    finally:
+        event_hasher.close()
+
+    serial_hash = asyncio.run(
+        calculate_block_hash(**block_hash_kwargs, event_hashes=hash_events(events))
+    )
+    assert parallel_hash == serial_hash
@@ -0,0 +1,49 @@
+"""
+Test the index of events
+"""
+
+from types import SimpleNamespace
+
+from starknet_devnet.event_index import BloomFilter, EventIndex
+
+
+def _create_block(block_number: int, events_keys: list):
+    events = [SimpleNamespace(from_address=1, keys=keys) for keys in events_keys]
+    return SimpleNamespace(
+        block_number=block_number,
+        transaction_receipts=[SimpleNamespace(events=events)],
+    )
+
+
+def test_bloom_filter():
+    """Test that added items are contained and that others mostly aren't"""
+    bloom_filter = BloomFilter((0, key) for key in range(100))
+    assert all((0, key) in bloom_filter for key in range(100))
+
+    false_positives = sum((1, key) in bloom_filter for key in range(1000))
+    assert false_positives < 50
+
+
+def test_blocks_ruled_out_by_keys():
+    """Test that blocks without events having the requested second key are skipped"""
+    event_index = EventIndex()
+    event_index.add_block(_create_block(0, [[10, 20], [10, 21]]))
+    event_index.add_block(_create_block(1, [[10, 22]]))
+    event_index.add_block(_create_block(2, [[10, 20, 30], [11]]))
+
+    positions = event_index.get_positions((0, 0, 0), 2, address=1, keys=[[10], [20]])
+    # events with fewer keys are not filtered by the missing keys, so block 2 is kept
+    assert list(positions) == [(0, 0, 0), (0, 0, 1), (2, 0, 0)]
+    assert event_index.get_stats()["blocks_ruled_out"] == 1
+
+    # without keys beyond the first, no blocks are ruled out
+    positions = event_index.get_positions((1, 0, 0), 2, address=None, keys=[[10]])
+    assert list(positions) == [(1, 0, 0), (2, 0, 0)]
+    assert event_index.get_stats()["blocks_ruled_out"] == 1
+
+    event_index.report_false_positive()
+    assert event_index.get_stats() == {
+        "blocks_ruled_out": 1,
+        "false_positives": 1,
+        "false_positive_rate": 0.5,
+    }
@@ -158,6 +158,75 @@ def test_forking_devnet_with_account_on_origin():
     assert fork_balance_after < DEFAULT_INITIAL_BALANCE
 
 
+@devnet_in_background("--port", ORIGIN_PORT, *PREDEPLOY_ACCOUNT_CLI_ARGS)
+def test_forking_with_prefetch():
+    """Deploy contract on origin, fork prefetching it, assert its values aren't requested"""
+    initial_balance = "10"
+    deploy_info = declare_and_deploy_with_chargeable(
+        contract=CONTRACT_PATH,
+        inputs=[initial_balance],
+        gateway_url=ORIGIN_URL,
+    )
+
+    FORKING_DEVNET.start(
+        "--port",
+        FORK_PORT,
+        "--fork-network",
+        ORIGIN_URL,
+        "--fork-prefetch-blocks",
+        "3",
+        "--fork-prefetch-contracts",
+        deploy_info["address"],
+        "--accounts",
+        "0",
+    )
+    misses_before = requests.get(f"{FORK_URL}/stats").json()["fork_cache"]["misses"]
+
+    balance = call(
+        function="get_balance",
+        address=deploy_info["address"],
+        abi_path=ABI_PATH,
+        feeder_gateway_url=FORK_URL,
+    )
+    assert balance == initial_balance
+
+    fork_cache_stats = requests.get(f"{FORK_URL}/stats").json()["fork_cache"]
+    assert fork_cache_stats["misses"] == misses_before
+
+
+def test_forking_recorded_fixture(tmp_path):
+    """Record the responses of origin while forking it, then fork the recording without origin"""
+    fixture_path = str(tmp_path / "fixture.jsonl")
+    origin_devnet = DevnetBackgroundProc()
+    origin_devnet.start("--port", ORIGIN_PORT, *PREDEPLOY_ACCOUNT_CLI_ARGS)
+    try:
+        FORKING_DEVNET.start(
+            "--port",
+            FORK_PORT,
+            "--fork-network",
+            ORIGIN_URL,
+            "--fork-record-path",
+            fixture_path,
+            "--accounts",
+            "0",
+        )
+        recorded_balance = get_account_balance(
+            address=PREDEPLOYED_ACCOUNT_ADDRESS, server_url=FORK_URL
+        )
+        assert recorded_balance == DEFAULT_INITIAL_BALANCE
+        FORKING_DEVNET.stop()
+    finally:
+        origin_devnet.stop()
+
+    FORKING_DEVNET.start(
+        "--port", FORK_PORT, "--fork-network", fixture_path, "--accounts", "0"
+    )
+    replayed_balance = get_account_balance(
+        address=PREDEPLOYED_ACCOUNT_ADDRESS, server_url=FORK_URL
+    )
+    assert replayed_balance == recorded_balance
+
+
 @devnet_in_background("--port", ORIGIN_PORT, "--accounts", "0")
 def test_forking_devnet_with_account_on_fork():
     """
@@ -0,0 +1,197 @@
+"""
+Test the cache of the responses of the forked network
+"""
+
+import asyncio
+import json
+
+from services.external_api.client import BadRequest
+from starkware.starknet.definitions.error_codes import StarknetErrorCode
+from starkware.starknet.definitions.general_config import StarknetChainId
+
+from starknet_devnet.fork_cache import ForkCache
+from starknet_devnet.forked_state import ForkedStateReader
+
+NETWORK_URL = "http://forked-network"
+
+
+class FakeFeederGatewayClient:
+    """Answers like the feeder gateway, counting the requests"""
+
+    url = NETWORK_URL
+
+    def __init__(self):
+        self.requests = 0
+
+    async def get_storage_at(self, contract_address: int, key: int, block_number: int):
+        """Storage of deployed contracts"""
+        self.requests += 1
+        return hex(contract_address + key + block_number)
+
+    async def get_nonce(
+        self, contract_address: int, block_number: int
+    ):  # pylint: disable=unused-argument
+        """Nothing is deployed"""
+        self.requests += 1
+        return 0
+
+    async def get_class_hash_at(self, contract_address: int, block_number: int):
+        """Nothing is deployed"""
+        self.requests += 1
+        raise BadRequest(
+            400,
+            json.dumps(
+                {
+                    "code": str(StarknetErrorCode.UNINITIALIZED_CONTRACT),
+                    "message": f"{contract_address} not deployed at {block_number}",
+                }
+            ),
+        )
+
+
+def test_responses_cached_across_restarts(tmp_path):
+    """Test that the responses are requested only once, even after restarting"""
+    cache_path = str(tmp_path / "fork-cache.sqlite")
+
+    async def read(
+        client: FakeFeederGatewayClient,
+        block_number: int,
+        chain_id: StarknetChainId = StarknetChainId.TESTNET,
+    ):
+        reader = ForkedStateReader(
+            client,
+            block_number=block_number,
+            fork_cache=ForkCache(cache_path, NETWORK_URL, block_number, chain_id),
+        )
+        for _ in range(2):
+            assert await reader.get_storage_at(1, 2) == 3 + block_number
+            assert await reader.get_class_hash_at(1) == 0
+
+    client = FakeFeederGatewayClient()
+    asyncio.run(read(client, block_number=10))
+    assert client.requests == 2
+
+    # restarted
+    asyncio.run(read(client, block_number=10))
+    assert client.requests == 2
+
+    # forked at another block
+    asyncio.run(read(client, block_number=11))
+    assert client.requests == 4
+
+    # another chain served at the same url
+    asyncio.run(read(client, block_number=11, chain_id=StarknetChainId.MAINNET))
+    assert client.requests == 6
+
+
+def test_stats():
+    """Test the numbers of hits and misses"""
+    fork_cache = ForkCache(None, NETWORK_URL, 10)
+    assert fork_cache.get(("get_nonce", {"contract_address": 1})) is None
+    fork_cache.set(("get_nonce", {"contract_address": 1}), {"result": 0})
+    assert fork_cache.get(("get_nonce", {"contract_address": 1})) == {"result": 0}
+
+    assert fork_cache.get_stats() == {
+        "path": None,
+        "pinned": 0,
+        "memory_hits": 1,
+        "disk_hits": 0,
+        "misses": 1,
+        "hit_ratio": 0.5,
+    }
+
+
+def test_prefetch_from_state_updates(tmp_path):
+    """Test that the values changed by the state updates up to the forked block aren't requested"""
+    cache_path = str(tmp_path / "fork-cache.sqlite")
+    state_updates = [
+        {
+            "state_diff": {
+                "storage_diffs": {
+                    "0x1": [{"key": "0x2", "value": "0x5"}],
+                    "0x3": [{"key": "0x4", "value": "0x6"}],
+                },
+                "nonces": {"0x1": "0x1"},
+                "deployed_contracts": [{"address": "0x1", "class_hash": "0x7"}],
+            }
+        },
+        {
+            "state_diff": {
+                "storage_diffs": {"0x1": [{"key": "0x2", "value": "0x8"}]},
+                "nonces": {},
+                "deployed_contracts": [],
+                "replaced_classes": [{"address": "0x1", "class_hash": "0x9"}],
+            }
+        },
+    ]
+
+    client = FakeFeederGatewayClient()
+    reader = ForkedStateReader(
+        client, block_number=10, fork_cache=ForkCache(cache_path, NETWORK_URL, 10)
+    )
+
+    async def prefetch_and_read():
+        assert await reader.prefetch(state_updates) == 4
+        assert await reader.get_storage_at(1, 2) == 8
+        assert await reader.get_class_hash_at(1) == 9
+        assert await reader.get_nonce_at(1) == 1
+
+    asyncio.run(prefetch_and_read())
+    assert client.requests == 0
+
+
+def test_prefetch_contracts():
+    """Test that the values of the listed contracts are requested, and only their changes cached"""
+    state_update = {
+        "state_diff": {
+            "storage_diffs": {
+                "0x1": [{"key": "0x2", "value": "0x5"}],
+                "0x3": [{"key": "0x4", "value": "0x6"}],
+            },
+            "nonces": {},
+            "deployed_contracts": [],
+        }
+    }
+    client = FakeFeederGatewayClient()
+    reader = ForkedStateReader(client, block_number=10)
+
+    async def prefetch_and_read():
+        assert await reader.prefetch([state_update], contract_addresses={3}) == 1
+        # the class hash and the nonce
+        assert client.requests == 2
+
+        assert await reader.get_storage_at(3, 4) == 6
+        assert await reader.get_nonce_at(3) == 0
+        assert client.requests == 2
+
+        assert await reader.get_storage_at(1, 2) == 13
+        assert client.requests == 3
+
+    asyncio.run(prefetch_and_read())
+
+
+def test_prefetched_values_not_evicted():
+    """Test that the prefetched values are kept in memory beyond its size, without a cache file"""
+    state_update = {
+        "state_diff": {
+            "storage_diffs": {
+                "0x1": [{"key": hex(key), "value": "0x5"} for key in range(10)],
+            },
+            "nonces": {},
+            "deployed_contracts": [],
+        }
+    }
+    client = FakeFeederGatewayClient()
+    reader = ForkedStateReader(
+        client,
+        block_number=10,
+        fork_cache=ForkCache(None, NETWORK_URL, 10, memory_size=2),
+    )
+
+    async def prefetch_and_read():
+        assert await reader.prefetch([state_update]) == 10
+        for key in range(10):
+            assert await reader.get_storage_at(1, key) == 5
+
+    asyncio.run(prefetch_and_read())
+    assert client.requests == 0
@@ -83,6 +83,22 @@ def test_block_provided_without_network():
     assert proc.returncode == 1
 
 
+def test_record_path_provided_without_network():
+    """Should fail if record path provided and network not"""
+    proc = ACTIVE_DEVNET.start(
+        "--fork-record-path",
+        "fixture.jsonl",
+        stderr=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+    )
+    assert read_stream(proc.stdout) == ""
+    assert (
+        "Error: --fork-network required if --fork-record-path present\n"
+        in read_stream(proc.stderr)
+    )
+    assert proc.returncode == 1
+
+
 @pytest.mark.parametrize("fork_block", ["-1", "piece of invalid text"])
 def test_malformed_block_id(fork_block: str):
     """Should exit if provided with a negative block number"""
@@ -0,0 +1,98 @@
+"""
+Test recording the responses of the forked network and forking the recorded fixture
+"""
+
+import asyncio
+import json
+
+import pytest
+from services.external_api.client import BadRequest
+from starkware.starknet.definitions.error_codes import StarknetErrorCode
+
+from starknet_devnet.fork_fixture import (
+    FixtureFeederGatewayClient,
+    RecordingFeederGatewayClient,
+    is_fork_fixture,
+)
+from starknet_devnet.forked_state import ForkedStateReader
+from starknet_devnet.origin import ForkedOrigin
+
+NETWORK_URL = "http://forked-network"
+BLOCK_NUMBER = 10
+
+
+class FakeFeederGatewayClient:
+    """Answers like the feeder gateway, counting the requests"""
+
+    url = NETWORK_URL
+
+    def __init__(self):
+        self.requests = 0
+
+    async def get_storage_at(self, contract_address, key, block_hash, block_number):
+        """Storage of deployed contracts"""
+        self.requests += 1
+        assert block_hash is None
+        return hex(contract_address + key + block_number)
+
+    async def get_class_hash_at(self, contract_address, block_hash, block_number):
+        """Nothing is deployed"""
+        self.requests += 1
+        assert block_hash is None
+        raise BadRequest(
+            400,
+            json.dumps(
+                {
+                    "code": str(StarknetErrorCode.UNINITIALIZED_CONTRACT),
+                    "message": f"{contract_address} not deployed at {block_number}",
+                }
+            ),
+        )
+
+    async def get_transaction_status(self, tx_hash):
+        """Every transaction is accepted"""
+        self.requests += 1
+        return {"tx_status": "ACCEPTED_ON_L2", "block_hash": tx_hash}
+
+
+async def _read(feeder_gateway_client):
+    reader = ForkedStateReader(feeder_gateway_client, block_number=BLOCK_NUMBER)
+    origin = ForkedOrigin(feeder_gateway_client, last_block_number=BLOCK_NUMBER)
+    return (
+        await reader.get_storage_at(1, 2),
+        await reader.get_class_hash_at(1),
+        await origin.get_transaction_status("0x5"),
+    )
+
+
+def test_replay_recorded_fixture(tmp_path):
+    """Test that the recorded responses are replayed without requesting the network"""
+    fixture_path = str(tmp_path / "fixture.jsonl")
+    client = FakeFeederGatewayClient()
+
+    recorded = asyncio.run(_read(RecordingFeederGatewayClient(client, fixture_path)))
+    assert recorded == (
+        3 + BLOCK_NUMBER,
+        0,
+        {"tx_status": "ACCEPTED_ON_L2", "block_hash": "0x5"},
+    )
+    assert client.requests == 3
+
+    assert is_fork_fixture(fixture_path)
+    assert not is_fork_fixture(NETWORK_URL)
+
+    replayed = asyncio.run(_read(FixtureFeederGatewayClient(fixture_path)))
+    assert replayed == recorded
+    assert client.requests == 3
+
+
+def test_unrecorded_request(tmp_path):
+    """Test that a request not recorded in the fixture fails"""
+    fixture_path = str(tmp_path / "fixture.jsonl")
+    RecordingFeederGatewayClient(FakeFeederGatewayClient(), fixture_path)
+
+    fixture_client = FixtureFeederGatewayClient(fixture_path)
+    with pytest.raises(BadRequest) as error:
+        asyncio.run(fixture_client.get_transaction_status("0x5"))
+    assert error.value.status_code == 500
+    assert "was recorded in the fork fixture" in error.value.text
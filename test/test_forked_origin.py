@@ -0,0 +1,82 @@
+"""
+Test the caching of the immutable data of the forked origin
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+from starknet_devnet.origin import ForkedOrigin
+
+LAST_BLOCK_NUMBER = 10
+
+
+class FakeFeederGatewayClient:
+    """Answers like the feeder gateway, counting the requests"""
+
+    def __init__(self):
+        self.requests = 0
+
+    async def get_block(self, block_hash=None, block_number=None):
+        """Block with a single transaction"""
+        self.requests += 1
+        if block_hash is not None:
+            block_number = int(block_hash, 16) - 1000
+        return SimpleNamespace(
+            block_number=block_number,
+            block_hash=1000 + block_number,
+            transactions=[SimpleNamespace(transaction_hash=2000 + block_number)],
+        )
+
+    async def get_transaction_trace(self, tx_hash):
+        """Trace of any transaction"""
+        self.requests += 1
+        return {"transaction_hash": tx_hash}
+
+
+def test_pre_fork_blocks_cached():
+    """Test that only the blocks up to the forked one are requested once"""
+    client = FakeFeederGatewayClient()
+    origin = ForkedOrigin(client, LAST_BLOCK_NUMBER)
+
+    async def scan(block_numbers):
+        for block_number in block_numbers:
+            block = await origin.get_block_by_number(block_number)
+            await origin.get_block_by_hash(hex(block.block_hash))
+            await origin.get_transaction_trace(hex(2000 + block_number))
+
+    # pre-fork
+    asyncio.run(scan([9, 10]))
+    assert client.requests == 4
+    asyncio.run(scan([9, 10]))
+    assert client.requests == 4
+
+    # post-fork
+    asyncio.run(scan([11]))
+    assert client.requests == 7
+    asyncio.run(scan([11]))
+    assert client.requests == 10
+
+    assert origin.get_cache_stats() == {
+        "size": 6,
+        "hits": 8,
+        # blocks requested by a post-fork number are not even looked up
+        "misses": 8,
+        "hit_ratio": 0.5,
+    }
+
+
+def test_cache_bounded():
+    """Test that the least recently used data is evicted"""
+    client = FakeFeederGatewayClient()
+    origin = ForkedOrigin(client, LAST_BLOCK_NUMBER, cache_size=2)
+
+    async def get_blocks(block_numbers):
+        for block_number in block_numbers:
+            await origin.get_block_by_number(block_number)
+
+    asyncio.run(get_blocks([1, 1]))
+    assert client.requests == 1
+
+    # each block is cached by number and by hash
+    asyncio.run(get_blocks([2, 1]))
+    assert client.requests == 3
@@ -0,0 +1,92 @@
+"""
+Test reading classes of the forked network
+"""
+
+import asyncio
+import json
+from collections import Counter
+
+from services.external_api.client import BadRequest
+from starkware.starknet.definitions.error_codes import StarknetErrorCode
+from starkware.starknet.services.api.contract_class.contract_class import (
+    CompiledClass,
+    DeprecatedCompiledClass,
+)
+from starkware.starknet.third_party.open_zeppelin.starknet_contracts import (
+    account_contract,
+)
+
+from starknet_devnet.fork_cache import ForkCache
+from starknet_devnet.forked_state import ForkedStateReader
+
+CAIRO_1_CLASS_HASH = 0x1
+CAIRO_0_CLASS_HASH = 0x2
+COMPILED_CLASS = {
+    "prime": "0x800000000000011000000000000000000000000000000000000000000000001",
+    "compiler_version": "1.0.0",
+    "bytecode": ["0x1", "0x2"],
+    "hints": [],
+    "pythonic_hints": [],
+    "entry_points_by_type": {"EXTERNAL": [], "L1_HANDLER": [], "CONSTRUCTOR": []},
+}
+
+
+class FakeFeederGatewayClient:
+    """Has a Cairo 1 and a Cairo 0 class, counting the requests"""
+
+    url = "http://forked-network"
+
+    def __init__(self):
+        self.requests = Counter()
+
+    async def get_compiled_class_by_class_hash(self, class_hash: str, block_number):
+        """Only Cairo 1 classes have compiled classes"""
+        self.requests["get_compiled_class_by_class_hash"] += 1
+        if int(class_hash, 16) == CAIRO_1_CLASS_HASH:
+            return COMPILED_CLASS
+        raise BadRequest(
+            400,
+            json.dumps(
+                {
+                    "code": str(StarknetErrorCode.UNDECLARED_CLASS),
+                    "message": f"Class {class_hash} not declared at {block_number}",
+                }
+            ),
+        )
+
+    async def get_class_by_hash(
+        self, class_hash: str, block_number
+    ):  # pylint: disable=unused-argument
+        """Only the Cairo 0 class is served"""
+        self.requests["get_class_by_hash"] += 1
+        assert int(class_hash, 16) == CAIRO_0_CLASS_HASH
+        return account_contract.dump()
+
+
+def test_each_class_fetched_once():
+    """Test that resolving a class and its compiled class hash fetches and loads it once"""
+    client = FakeFeederGatewayClient()
+    fork_cache = ForkCache(None, client.url, 10)
+    reader = ForkedStateReader(client, block_number=10, fork_cache=fork_cache)
+
+    async def read():
+        compiled_class = await reader.get_compiled_class_by_class_hash(
+            CAIRO_1_CLASS_HASH
+        )
+        assert isinstance(compiled_class, CompiledClass)
+        compiled_class_hash = await reader.get_compiled_class_hash(CAIRO_1_CLASS_HASH)
+        assert await reader.get_compiled_class(compiled_class_hash) is compiled_class
+
+        deprecated_class = await reader.get_compiled_class_by_class_hash(
+            CAIRO_0_CLASS_HASH
+        )
+        assert isinstance(deprecated_class, DeprecatedCompiledClass)
+        assert await reader.get_compiled_class(CAIRO_0_CLASS_HASH) is deprecated_class
+
+    asyncio.run(read())
+    assert client.requests == {
+        "get_compiled_class_by_class_hash": 2,
+        "get_class_by_hash": 1,
+    }
+    # not even read from the cache again
+    assert fork_cache.get_stats()["memory_hits"] == 0
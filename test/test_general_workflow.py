@@ -53,6 +53,7 @@ def test_lite_mode_block_hash():
     [
         PREDEPLOY_ACCOUNT_CLI_ARGS,
         [*PREDEPLOY_ACCOUNT_CLI_ARGS, "--lite-mode"],
+        [*PREDEPLOY_ACCOUNT_CLI_ARGS, "--hash-blocks-in-background"],
     ],
     indirect=True,
 )
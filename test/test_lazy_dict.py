@@ -0,0 +1,33 @@
+"""
+Test the dict whose values are loaded on first access
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from starknet_devnet.lazy_dict import LazyDict
+
+
+def test_loaded_once_by_concurrent_readers():
+    """Test that a value accessed in several threads at the same time is loaded once"""
+    loads = []
+    loads_lock = threading.Lock()
+
+    def load_value(key: str) -> dict:
+        with loads_lock:
+            loads.append(key)
+        # gives the other readers the time to arrive
+        time.sleep(0.05)
+        return {"key": key}
+
+    lazy_dict = LazyDict()
+    lazy_dict.set_unloaded(["a", "b"], load_value, serialize_unloaded=None)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        values = list(executor.map(lambda _: lazy_dict["a"], range(4)))
+
+    assert loads == ["a"]
+    assert all(value is values[0] for value in values)
+    assert lazy_dict.is_loaded("a")
+    assert not lazy_dict.is_loaded("b")
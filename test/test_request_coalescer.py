@@ -0,0 +1,106 @@
+"""
+Test the coalescing and limiting of the requests sent to the forked network
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+from starknet_devnet.request_coalescer import RequestCoalescer
+
+
+class FakeNetwork:
+    """Answers requests after a delay, recording how many were in flight"""
+
+    def __init__(self):
+        self.sent = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def send(self, value):
+        """Return `value` after a while"""
+        self.sent += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.05)
+        self.in_flight -= 1
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+
+def test_identical_requests_coalesced():
+    """Test that identical concurrent requests are sent once"""
+    coalescer = RequestCoalescer(max_concurrent=8)
+    network = FakeNetwork()
+
+    async def request_all():
+        return await asyncio.gather(
+            *(
+                coalescer.request(i % 2, lambda i=i: network.send(i % 2))
+                for i in range(10)
+            )
+        )
+
+    assert asyncio.run(request_all()) == [0, 1] * 5
+    assert network.sent == 2
+    assert coalescer.get_stats()["coalesced"] == 8
+
+
+def test_requests_from_different_threads_coalesced():
+    """Test that requests handled in different threads (event loops) share the request"""
+    coalescer = RequestCoalescer(max_concurrent=8)
+    network = FakeNetwork()
+    results = []
+
+    def request():
+        results.append(asyncio.run(coalescer.request("key", lambda: network.send(1))))
+
+    threads = [threading.Thread(target=request) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [1] * 5
+    assert network.sent == 1
+
+
+def test_concurrency_limited():
+    """Test that no more than the allowed number of requests are in flight"""
+    coalescer = RequestCoalescer(max_concurrent=3)
+    network = FakeNetwork()
+
+    async def request_all():
+        return await asyncio.gather(
+            *(coalescer.request(i, lambda i=i: network.send(i)) for i in range(10))
+        )
+
+    assert asyncio.run(request_all()) == list(range(10))
+    assert network.sent == 10
+    assert network.max_in_flight == 3
+
+
+def test_error_shared():
+    """Test that the error of a request is raised to all the requesters"""
+    coalescer = RequestCoalescer()
+    network = FakeNetwork()
+
+    async def request_all():
+        return await asyncio.gather(
+            *(
+                coalescer.request("key", lambda: network.send(ValueError("x")))
+                for _ in range(3)
+            ),
+            return_exceptions=True,
+        )
+
+    errors = asyncio.run(request_all())
+    assert all(isinstance(error, ValueError) for error in errors)
+    assert network.sent == 1
+
+    # not coalesced with the failed request, which isn't in flight anymore
+    with pytest.raises(ValueError):
+        asyncio.run(coalescer.request("key", lambda: network.send(ValueError("y"))))
+    assert network.sent == 2
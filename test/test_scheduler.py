@@ -0,0 +1,211 @@
+"""
+Test the scheduling of reads and writes of the state
+"""
+
+import threading
+import time
+
+import requests
+
+from starknet_devnet.scheduler import ExecutionScheduler
+
+from .account import declare_and_deploy_with_chargeable, invoke
+from .settings import APP_URL
+from .shared import (
+    BALANCE_KEY,
+    CONTRACT_PATH,
+    PREDEPLOY_ACCOUNT_CLI_ARGS,
+    PREDEPLOYED_ACCOUNT_ADDRESS,
+    PREDEPLOYED_ACCOUNT_PRIVATE_KEY,
+    SUFFICIENT_MAX_FEE,
+)
+from .util import devnet_in_background
+
+
+def _run_in_threads(*targets):
+    threads = [threading.Thread(target=target) for target in targets]
+    for thread in threads:
+        thread.start()
+        # let the threads arrive in order
+        time.sleep(0.02)
+    for thread in threads:
+        thread.join()
+
+
+def test_reads_concurrent():
+    """Test that reads don't wait for each other"""
+    scheduler = ExecutionScheduler()
+    barrier = threading.Barrier(3, timeout=5)
+
+    def read():
+        with scheduler.read():
+            # would time out if the reads were handled one at a time
+            barrier.wait()
+
+    _run_in_threads(read, read, read)
+    assert scheduler.get_stats() == {
+        "reads": 3,
+        "writes": 0,
+        "max_concurrent_reads": 3,
+    }
+
+
+def test_writes_in_order_of_arrival():
+    """Test that writes run one at a time, in the order of arrival"""
+    scheduler = ExecutionScheduler()
+    events = []
+
+    def write(name: str):
+        def target():
+            with scheduler.write():
+                events.append(f"{name} start")
+                time.sleep(0.05)
+                events.append(f"{name} end")
+
+        return target
+
+    _run_in_threads(write("a"), write("b"), write("c"))
+    assert events == ["a start", "a end", "b start", "b end", "c start", "c end"]
+
+
+def test_reads_see_complete_writes():
+    """Test that a read arriving during a write waits for it, and a write waits for the reads"""
+    scheduler = ExecutionScheduler()
+    state = {"first": 0, "second": 0}
+    seen = []
+
+    def write():
+        with scheduler.write():
+            state["first"] += 1
+            time.sleep(0.05)
+            state["second"] += 1
+
+    def read():
+        with scheduler.read():
+            seen.append(dict(state))
+            time.sleep(0.1)
+            seen.append(dict(state))
+
+    def write_during_read():
+        # arrives when the read is running
+        time.sleep(0.1)
+        write()
+
+    _run_in_threads(write, read, write_during_read)
+    assert seen == [{"first": 1, "second": 1}] * 2
+    assert state == {"first": 2, "second": 2}
+
+
+def test_read_waits_for_queued_write():
+    """Test that a read arriving after a queued write goes after it"""
+    scheduler = ExecutionScheduler()
+    events = []
+
+    def write(name: str):
+        def target():
+            with scheduler.write():
+                events.append(name)
+                time.sleep(0.05)
+
+        return target
+
+    def read():
+        with scheduler.read():
+            events.append("read")
+
+    _run_in_threads(write("a"), write("b"), read)
+    assert events == ["a", "b", "read"]
+
+
+@devnet_in_background(*PREDEPLOY_ACCOUNT_CLI_ARGS, "--request-threads", "4")
+def test_reads_during_transactions():
+    """Test that reads handled in parallel with transactions only see complete transactions"""
+    deploy_info = declare_and_deploy_with_chargeable(CONTRACT_PATH, inputs=["0"])
+    contract_address = deploy_info["address"]
+    increment_value = 7
+    increments = 5
+    done = threading.Event()
+    seen_values = []
+
+    def read_balance():
+        values = []
+        while not done.is_set():
+            resp = requests.get(
+                f"{APP_URL}/feeder_gateway/get_storage_at",
+                params={
+                    "contractAddress": contract_address,
+                    "key": BALANCE_KEY,
+                    "blockNumber": "pending",
+                },
+            )
+            assert resp.status_code == 200, resp.json()
+            values.append(int(resp.json(), 16))
+        seen_values.append(values)
+
+    readers = [threading.Thread(target=read_balance) for _ in range(3)]
+    for reader in readers:
+        reader.start()
+    try:
+        for _ in range(increments):
+            invoke(
+                calls=[(contract_address, "increase_balance", [increment_value, 0])],
+                account_address=PREDEPLOYED_ACCOUNT_ADDRESS,
+                private_key=PREDEPLOYED_ACCOUNT_PRIVATE_KEY,
+                max_fee=SUFFICIENT_MAX_FEE,
+            )
+    finally:
+        done.set()
+        for reader in readers:
+            reader.join()
+
+    assert len(seen_values) == len(readers)
+    for values in seen_values:
+        assert values == sorted(values)
+        assert all(value % increment_value == 0 for value in values)
+
+    stats = requests.get(f"{APP_URL}/stats").json()["scheduler"]
+    assert stats["writes"] >= increments
+
+
+@devnet_in_background(
+    *PREDEPLOY_ACCOUNT_CLI_ARGS,
+    "--request-threads",
+    "4",
+    "--hash-blocks-in-background",
+)
+def test_block_reads_during_background_hashing():
+    """Test that concurrent reads storing the blocks hashed in background all see them stored"""
+    deploy_info = declare_and_deploy_with_chargeable(CONTRACT_PATH, inputs=["0"])
+    contract_address = deploy_info["address"]
+    done = threading.Event()
+    seen_block_numbers = []
+
+    def read_latest_block():
+        block_numbers = []
+        while not done.is_set():
+            resp = requests.get(f"{APP_URL}/feeder_gateway/get_block")
+            assert resp.status_code == 200, resp.json()
+            block = resp.json()
+            assert block["status"] == "ACCEPTED_ON_L2"
+            block_numbers.append(block["block_number"])
+        seen_block_numbers.append(block_numbers)
+
+    readers = [threading.Thread(target=read_latest_block) for _ in range(3)]
+    for reader in readers:
+        reader.start()
+    try:
+        for _ in range(5):
+            invoke(
+                calls=[(contract_address, "increase_balance", [1, 0])],
+                account_address=PREDEPLOYED_ACCOUNT_ADDRESS,
+                private_key=PREDEPLOYED_ACCOUNT_PRIVATE_KEY,
+                max_fee=SUFFICIENT_MAX_FEE,
+            )
+    finally:
+        done.set()
+        for reader in readers:
+            reader.join()
+
+    assert len(seen_block_numbers) == len(readers)
+    for block_numbers in seen_block_numbers:
+        assert block_numbers == sorted(block_numbers)
@@ -0,0 +1,182 @@
+"""Test the archiving of states of past blocks"""
+
+import asyncio
+import pickle
+import threading
+
+import pytest
+from starkware.starknet.testing.state import StarknetState
+
+from starknet_devnet.class_store import ClassStore
+from starknet_devnet.state_archive import DiskStateArchive
+
+from .account import declare_and_deploy_with_chargeable, invoke
+from .shared import (
+    ABI_PATH,
+    BALANCE_KEY,
+    CONTRACT_PATH,
+    PREDEPLOY_ACCOUNT_CLI_ARGS,
+    PREDEPLOYED_ACCOUNT_ADDRESS,
+    PREDEPLOYED_ACCOUNT_PRIVATE_KEY,
+    SUFFICIENT_MAX_FEE,
+)
+from .test_abort_blocks_after import abort_blocks
+from .util import assert_storage, call, get_block
+
+STATE_ARCHIVE_CLI_ARGS = [
+    [*PREDEPLOY_ACCOUNT_CLI_ARGS, "--state-archive", "memory"],
+    [*PREDEPLOY_ACCOUNT_CLI_ARGS, "--state-archive", "delta"],
+    [*PREDEPLOY_ACCOUNT_CLI_ARGS, "--state-archive", "disk"],
+    [
+        *PREDEPLOY_ACCOUNT_CLI_ARGS,
+        "--state-archive",
+        "checkpoint",
+        "--checkpoint-interval",
+        "2",
+    ],
+]
+
+
+def _increment(contract_address: str, increment_value: int):
+    invoke(
+        calls=[(contract_address, "increase_balance", [increment_value, 0])],
+        account_address=PREDEPLOYED_ACCOUNT_ADDRESS,
+        private_key=PREDEPLOYED_ACCOUNT_PRIVATE_KEY,
+        max_fee=SUFFICIENT_MAX_FEE,
+    )
+
+
+def _get_value(contract_address: str, block_number: str) -> int:
+    value = call(
+        "get_balance",
+        address=contract_address,
+        abi_path=ABI_PATH,
+        block_number=block_number,
+    )
+    return int(value)
+
+
+@pytest.mark.usefixtures("run_devnet_in_background")
+@pytest.mark.parametrize(
+    "run_devnet_in_background", STATE_ARCHIVE_CLI_ARGS, indirect=True
+)
+def test_querying_old_states():
+    """Expect old states to be intact after new transactions"""
+    initial_value = 5
+    deploy_info = declare_and_deploy_with_chargeable(
+        CONTRACT_PATH, inputs=[str(initial_value)]
+    )
+    contract_address = deploy_info["address"]
+    deployment_block = get_block(block_number="latest", parse=True)
+
+    increment_value = 7
+    for _ in range(3):
+        _increment(contract_address, increment_value)
+
+    # genesis (0) + declare + deploy = block number 2
+    for i in range(4):
+        block_number = str(deployment_block["block_number"] + i)
+        assert _get_value(contract_address, block_number) == (
+            initial_value + i * increment_value
+        )
+
+    # declaration block
+    assert_storage(
+        address=contract_address,
+        key=BALANCE_KEY,
+        expected_value=hex(0),
+        block_number=str(deployment_block["block_number"] - 1),
+    )
+    assert_storage(
+        address=contract_address,
+        key=BALANCE_KEY,
+        expected_value=hex(initial_value),
+        block_hash=deployment_block["block_hash"],
+    )
+
+
+@pytest.mark.usefixtures("run_devnet_in_background")
+@pytest.mark.parametrize(
+    "run_devnet_in_background", STATE_ARCHIVE_CLI_ARGS, indirect=True
+)
+def test_state_after_abort():
+    """Expect the state to be reverted to an archived state after aborting"""
+    initial_value = 5
+    deploy_info = declare_and_deploy_with_chargeable(
+        CONTRACT_PATH, inputs=[str(initial_value)]
+    )
+    contract_address = deploy_info["address"]
+
+    increment_value = 7
+    _increment(contract_address, increment_value)
+    increment_block = get_block(block_number="latest", parse=True)
+    _increment(contract_address, increment_value)
+
+    response = abort_blocks(increment_block["block_hash"])
+    assert response.status_code == 200
+
+    # the block number of the aborted block is reused
+    _increment(contract_address, 2 * increment_value)
+    new_block = get_block(block_number="latest", parse=True)
+    assert new_block["block_number"] == increment_block["block_number"]
+    assert _get_value(contract_address, "latest") == (
+        initial_value + 2 * increment_value
+    )
+    assert _get_value(contract_address, str(new_block["block_number"] - 1)) == (
+        initial_value
+    )
+
+
+class _FailingClassStore(ClassStore):
+    """Class store failing to serialize the first state"""
+
+    def __init__(self):
+        super().__init__()
+        self.failures = 1
+
+    def dumps(self, obj):
+        if self.failures:
+            self.failures -= 1
+            raise pickle.PicklingError("Serialization failure")
+        return super().dumps(obj)
+
+
+def test_disk_archive_after_failed_write():
+    """Expect the disk archive to keep working after failing to write a state"""
+    state = asyncio.run(StarknetState.empty())
+    archive = DiskStateArchive(class_store=_FailingClassStore())
+    try:
+        archive.store(0, state)
+        archive.store(1, state)
+
+        # would block forever if the failure stopped the writing
+        flushing = threading.Thread(target=archive.flush, daemon=True)
+        flushing.start()
+        flushing.join(timeout=10)
+        assert not flushing.is_alive()
+
+        # the state which couldn't be written is kept in memory
+        for number in (0, 1):
+            archived_block_info = archive.get(number).state.block_info
+            assert archived_block_info == state.state.block_info
+    finally:
+        archive.close()
+
+
+def test_disk_archive_pickled_with_states():
+    """Expect a pickled disk archive to include its states, not only the path of its file"""
+    state = asyncio.run(StarknetState.empty())
+    archive = DiskStateArchive()
+    try:
+        archive.store(0, state)
+        archive.flush()
+        dumped = pickle.dumps(archive)
+    finally:
+        archive.close()
+
+    loaded = pickle.loads(dumped)
+    try:
+        archived_block_info = loaded.get(0).state.block_info
+        assert archived_block_info == state.state.block_info
+    finally:
+        loaded.close()
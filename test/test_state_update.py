@@ -126,6 +126,24 @@ def test_storage_diff():
     ]
 
 
+@pytest.mark.state_update
+@devnet_in_background(*PREDEPLOY_ACCOUNT_CLI_ARGS)
+def test_nonces():
+    """Test nonces in the state update"""
+    contract_address = deploy_empty_contract()
+
+    invoke_tx_hash = invoke(
+        calls=[(contract_address, "store_value", [30])],
+        account_address=PREDEPLOYED_ACCOUNT_ADDRESS,
+        private_key=PREDEPLOYED_ACCOUNT_PRIVATE_KEY,
+    )
+    assert_transaction(invoke_tx_hash, "ACCEPTED_ON_L2")
+
+    state_update = get_state_update()
+    nonces = state_update["state_diff"]["nonces"]
+    assert nonces == {hex(int(PREDEPLOYED_ACCOUNT_ADDRESS, 16)): hex(1)}
+
+
 @pytest.mark.state_update
 @devnet_in_background()
 def test_block_hash():